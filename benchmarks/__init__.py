@@ -0,0 +1 @@
+# benchmarks: hardware-free load and latency tests for the v1 pipeline
@@ -0,0 +1,430 @@
+# benchmarks/fakes.py
+"""
+Deterministic stand-ins for everything app.py needs from the Pi.
+
+install() puts fake modules into sys.modules *before* the app is imported:
+
+- board / busio           – an I2C bus that charges the wire time of every
+                            transfer (9 bits per byte at I2C_HZ) to the caller
+- adafruit_ssd1306        – a 128x64 panel on that bus
+- adafruit_bme280, adafruit_ads1x15, adafruit_veml7700
+                          – sensors with fixed readings, one bus transfer each
+- sounddevice             – an InputStream that replays a WAV (lead-in
+                            silence, the clip, then silence) at AUDIO_SPEED x
+                            real time; OutputStream/play consume audio at the
+                            same clock
+- webrtcvad               – RMS threshold instead of the GMM
+- whisper                 – load and transcribe cost proportional to audio
+- faster_whisper          – the same for the int8 CTranslate2 engine (ct2:…)
+- llama_cpp               – in-process LLM with the Ollama stub's cost model;
+                            the KV cache of the common prompt prefix is reused
+- piper.voice             – synthesis cost proportional to the spoken length
+  (both models also occupy whisper_mb / piper_mb of real memory while loaded)
+- soundfile               – writes via the wave module
+
+Only the timing behaviour is modelled; nothing here is accurate audio/ML.
+"""
+import sys
+import time
+import types
+import wave
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+# all of these can be changed through install(**overrides)
+SETTINGS: Dict[str, object] = {
+    "i2c_hz": 400_000,
+    "wav": None,                 # path of the clip /talk "hears"
+    "audio_speed": 1.0,          # >1 replays capture and playback faster than real time
+    "lead_in_s": 0.3,
+    "vad_rms": 300,              # frames above this RMS count as speech
+    "whisper_load_s": 1.5,
+    "whisper_rtf": 0.4,          # transcribe seconds per second of audio
+    "whisper_mb": 150,           # memory a loaded model holds
+    "ct2_load_s": 0.6,
+    "ct2_rtf": 0.15,
+    "ct2_mb": 60,
+    "transcript": "how are you feeling today",
+    "piper_load_s": 0.5,
+    "piper_rtf": 0.25,           # synthesis seconds per second of speech
+    "piper_mb": 60,
+    "llm_load_s": 2.0,           # same meaning as the Ollama stub's options
+    "llm_prompt_rate": 150.0,
+    "llm_token_rate": 10.0,
+    "llm_mb": 1700,
+    "piper_sr": 16000,
+    "speech_s_per_char": 0.065,
+    "readings": {"temperature_c": 23.5, "humidity_pct": 48.0, "pressure_hpa": 1012.0,
+                 "soil_voltage": 1.1, "light_lux": 320.0},
+}
+
+STATS = {"i2c_bytes": 0, "i2c_transfers": 0, "i2c_busy_s": 0.0}
+_STATS_LOCK = threading.Lock()
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+# ─────────────────────────────── I2C ───────────────────────────────
+
+class FakeI2C:
+    """One shared bus; a transfer holds it for its wire time."""
+
+    _wire = threading.Lock()
+
+    def __init__(self, scl=None, sda=None, frequency: Optional[int] = None):
+        self.frequency = frequency or SETTINGS["i2c_hz"]
+
+    def transfer(self, n_bytes: int) -> None:
+        busy = (n_bytes + 1) * 9 / self.frequency      # + address byte
+        with self._wire:
+            time.sleep(busy)
+        with _STATS_LOCK:
+            STATS["i2c_bytes"] += n_bytes
+            STATS["i2c_transfers"] += 1
+            STATS["i2c_busy_s"] += busy
+
+    def deinit(self) -> None:
+        pass
+
+
+class _I2CDevice:
+    def __init__(self, i2c: FakeI2C):
+        self.i2c = i2c
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, buf, start: int = 0, end: Optional[int] = None) -> None:
+        self.i2c.transfer(len(buf[start:end]))
+
+
+class FakeSSD1306:
+    def __init__(self, width: int, height: int, i2c: FakeI2C, addr: int = 0x3C, **kwargs):
+        self.width = width
+        self.height = height
+        self.i2c_device = _I2CDevice(i2c)
+        self.buffer = bytearray(width * height // 8)
+
+    def write_cmd(self, cmd: int) -> None:
+        self.i2c_device.write(bytes([0x80, cmd]))
+
+    def fill(self, color: int) -> None:
+        self.buffer[:] = bytes([0xFF if color else 0]) * len(self.buffer)
+
+    def image(self, img) -> None:
+        pass
+
+    def show(self) -> None:
+        for cmd in (0x21, 0, self.width - 1, 0x22, 0, self.height // 8 - 1):
+            self.write_cmd(cmd)
+        self.i2c_device.write(b"\x40" + bytes(self.buffer))
+
+
+class _Sensor:
+    def __init__(self, i2c: FakeI2C, *args, **kwargs):
+        self._i2c = i2c
+
+    def _read(self, key: str, n_bytes: int = 3) -> float:
+        self._i2c.transfer(n_bytes)
+        return SETTINGS["readings"][key]
+
+
+class FakeBME280(_Sensor):
+    temperature = property(lambda self: self._read("temperature_c"))
+    humidity    = property(lambda self: self._read("humidity_pct", 2))
+    pressure    = property(lambda self: self._read("pressure_hpa"))
+
+
+class FakeADS1115(_Sensor):
+    gain = 1
+
+
+class FakeAnalogIn:
+    def __init__(self, ads: FakeADS1115, pin: int):
+        self._ads = ads
+
+    @property
+    def voltage(self) -> float:
+        return self._ads._read("soil_voltage", 2)
+
+    @property
+    def value(self) -> int:
+        return int(self.voltage / 4.096 * 32767)
+
+
+class FakeVEML7700(_Sensor):
+    lux = property(lambda self: self._read("light_lux", 2))
+
+
+# ───────────────────────────── audio ─────────────────────────────
+
+def load_wav(path: str, sr: int = 16000) -> np.ndarray:
+    """Mono int16 at *sr* from any PCM WAV (8/16-bit), linearly resampled."""
+    with wave.open(path) as w:
+        width, rate, channels = w.getsampwidth(), w.getframerate(), w.getnchannels()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, np.uint8).astype(np.int16) - 128) * 256
+    elif width == 2:
+        data = np.frombuffer(raw, "<i2")
+    else:
+        raise ValueError(f"unsupported sample width {width} in {path}")
+    data = data.reshape(-1, channels).mean(axis=1)
+    if rate != sr:
+        t = np.arange(int(len(data) * sr / rate)) * rate / sr
+        data = np.interp(t, np.arange(len(data)), data)
+    return data.astype(np.int16)
+
+
+class _Clock(threading.Thread):
+    """Calls *tick* every *period* / audio_speed seconds until stopped."""
+
+    def __init__(self, period: float, tick):
+        super().__init__(daemon=True)
+        self.period = period / SETTINGS["audio_speed"]
+        self.tick = tick
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        next_at = time.monotonic()
+        while not self.stopped.is_set():
+            self.tick()
+            next_at += self.period
+            self.stopped.wait(max(0.0, next_at - time.monotonic()))
+
+
+class _Status:
+    input_overflow = output_underflow = False
+
+    def __bool__(self):
+        return False
+
+
+class FakeInputStream:
+    """Replays lead-in silence + the WAV + endless silence into *callback*."""
+
+    def __init__(self, device=None, samplerate=16000, channels=1, dtype="int16",
+                 blocksize=480, callback=None, **kwargs):
+        clip = load_wav(SETTINGS["wav"], samplerate) if SETTINGS["wav"] else np.zeros(0, np.int16)
+        lead = np.zeros(int(SETTINGS["lead_in_s"] * samplerate), np.int16)
+        self._audio = np.concatenate([lead, clip])
+        self._pos = 0
+        self._blocksize = blocksize
+        self._callback = callback
+        self._clock = _Clock(blocksize / samplerate, self._tick)
+
+    def _tick(self) -> None:
+        n = self._blocksize
+        block = np.zeros((n, 1), np.int16)
+        chunk = self._audio[self._pos:self._pos + n]
+        block[:len(chunk), 0] = chunk
+        self._pos += n
+        self._callback(block, n, None, _Status())
+
+    def start(self) -> None:
+        self._clock.start()
+
+    def stop(self) -> None:
+        self._clock.stopped.set()
+        self._clock.join()
+
+    close = stop
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+class FakeOutputStream:
+    def __init__(self, samplerate=16000, channels=1, dtype="int16", blocksize=1024,
+                 callback=None, **kwargs):
+        self._blocksize = blocksize
+        self._callback = callback
+        self._clock = _Clock(blocksize / samplerate, self._tick)
+
+    def _tick(self) -> None:
+        out = np.zeros((self._blocksize, 1), np.int16)
+        self._callback(out, self._blocksize, None, _Status())
+
+    def start(self) -> None:
+        self._clock.start()
+
+    def stop(self) -> None:
+        self._clock.stopped.set()
+
+    close = stop
+
+
+def _play(samples, samplerate, blocking=False, **kwargs) -> None:
+    time.sleep(len(samples) / samplerate / SETTINGS["audio_speed"])
+
+
+class FakeVad:
+    def __init__(self, mode: int = 0):
+        self.mode = mode
+
+    def is_speech(self, frame: bytes, sample_rate: int) -> bool:
+        data = np.frombuffer(frame, np.int16).astype(np.float32)
+        return bool(len(data)) and float(np.sqrt(np.mean(data * data))) > SETTINGS["vad_rms"]
+
+
+def _write_wav(path: str, data, samplerate: int, **kwargs) -> None:
+    pcm = np.clip(np.asarray(data, np.float32) * 32767, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(samplerate)
+        w.writeframes(pcm.tobytes())
+
+
+# ─────────────────────────── model engines ───────────────────────────
+
+def _weights(mb: float) -> np.ndarray:
+    # ones, not zeros: the pages have to be touched to count in the RSS
+    return np.ones(int(mb * 2**20), np.uint8)
+
+
+def _segments(seconds: float):
+    """One segment per second of audio, the transcript's words split in order."""
+    words = SETTINGS["transcript"].split()
+    n = max(1, int(seconds))
+    for i, chunk in enumerate(np.array_split(np.array(words, dtype=object), n)):
+        yield float(i), float(min(i + 1, seconds)), " " + " ".join(chunk)
+
+
+class FakeWhisperModel:
+    def __init__(self):
+        self.weights = _weights(SETTINGS["whisper_mb"])
+
+    def transcribe(self, audio, **opts) -> dict:
+        seconds = len(audio) / 16000 if isinstance(audio, np.ndarray) else 5.0
+        time.sleep(seconds * SETTINGS["whisper_rtf"])
+        segments = [{"start": start, "end": end, "text": text}
+                    for start, end, text in _segments(seconds)]
+        return {"text": " " + SETTINGS["transcript"], "segments": segments,
+                "language": opts.get("language")}
+
+
+def _load_whisper(name: str, *args, **kwargs) -> FakeWhisperModel:
+    time.sleep(SETTINGS["whisper_load_s"])
+    return FakeWhisperModel()
+
+
+class FakeCT2Model:
+    """faster_whisper.WhisperModel: segments come from a lazy generator."""
+
+    def __init__(self, name: str, device: str = "cpu", compute_type: str = "int8",
+                 cpu_threads: int = 0, **kwargs):
+        time.sleep(SETTINGS["ct2_load_s"])
+        self.weights = _weights(SETTINGS["ct2_mb"])
+
+    def transcribe(self, audio, language=None, **opts):
+        seconds = len(audio) / 16000 if isinstance(audio, np.ndarray) else 5.0
+
+        def segments():
+            for start, end, text in _segments(seconds):
+                time.sleep((end - start) * SETTINGS["ct2_rtf"])
+                yield types.SimpleNamespace(start=start, end=end, text=text)
+        return segments(), types.SimpleNamespace(language=language, duration=seconds)
+
+
+class FakePiperVoice:
+    def __init__(self):
+        self.config = types.SimpleNamespace(sample_rate=SETTINGS["piper_sr"])
+        self.weights = _weights(SETTINGS["piper_mb"])
+
+    @classmethod
+    def load(cls, model_path: str, *args, **kwargs) -> "FakePiperVoice":
+        time.sleep(SETTINGS["piper_load_s"])
+        return cls()
+
+    def synthesize_stream_raw(self, text: str, **kwargs):
+        # Piper yields one chunk per sentence
+        sr = self.config.sample_rate
+        for sentence in filter(None, (s.strip() for s in text.replace("!", ".").split("."))):
+            seconds = len(sentence) * SETTINGS["speech_s_per_char"]
+            time.sleep(seconds * SETTINGS["piper_rtf"])
+            t = np.arange(int(seconds * sr)) / sr
+            yield (np.sin(2 * np.pi * 220 * t) * 3000).astype("<i2").tobytes()
+
+
+class FakeLlama:
+    """llama_cpp.Llama: tokens are 4-character pieces; only the new suffix is prefilled."""
+
+    def __init__(self, model_path: str, n_ctx: int = 512, **kwargs):
+        from benchmarks.ollama_stub import REPLIES
+        time.sleep(SETTINGS["llm_load_s"])
+        self.weights = _weights(SETTINGS["llm_mb"])
+        self._replies = iter(REPLIES * 10_000)
+        self._cache: list = []          # tokens in the KV cache
+        self.prefilled = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> list:
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def create_completion(self, prompt: str, max_tokens: int = 16, stream: bool = False,
+                          stop=None, **kwargs):
+        from benchmarks.ollama_stub import _tokens
+        tokens = self._tokenize(prompt)
+        keep = 0
+        while keep < min(len(tokens) - 1, len(self._cache)) and tokens[keep] == self._cache[keep]:
+            keep += 1
+        time.sleep((len(tokens) - keep) / SETTINGS["llm_prompt_rate"])
+        self.prefilled += len(tokens) - keep
+        reply = _tokens(next(self._replies))[:max_tokens]
+        self._cache = tokens + reply
+
+        def chunks():
+            for tok in reply:
+                time.sleep(1 / SETTINGS["llm_token_rate"])
+                yield {"choices": [{"text": tok, "finish_reason": None}]}
+        if stream:
+            return chunks()
+        return {"choices": [{"text": "".join(c["choices"][0]["text"] for c in chunks())}]}
+
+
+# ─────────────────────────────── install ───────────────────────────────
+
+def install(**overrides) -> None:
+    """Register all fakes in sys.modules; *overrides* update SETTINGS."""
+    SETTINGS.update(overrides)
+
+    _module("board", SCL="SCL", SDA="SDA")
+    _module("busio", I2C=FakeI2C)
+    _module("adafruit_ssd1306", SSD1306_I2C=FakeSSD1306)
+
+    bme = _module("adafruit_bme280")
+    bme.basic = _module("adafruit_bme280.basic", Adafruit_BME280_I2C=FakeBME280)
+    ads = _module("adafruit_ads1x15")
+    ads.ads1115 = _module("adafruit_ads1x15.ads1115", ADS1115=FakeADS1115, P0=0)
+    ads.analog_in = _module("adafruit_ads1x15.analog_in", AnalogIn=FakeAnalogIn)
+    _module("adafruit_veml7700", VEML7700=FakeVEML7700)
+
+    _module("sounddevice", InputStream=FakeInputStream, OutputStream=FakeOutputStream,
+            play=_play, stop=lambda: None, query_devices=lambda: [],
+            default=types.SimpleNamespace(device=(0, 0)))
+    _module("webrtcvad", Vad=FakeVad)
+    _module("soundfile", write=_write_wav)
+    _module("whisper", load_model=_load_whisper)
+    torch = _module("torch", threads=4)
+    torch.get_num_threads = lambda: torch.threads
+    torch.set_num_threads = lambda n: setattr(torch, "threads", n)
+    _module("llama_cpp", Llama=FakeLlama)
+    _module("faster_whisper", WhisperModel=FakeCT2Model)
+    piper = _module("piper")
+    piper.voice = _module("piper.voice", PiperVoice=FakePiperVoice)
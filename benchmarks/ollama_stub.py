@@ -0,0 +1,188 @@
+# benchmarks/ollama_stub.py
+"""
+Local stand-in for Ollama's /api/generate (and /api/ps).
+
+Speaks the same JSON / NDJSON protocol as Ollama (keep-alive, chunked
+streaming, `context` tokens, load/prompt_eval/eval durations) with a
+deterministic cost model:
+
+    first token = prompt tokens / prompt_rate      (+ load_s while "unloaded")
+    each token  = 1 / token_rate
+
+Tokens already covered by a request's `context` are not evaluated again,
+so context reuse shows up in the numbers like it does on the real server.
+
+    python -m benchmarks.ollama_stub --port 11434 --token-rate 8
+"""
+import json
+import time
+import argparse
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+REPLIES = [
+    "I feel pretty good today. The light is just right for me.",
+    "My soil is a little dry. Could you give me some water soon?",
+    "It is warm and cosy here! Thanks for checking on me.",
+    "The air feels dry. A quick mist would make me happy.",
+]
+
+
+def _tokens(text: str):
+    """Rough word-piece split: every word keeps its trailing space."""
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + [words[-1]]
+
+
+class OllamaStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 token_rate: float = 10.0, prompt_rate: float = 150.0,
+                 load_s: float = 2.0, chars_per_token: float = 4.0, model_mb: float = 1700):
+        self.token_rate = token_rate
+        self.prompt_rate = prompt_rate
+        self.load_s = load_s
+        self.chars_per_token = chars_per_token
+        self.model_mb = model_mb          # what /api/ps reports while "loaded"
+        self.requests = 0
+        self.model = "stub"
+        self._loaded = False
+        self._replies = itertools.cycle(REPLIES)
+        # one model instance: generations are serialized like on a Pi
+        self._model = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self) -> "OllamaStub":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="ollama-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ── cost model ──
+    def _generate(self, body: dict):
+        """Yield (token, done, stats) while sleeping as a model would."""
+        t_start = time.perf_counter()
+        load_s = 0.0
+        if body.get("keep_alive") == 0 and not body.get("prompt"):
+            self._loaded = False        # unload request: nothing to generate
+            yield "", True, {"done_reason": "unload"}
+            return
+        if not self._loaded:
+            time.sleep(self.load_s)
+            load_s, self._loaded = self.load_s, True
+        if body.get("keep_alive") == 0:
+            self._loaded = False
+        context = list(body.get("context") or [])
+        prompt = body.get("prompt") or ""
+        n_prompt = max(1, int(len(prompt) / self.chars_per_token)) if prompt else 0
+        t0 = time.perf_counter()
+        time.sleep(n_prompt / self.prompt_rate)
+        prompt_s = time.perf_counter() - t0
+
+        limit = int((body.get("options") or {}).get("num_predict", 128))
+        tokens = _tokens(next(self._replies))[:limit] if prompt else []
+        t0 = time.perf_counter()
+        for tok in tokens:
+            time.sleep(1 / self.token_rate)
+            yield tok, False, None
+        eval_s = time.perf_counter() - t0
+
+        new_ctx = context + list(range(len(context), len(context) + n_prompt + len(tokens)))
+        yield "", True, {
+            "context": new_ctx,
+            "total_duration": int((time.perf_counter() - t_start) * 1e9),
+            "load_duration": int(load_s * 1e9),
+            "prompt_eval_count": n_prompt,
+            "prompt_eval_duration": int(prompt_s * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_s * 1e9),
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_chunk(self, obj: dict) -> None:
+                line = (json.dumps(obj) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path != "/api/ps":
+                    self.send_error(404)
+                    return
+                models = [{"name": stub.model, "model": stub.model,
+                           "size": int(stub.model_mb * 2**20)}] if stub._loaded else []
+                out = json.dumps({"models": models}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                stub.requests += 1
+                model = stub.model = body.get("model", "stub")
+                with stub._model:
+                    if body.get("stream", True):
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        for tok, done, stats in stub._generate(body):
+                            msg = {"model": model, "response": tok, "done": done}
+                            if stats:
+                                msg.update(stats)
+                            self._send_chunk(msg)
+                        self.wfile.write(b"0\r\n\r\n")
+                        return
+                    reply, stats = "", {}
+                    for tok, done, st in stub._generate(body):
+                        reply += tok
+                        stats = st or stats
+                out = json.dumps({"model": model, "response": reply, "done": True, **stats}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=10.0, help="generated tokens/s")
+    parser.add_argument("--prompt-rate", type=float, default=150.0, help="prompt tokens/s")
+    parser.add_argument("--load", type=float, default=2.0, help="cold model load in s")
+    args = parser.parse_args()
+    stub = OllamaStub(args.host, args.port, args.token_rate, args.prompt_rate, args.load)
+    print(f"Ollama stub on {stub.url}")
+    stub._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
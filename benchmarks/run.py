@@ -0,0 +1,384 @@
+# benchmarks/run.py
+"""
+End-to-end latency / load benchmark for variants/v1_rule_based – no Pi needed.
+
+Installs the fakes from benchmarks.fakes, starts the Ollama stub, imports
+app.py against them and serves it on a local port. It then fires /chat and
+/talk at the requested concurrency. End-to-end latency comes from the
+client; per-stage latency comes from the per-turn trace log that
+tracing.py writes. Results are written as JSON, and --compare checks them
+against an earlier run (e.g. from the previous commit).
+
+    python -m benchmarks.run --requests 40 --concurrency 4
+    python -m benchmarks.run --routes chat --env OLLAMA_CONTEXT_REUSE=1 \\
+        --compare benchmarks/results/<sha>.json
+
+Everything runs in a scratch directory, so no caches or logs of a real
+installation are touched.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+VARIANT_DIR = os.path.join(ROOT, "variants", "v1_rule_based")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+PROMPTS = [
+    "how are you feeling today",
+    "do you need water",
+    "is it too warm for you",
+    "what do you think about the light",
+    "tell me something about yourself",
+]
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"n": len(values), "p50": round(p50, 4), "p95": round(p95, 4),
+            "p99": round(p99, 4), "mean": round(float(arr.mean()), 4),
+            "max": round(float(arr.max()), 4)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Hardware-free benchmark of the v1 voice pipeline")
+    p.add_argument("--routes", default="chat,talk", help="comma-separated mix of chat/talk")
+    p.add_argument("--requests", type=int, default=20, help="measured requests in total")
+    p.add_argument("--concurrency", type=int, default=2)
+    p.add_argument("--warmup", type=int, default=2, help="unmeasured requests per route first")
+    p.add_argument("--mode", choices=["speak", "text"], default="speak")
+    p.add_argument("--plants", type=int, default=1,
+                   help="plants served by the hub (>1 writes a PLANTS_FILE and spreads requests)")
+    p.add_argument("--chatty", type=float, default=0.0,
+                   help="share of the requests sent for the first plant (0 = even spread)")
+    p.add_argument("--wav", default=os.path.join(ROOT, "test.wav"), help="clip replayed by the mic")
+    p.add_argument("--audio-speed", type=float, default=4.0,
+                   help="capture/playback clock relative to real time")
+    p.add_argument("--token-rate", type=float, default=10.0,
+                   help="LLM stub tokens/s (Ollama stub and PLANT_VARIANT=v2 alike)")
+    p.add_argument("--prompt-rate", type=float, default=150.0, help="LLM stub prompt tokens/s")
+    p.add_argument("--llm-load", type=float, default=2.0, help="LLM stub cold load in s")
+    p.add_argument("--whisper-rtf", type=float, default=0.4)
+    p.add_argument("--piper-rtf", type=float, default=0.25)
+    p.add_argument("--i2c-hz", type=int, default=400_000)
+    p.add_argument("--font", default=os.getenv("OLED_FONT", ""),
+                   help="TTF used for the emoji glyphs (default: first one found)")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                   help="extra app setting, e.g. OLLAMA_CONTEXT_REUSE=1 (repeatable)")
+    p.add_argument("--log-level", default="INFO", help="level of the app's log file")
+    p.add_argument("--timeout", type=float, default=180.0, help="per-request HTTP timeout")
+    p.add_argument("--out", default="", help="result file (default benchmarks/results/<commit>.json)")
+    p.add_argument("--compare", default="", help="baseline JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=0.15,
+                   help="relative p95 slowdown reported as a regression")
+    p.add_argument("--min-delta", type=float, default=0.01,
+                   help="absolute p95 slowdown in s below which nothing is a regression")
+    return p.parse_args(argv)
+
+
+def setup(args, workdir: str):
+    """Fakes, stub and environment in place, then import the app. Returns (app module, stub)."""
+    from benchmarks import fakes
+    from benchmarks.ollama_stub import OllamaStub
+
+    font = args.font or next((f for f in FONT_CANDIDATES if os.path.exists(f)), "")
+    if not font:
+        sys.exit("No TrueType font found for the OLED glyphs – pass --font /path/to/font.ttf")
+
+    fakes.install(wav=args.wav, audio_speed=args.audio_speed, i2c_hz=args.i2c_hz,
+                  whisper_rtf=args.whisper_rtf, piper_rtf=args.piper_rtf,
+                  llm_load_s=args.llm_load, llm_prompt_rate=args.prompt_rate,
+                  llm_token_rate=args.token_rate)
+    stub = OllamaStub(token_rate=args.token_rate, prompt_rate=args.prompt_rate,
+                      load_s=args.llm_load).start()
+
+    os.environ.update({
+        "OLLAMA_URL":          stub.url,
+        "OLED_FONT":           font,
+        "STT_DEVICE":          "0",
+        "RESPONSE_CACHE":      "0",           # identical prompts would all be hits
+        "RESPONSE_CACHE_FILE": os.path.join(workdir, "responses.json"),
+        "RESPONSE_BANK_FILE":  os.path.join(workdir, "response_bank.json"),
+        "TTS_CACHE_DIR":       os.path.join(workdir, "tts"),
+        "OLED_GLYPH_CACHE":    os.path.join(workdir, "glyphs.npz"),
+        "SENSOR_HISTORY_DIR":  os.path.join(workdir, "history"),
+        "TRACE_LOG":           os.path.join(workdir, "traces.jsonl"),
+        "TRACE_WINDOW":        str(max(500, args.requests)),
+        "LOG_LEVEL":           args.log_level,
+    })
+    if args.plants > 1:
+        # one soil probe per ADS1115 channel, four per chip
+        path = os.path.join(workdir, "plants.json")
+        with open(path, "w") as fh:
+            json.dump([{"id": f"plant{i}", "ads": hex(0x48 + i // 4), "channel": i % 4}
+                       for i in range(args.plants)], fh)
+        os.environ["PLANTS_FILE"] = path
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+
+    for path in (ROOT, VARIANT_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.chdir(workdir)               # plant_interface.log etc. land in the scratch dir
+    import app
+    return app, stub
+
+
+def serve(flask_app) -> str:
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def fire(base: str, jobs: List[tuple], concurrency: int, mode: str, timeout: float) -> List[dict]:
+    import requests
+    local = threading.local()
+
+    def one(job):
+        request_id, route, prompt, plant = job
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        payload = {"mode": mode, "session_id": f"bench-{threading.get_ident()}"}
+        if plant:
+            payload["plant_id"] = plant
+        if route == "chat":
+            payload["user_input"] = prompt
+        t0 = time.perf_counter()
+        try:
+            r = session.post(f"{base}/{route}", json=payload, timeout=timeout,
+                             headers={"X-Request-ID": request_id})
+            status = r.status_code
+        except requests.RequestException as exc:
+            status = type(exc).__name__
+        return {"id": request_id, "route": route, "plant": plant, "status": status,
+                "latency": time.perf_counter() - t0}
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, jobs))
+
+
+def read_traces(path: str, ids: set, wait: float = 60.0) -> Dict[str, dict]:
+    """Per-turn traces for *ids*; waits for turns still held by TTS playback."""
+    deadline = time.monotonic() + wait
+    traces: Dict[str, dict] = {}
+    while True:
+        if os.path.exists(path):
+            with open(path) as fh:
+                for line in fh:
+                    entry = json.loads(line)
+                    if entry["id"] in ids:
+                        traces[entry["id"]] = entry
+        if len(traces) >= len(ids) or time.monotonic() > deadline:
+            return traces
+        time.sleep(0.2)
+
+
+def summarize(results: List[dict], traces: Dict[str, dict], wall: float) -> dict:
+    routes, stages = {}, {}
+    for route in sorted({r["route"] for r in results}):
+        rows = [r for r in results if r["route"] == route]
+        ok = [r for r in rows if r["status"] == 200]
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        routes[route] = {
+            "requests": len(rows),
+            "ok": len(ok),
+            "status": statuses,
+            "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+            "latency_s": percentiles([r["latency"] for r in ok]),
+        }
+        per_stage: Dict[str, List[float]] = {}
+        answers: Dict[str, int] = {}
+        for r in ok:
+            trace = traces.get(r["id"])
+            if trace is None:
+                continue
+            answer = trace.get("tags", {}).get("answer")
+            if answer:
+                answers[answer] = answers.get(answer, 0) + 1
+            per_stage.setdefault("turn_total", []).append(trace["total_ms"] / 1000)
+            for stage, ms in trace["spans"].items():
+                per_stage.setdefault(stage, []).append(ms / 1000)
+        stages[route] = {s: percentiles(v) for s, v in sorted(per_stage.items())}
+        if answers:
+            # deadline mode: who answered (llm / bank_timeout / bank_busy / bank_error)
+            routes[route]["answers"] = answers
+    plants = {}
+    for plant in sorted({r["plant"] for r in results if r["plant"]}):
+        rows = [r for r in results if r["plant"] == plant]
+        ok = [r for r in rows if r["status"] == 200]
+        plants[plant] = {"requests": len(rows), "ok": len(ok),
+                         "latency_s": percentiles([r["latency"] for r in ok])}
+    out = {"routes": routes, "stages": stages}
+    if plants:
+        out["plants"] = plants
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float,
+            min_delta: float = 0.01) -> Tuple[List[str], int]:
+    """
+    Lines describing p95 changes and the number of regressions: slower by
+    more than *tolerance* (relative) and *min_delta* seconds (absolute).
+    """
+    lines, regressions = [], 0
+
+    def check(label, new, old):
+        nonlocal regressions
+        if not new or not old or not old.get("p95"):
+            return
+        delta = new["p95"] / old["p95"] - 1
+        mark = ""
+        if delta > tolerance and new["p95"] - old["p95"] > min_delta:
+            mark, regressions = "  << REGRESSION", regressions + 1
+        lines.append(f"  {label:<32} p95 {old['p95']:8.3f}s -> {new['p95']:8.3f}s "
+                     f"({delta:+.0%}){mark}")
+
+    for route, cur in current["routes"].items():
+        old = baseline.get("routes", {}).get(route)
+        if old:
+            check(f"{route} end-to-end", cur["latency_s"], old["latency_s"])
+        for stage, stats in current["stages"].get(route, {}).items():
+            check(f"{route}/{stage}", stats, baseline.get("stages", {}).get(route, {}).get(stage))
+    lines.append(f"{regressions} regression(s) beyond {tolerance:.0%}")
+    return lines, regressions
+
+
+def print_report(report: dict) -> None:
+    for route, r in report["routes"].items():
+        lat = r["latency_s"]
+        print(f"\n/{route}: {r['ok']}/{r['requests']} ok {r['status']}, "
+              f"{r['throughput_rps']} req/s")
+        if r.get("answers"):
+            print(f"  answered by {r['answers']}")
+        if lat:
+            print(f"  {'end-to-end':<18} p50 {lat['p50']:7.3f}s  p95 {lat['p95']:7.3f}s  "
+                  f"p99 {lat['p99']:7.3f}s")
+        for stage, s in report["stages"].get(route, {}).items():
+            print(f"  {stage:<18} p50 {s['p50']:7.3f}s  p95 {s['p95']:7.3f}s  "
+                  f"p99 {s['p99']:7.3f}s  (n={s['n']})")
+    if report.get("plants"):
+        print("\nper plant:")
+        for plant, r in report["plants"].items():
+            lat = r["latency_s"]
+            line = f"  {plant:<18} {r['ok']:>3}/{r['requests']:<3} ok"
+            if lat:
+                line += f"  p50 {lat['p50']:7.3f}s  p95 {lat['p95']:7.3f}s"
+            print(line)
+    res = report.get("residency")
+    if res:
+        loads: Dict[str, int] = {}
+        for e in res["events"]:
+            key = f"{e['event']} {e['model']}"
+            loads[key] = loads.get(key, 0) + 1
+        print(f"\nmodels: {res['resident_mb']} MB resident (budget {res['budget_mb']}), "
+              f"rss {res['rss_mb']}")
+        if loads:
+            print(f"  events {loads}")
+
+
+def plant_for(i: int, args) -> Optional[str]:
+    """Plant of the *i*-th request: the first one gets a --chatty share, the rest rotate."""
+    if args.plants <= 1:
+        return None
+    if not args.chatty:
+        return f"plant{i % args.plants}"
+    # exactly round(n * chatty) of the first n requests go to plant0
+    if int((i + 1) * args.chatty + 0.5) > int(i * args.chatty + 0.5):
+        return "plant0"
+    return f"plant{1 + i % (args.plants - 1)}"
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    out = os.path.abspath(args.out) if args.out else os.path.join(RESULTS_DIR, f"{git_commit()}.json")
+    compare_to = os.path.abspath(args.compare) if args.compare else ""
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="plantbench-")
+    app, stub = setup(args, workdir)
+    from benchmarks import fakes
+    base = serve(app.app)
+
+    prompts = itertools.cycle(PROMPTS)
+    warm = [(f"warm-{route}-{i}", route, next(prompts), None)
+            for i in range(args.warmup) for route in routes]
+    fire(base, warm, 1, args.mode, args.timeout)
+
+    mix = itertools.cycle(routes)
+    jobs = [(f"bench-{i}", next(mix), next(prompts), plant_for(i, args))
+            for i in range(args.requests)]
+    i2c_before = dict(fakes.STATS)
+    t0 = time.perf_counter()
+    results = fire(base, jobs, args.concurrency, args.mode, args.timeout)
+    wall = time.perf_counter() - t0
+    traces = read_traces(os.environ["TRACE_LOG"], {j[0] for j in jobs})
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "wall_s": round(wall, 3),
+            "workdir": workdir,
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        **summarize(results, traces, wall),
+        "i2c": {k: round(v - i2c_before[k], 4) for k, v in fakes.STATS.items()},
+        "llm_requests": stub.requests,
+        "residency": app.models.status(),
+    }
+    print_report(report)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nResults written to {out}")
+
+    if compare_to:
+        with open(compare_to) as fh:
+            lines, regressions = compare(report, json.load(fh), args.tolerance,
+                                          args.min_delta)
+        print(f"\nCompared with {compare_to}:")
+        print("\n".join(lines))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
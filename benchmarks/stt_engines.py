@@ -0,0 +1,164 @@
+# benchmarks/stt_engines.py
+"""
+Offline comparison of the STT engines (see STT/engines.py) on local WAVs.
+
+Every engine spec (as in STT_MODEL) is loaded once for each combination of
+--threads and --beam-size. It then transcribes every fixture --repeat
+times. The report gives, per configuration:
+
+  load_s  model load time
+  rtf     transcribe seconds per second of audio (median of the repeats)
+  wer     word error rate against the reference transcript
+
+A fixture's reference is a human transcription in the text file next to
+it (clip.wav -> clip.txt). Fixtures without one, like the bundled
+test.wav, are timed but not scored: their wer is n/a.
+
+    python -m benchmarks.stt_engines --engines tiny,ct2:tiny --threads 2,4 \\
+        --lang en recordings/
+    python -m benchmarks.stt_engines --fake     # check the harness without models
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import List, Optional
+
+import numpy as np
+
+from benchmarks.run import ROOT, git_commit
+
+_PUNCT = re.compile(r"[^\w\s']")
+
+
+def words(text: str) -> List[str]:
+    return _PUNCT.sub(" ", text.casefold()).split()
+
+
+def edit_distance(ref: List[str], hyp: List[str]) -> int:
+    """Word-level Levenshtein distance (substitutions + deletions + insertions)."""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i]
+        for j, h in enumerate(hyp, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h)))
+        prev = cur
+    return prev[-1]
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    ref = words(reference)
+    return edit_distance(ref, words(hypothesis)) / max(1, len(ref))
+
+
+def fixtures(paths: List[str]) -> List[dict]:
+    """WAV files (directories are searched) with their reference text, if any."""
+    wavs = []
+    for path in paths:
+        if os.path.isdir(path):
+            wavs += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".wav"))
+        else:
+            wavs.append(path)
+    out = []
+    for wav in wavs:
+        txt = os.path.splitext(wav)[0] + ".txt"
+        ref = None
+        if os.path.exists(txt):
+            with open(txt, encoding="utf-8") as fh:
+                ref = fh.read().strip() or None
+        out.append({"path": wav, "reference": ref})
+    return out
+
+
+def run_engine(spec: str, clips: List[dict], language: Optional[str], threads: int,
+               beam_size: int, repeat: int) -> dict:
+    from variants.v1_rule_based.STT.engines import load_engine
+    t0 = time.perf_counter()
+    engine = load_engine(spec, threads=threads, beam_size=beam_size)
+    load_s = time.perf_counter() - t0
+
+    rows, errors, ref_words, audio_s, busy_s = [], 0, 0, 0.0, 0.0
+    for clip in clips:
+        seconds = len(clip["audio"]) / 16000
+        times, text = [], ""
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            text, _ = engine.transcribe(clip["audio"], language)
+            times.append(time.perf_counter() - t0)
+        took = float(np.median(times))
+        row = {"path": clip["path"], "audio_s": round(seconds, 2),
+               "rtf": round(took / seconds, 3), "text": text}
+        if clip["reference"] is not None:
+            ref = words(clip["reference"])
+            n = edit_distance(ref, words(text))
+            row["wer"] = round(n / max(1, len(ref)), 3)
+            errors, ref_words = errors + n, ref_words + len(ref)
+        rows.append(row)
+        audio_s, busy_s = audio_s + seconds, busy_s + took
+    del engine
+    return {
+        "engine": spec, "threads": threads, "beam_size": beam_size,
+        "load_s": round(load_s, 3),
+        "rtf": round(busy_s / audio_s, 3) if audio_s else None,
+        "wer": round(errors / ref_words, 3) if ref_words else None,
+        "clips": rows,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Word error rate and real-time factor per STT engine")
+    p.add_argument("wavs", nargs="*", default=[os.path.join(ROOT, "test.wav")],
+                   help="WAV files or directories (reference text in <name>.txt)")
+    p.add_argument("--engines", default="tiny,ct2:tiny", help="comma-separated STT_MODEL specs")
+    p.add_argument("--threads", default="0", help="comma-separated thread counts (0 = library default)")
+    p.add_argument("--beam-size", default="1", help="comma-separated beam sizes")
+    p.add_argument("--lang", default=None)
+    p.add_argument("--repeat", type=int, default=3, help="transcriptions per clip (median is used)")
+    p.add_argument("--fake", action="store_true", help="use the fake engines from benchmarks.fakes")
+    p.add_argument("--out", default="", help="also write the results as JSON")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.fake:
+        from benchmarks import fakes
+        fakes.install()
+    from variants.v1_rule_based.STT.whisper_test import read_wav
+
+    clips = fixtures(args.wavs)
+    if not clips:
+        sys.exit("No WAV fixtures found")
+    for clip in clips:
+        clip["audio"] = read_wav(clip["path"]).astype(np.float32) / 32768.0
+
+    results = []
+    for spec in (s.strip() for s in args.engines.split(",") if s.strip()):
+        for threads in (int(t) for t in args.threads.split(",")):
+            for beam in (int(b) for b in args.beam_size.split(",")):
+                try:
+                    res = run_engine(spec, clips, args.lang, threads, beam, args.repeat)
+                except ImportError as exc:
+                    print(f"{spec:<14} not available ({exc})")
+                    continue
+                results.append(res)
+                wer_text = f"{res['wer']:.1%}" if res["wer"] is not None else "n/a"
+                print(f"{spec:<14} threads {threads or '-':>2}  beam {beam}  "
+                      f"load {res['load_s']:6.2f}s  rtf {res['rtf']:6.3f}  wer {wer_text}")
+
+    if args.out:
+        report = {"meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           "python": platform.python_version(), "machine": platform.machine(),
+                           "fake": args.fake},
+                  "results": results}
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
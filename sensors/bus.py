@@ -0,0 +1,11 @@
+# sensors/bus.py
+"""
+Process-wide lock for the I2C bus on SCL/SDA.
+
+The BME280, ADS1115, VEML7700 and the SSD1306 OLED share one bus; every
+transaction batch (one sensor read, one run of display pages) holds this
+lock so the sampler and display animations interleave cleanly.
+"""
+import threading
+
+I2C_LOCK = threading.RLock()
@@ -0,0 +1,289 @@
+# sensors/history.py
+"""
+Compact on-disk history of the five sensor readings.
+
+Three fixed-record ring files, memory-mapped:
+  raw.ring  – one record per sample       (t, 5 × float32)                 28 B
+  1m.ring   – one rollup per minute       (t, n, 5 × cnt/min/max/mean)     92 B
+  1h.ring   – one rollup per hour         (same layout)
+
+With the defaults (7 days raw, 90 days of minutes, 5 years of hours) the
+whole store stays below 30 MB regardless of uptime, and nothing is ever
+rewritten except the slot being appended. n counts the samples of a
+period, cnt the non-missing ones per field; means are weighted by cnt.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("sensors")
+
+FIELDS = ("temperature_c", "humidity_pct", "pressure_hpa", "soil_moisture_pct", "light_lux")
+
+HISTORY_DIR      = os.getenv("SENSOR_HISTORY_DIR", os.path.expanduser("~/.local/share/plantbot/history"))
+HISTORY_INTERVAL = float(os.getenv("SENSOR_HISTORY_INTERVAL", 1.0))   # seconds between raw samples
+HISTORY_FLUSH_S  = float(os.getenv("SENSOR_HISTORY_FLUSH", 60.0))     # msync period
+RAW_DAYS         = float(os.getenv("SENSOR_HISTORY_RAW_DAYS", 7))
+MINUTE_DAYS      = float(os.getenv("SENSOR_HISTORY_MINUTE_DAYS", 90))
+HOUR_DAYS        = float(os.getenv("SENSOR_HISTORY_HOUR_DAYS", 5 * 365))
+
+RAW_DTYPE = np.dtype([("t", "<f8"), ("v", "<f4", len(FIELDS))])
+ROLLUP_DTYPE = np.dtype([
+    ("t", "<f8"), ("n", "<u4"), ("cnt", "<u4", len(FIELDS)),
+    ("min", "<f4", len(FIELDS)), ("max", "<f4", len(FIELDS)), ("mean", "<f4", len(FIELDS)),
+])
+
+_MAGIC = 0x504C414E54484953   # "PLANTHIS"
+_HEADER = 64
+
+
+class _Ring:
+    """Fixed-capacity ring of records in a memory-mapped file, oldest overwritten first."""
+
+    def __init__(self, path: str, dtype: np.dtype, capacity: int):
+        self.path = path
+        self.dtype = dtype
+        self.capacity = capacity
+        size = _HEADER + capacity * dtype.itemsize
+        fresh = not os.path.exists(path) or os.path.getsize(path) != size
+        if fresh:
+            if os.path.exists(path):
+                logger.warning("History ring %s has a different layout – starting over", path)
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self._hdr = np.memmap(path, dtype="<u8", mode="r+", shape=(_HEADER // 8,))
+        if fresh or self._hdr[0] != _MAGIC or self._hdr[1] != capacity or self._hdr[2] != dtype.itemsize:
+            self._hdr[:] = 0
+            self._hdr[:3] = (_MAGIC, capacity, dtype.itemsize)
+        self._rec = np.memmap(path, dtype=dtype, mode="r+", offset=_HEADER, shape=(capacity,))
+
+    @property
+    def count(self) -> int:
+        """Total records ever appended."""
+        return int(self._hdr[3])
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, record) -> None:
+        count = self.count
+        self._rec[count % self.capacity] = record
+        self._hdr[3] = count + 1
+
+    def last(self):
+        if not self.count:
+            return None
+        return self._rec[(self.count - 1) % self.capacity]
+
+    def since(self, t0: float) -> np.ndarray:
+        """Records with t >= *t0*, oldest first (a copy)."""
+        count, cap = self.count, self.capacity
+        if count <= cap:
+            segments = [self._rec[:count]]
+        else:
+            head = count % cap
+            segments = [self._rec[head:], self._rec[:head]]
+        parts = [seg[np.searchsorted(seg["t"], t0):] for seg in segments]
+        return np.concatenate(parts) if parts else np.empty(0, self.dtype)
+
+    def flush(self) -> None:
+        self._rec.flush()
+        self._hdr.flush()
+
+
+class _Bucket:
+    """Running min/max/mean of one rollup period, kept in RAM until it closes."""
+
+    def __init__(self, period: float):
+        self.period = period
+        self.start: Optional[float] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.cnt = np.zeros(len(FIELDS))
+        self.sum = np.zeros(len(FIELDS))
+        self.min = np.full(len(FIELDS), np.nan)
+        self.max = np.full(len(FIELDS), np.nan)
+
+    def add(self, t: float, v: np.ndarray):
+        """Add a sample; returns the finished rollup record when a period closes."""
+        start = t - t % self.period
+        done = None
+        if self.start is not None and start != self.start and self.n:
+            done = self.record()
+            self.reset()
+        self.start = start
+        ok = ~np.isnan(v)
+        self.n += 1
+        self.cnt += ok
+        self.sum += np.where(ok, v, 0.0)
+        self.min = np.fmin(self.min, v)
+        self.max = np.fmax(self.max, v)
+        return done
+
+    def record(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum / self.cnt
+        return (self.start, self.n, self.cnt, self.min, self.max, mean)
+
+
+class SensorHistory:
+    def __init__(self, directory: str = HISTORY_DIR,
+                 raw_days: float = RAW_DAYS,
+                 minute_days: float = MINUTE_DAYS,
+                 hour_days: float = HOUR_DAYS,
+                 interval: float = HISTORY_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.interval = interval
+        self.raw = _Ring(os.path.join(directory, "raw.ring"), RAW_DTYPE,
+                         max(1, int(raw_days * 86400 / interval)))
+        self.minutes = _Ring(os.path.join(directory, "1m.ring"), ROLLUP_DTYPE,
+                             max(1, int(minute_days * 1440)))
+        self.hours = _Ring(os.path.join(directory, "1h.ring"), ROLLUP_DTYPE,
+                           max(1, int(hour_days * 24)))
+        self._buckets = ((_Bucket(60.0), self.minutes), (_Bucket(3600.0), self.hours))
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._resume_buckets()
+
+    def _resume_buckets(self) -> None:
+        """Rebuild the open minute/hour buckets from raw samples after a restart."""
+        last = self.raw.last()
+        if last is None:
+            return
+        for bucket, _ in self._buckets:
+            start = float(last["t"]) - float(last["t"]) % bucket.period
+            for rec in self.raw.since(start):
+                bucket.add(float(rec["t"]), rec["v"].astype(np.float64))
+
+    # ── writing ──
+    def append(self, values, t: Optional[float] = None) -> None:
+        """Append one sample; *values* in FIELDS order (NaN for missing)."""
+        t = time.time() if t is None else t
+        v = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            last = self.raw.last()
+            if last is not None and t <= float(last["t"]):
+                return      # keep the rings sorted by time
+            self.raw.append((t, v))
+            for bucket, ring in self._buckets:
+                done = bucket.add(t, v)
+                if done is not None:
+                    ring.append(done)
+            if time.monotonic() - self._last_flush >= HISTORY_FLUSH_S:
+                self.flush()
+
+    def append_readings(self, readings, t: Optional[float] = None) -> None:
+        self.append([readings.get(f, np.nan) for f in FIELDS], t)
+
+    def flush(self) -> None:
+        for ring in (self.raw, self.minutes, self.hours):
+            ring.flush()
+        self._last_flush = time.monotonic()
+
+    # ── queries ──
+    def _tier(self, seconds: float):
+        """Pick the finest tier whose retention covers the window."""
+        raw_span = self.raw.capacity * self.interval
+        if seconds <= raw_span and seconds <= 6 * 3600:
+            return "raw"
+        if seconds <= self.minutes.capacity * 60 and seconds <= 14 * 86400:
+            return "1m"
+        return "1h"
+
+    def window(self, seconds: float, tier: str = "auto",
+               now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Samples of the last *seconds*: (timestamps [N], values [N, 5]).
+        Rollup tiers return per-period means, including the open period.
+        """
+        now = time.time() if now is None else now
+        t0 = now - seconds
+        if tier == "auto":
+            tier = self._tier(seconds)
+        if tier == "raw":
+            with self._lock:
+                rec = self.raw.since(t0)
+            return rec["t"], rec["v"].astype(np.float64)
+        rec = self._rollups(tier, t0)
+        return rec["t"], rec["mean"].astype(np.float64)
+
+    def _rollups(self, tier: str, t0: float) -> np.ndarray:
+        """
+        Rollup records of *tier* ("1m" or "1h") whose period overlaps the
+        window starting at *t0*, including the open period. window() and
+        stats() both select their buckets here, so they agree on the edge.
+        """
+        bucket, ring = self._buckets[0] if tier == "1m" else self._buckets[1]
+        with self._lock:
+            rec = ring.since(t0 - bucket.period)
+            if bucket.n:
+                rec = np.append(rec, np.array([bucket.record()], dtype=ROLLUP_DTYPE))
+        return rec[rec["t"] + bucket.period > t0]
+
+    def last_minutes(self, minutes: float) -> Dict[str, np.ndarray]:
+        t, v = self.window(minutes * 60)
+        out = {"t": t}
+        out.update({f: v[:, i] for i, f in enumerate(FIELDS)})
+        return out
+
+    def stats(self, field: str, seconds: float, now: Optional[float] = None) -> dict:
+        """min/max/mean/n of *field* over the last *seconds*."""
+        i = FIELDS.index(field)
+        tier = self._tier(seconds)
+        if tier == "raw":
+            _, v = self.window(seconds, "raw", now)
+            col = v[:, i]
+            col = col[~np.isnan(col)]
+            if not len(col):
+                return {"min": None, "max": None, "mean": None, "n": 0}
+            return {"min": float(col.min()), "max": float(col.max()),
+                    "mean": float(col.mean()), "n": int(len(col))}
+
+        now = time.time() if now is None else now
+        rec = self._rollups(tier, now - seconds)
+        cnt = rec["cnt"][:, i].astype(np.float64)
+        mins, maxs, means = rec["min"][:, i], rec["max"][:, i], rec["mean"][:, i]
+        ok = cnt > 0
+        if not ok.any():
+            return {"min": None, "max": None, "mean": None, "n": 0}
+        return {"min": float(np.nanmin(mins)), "max": float(np.nanmax(maxs)),
+                "mean": float(np.average(means[ok], weights=cnt[ok])), "n": int(cnt.sum())}
+
+    def trend(self, field: str, seconds: float, now: Optional[float] = None) -> Optional[float]:
+        """Least-squares slope of *field* over the window, in units per hour."""
+        t, v = self.window(seconds, now=now)
+        col = v[:, FIELDS.index(field)]
+        ok = ~np.isnan(col)
+        if ok.sum() < 2:
+            return None
+        tt = t[ok] - t[ok][0]
+        if not tt.any():
+            return None
+        slope = np.polyfit(tt, col[ok], 1)[0]
+        return float(slope * 3600.0)
+
+    # ── wiring ──
+    def attach(self, sampler) -> None:
+        """Record the sampler's snapshots, at most one per *interval*."""
+        def _on_snapshot(snap):
+            last = self.raw.last()
+            now = time.time()
+            if last is None or now - float(last["t"]) >= self.interval:
+                self.append_readings(snap.package["readings"], now)
+        sampler.subscribe(_on_snapshot)
+
+
+_HISTORY: Optional[SensorHistory] = None
+
+
+def get_history() -> SensorHistory:
+    global _HISTORY
+    if _HISTORY is None:
+        _HISTORY = SensorHistory()
+    return _HISTORY
@@ -0,0 +1,139 @@
+# sensors/nodes.py
+"""
+Lightweight protocol for remote sensor nodes.
+
+A node (a Pi Zero or ESP32 next to a plant in another room) sends one UDP
+datagram of UTF-8 JSON per reading to the hub:
+
+  {"plant": "balcony", "token": "…",
+   "readings": {"temperature_c": 21.5, "humidity_pct": 40.0, "pressure_hpa": 1011.0,
+                "soil_moisture_pct": 37.0, "light_lux": 820.0}}
+
+Missing readings are treated as unknown. The hub timestamps on receipt,
+so node clocks don't matter; a lost datagram just means the snapshot is
+one interval older. With PLANT_NODE_TOKEN set, datagrams without the
+same token are dropped.
+
+Run this module on a node to push its local sensors:
+  python -m sensors.nodes --hub 192.168.1.20 --plant balcony
+"""
+import os
+import hmac
+import json
+import time
+import socket
+import logging
+import threading
+from typing import Mapping, Optional
+
+from .history import FIELDS
+
+logger = logging.getLogger("sensors")
+
+NODE_PORT  = int(os.getenv("PLANT_NODE_PORT", 5055))
+NODE_BIND  = os.getenv("PLANT_NODE_BIND", "0.0.0.0")
+NODE_TOKEN = os.getenv("PLANT_NODE_TOKEN", "")
+
+MAX_DATAGRAM = 1024
+
+
+def encode(plant_id: str, readings: Mapping, token: str = NODE_TOKEN) -> bytes:
+    msg = {"plant": plant_id,
+           "readings": {k: float(v) for k, v in readings.items() if k in FIELDS and v is not None}}
+    if token:
+        msg["token"] = token
+    return json.dumps(msg, separators=(",", ":")).encode("utf-8")
+
+
+def send_readings(host: str, plant_id: str, readings: Mapping, port: int = NODE_PORT,
+                  token: str = NODE_TOKEN, sock: Optional[socket.socket] = None) -> None:
+    """Send one reading to the hub (fire and forget)."""
+    own = sock is None
+    sock = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(encode(plant_id, readings, token), (host, port))
+    finally:
+        if own:
+            sock.close()
+
+
+class NodeListener:
+    """Receives node datagrams and pushes them into the remote plants' samplers."""
+
+    def __init__(self, registry, host: str = NODE_BIND, port: int = NODE_PORT,
+                 token: str = NODE_TOKEN):
+        self.registry = registry
+        self.token = token
+        self.received = 0
+        self.rejected = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self.address = self._sock.getsockname()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "NodeListener":
+        self._thread = threading.Thread(target=self._run, name="sensor-nodes", daemon=True)
+        self._thread.start()
+        logger.info("Listening for sensor nodes on %s:%d", *self.address)
+        return self
+
+    def stop(self) -> None:
+        self._sock.close()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(MAX_DATAGRAM)
+            except OSError:
+                return          # socket closed
+            try:
+                ok = self.handle(data)
+            except Exception:
+                # one bad datagram must not stop the updates of every remote plant
+                logger.exception("Sensor node datagram from %s failed", addr[0])
+                ok = False
+            if ok:
+                self.received += 1
+            else:
+                self.rejected += 1
+                logger.warning("Dropped sensor node datagram from %s", addr[0])
+
+    def handle(self, data: bytes) -> bool:
+        """
+        Apply one datagram; False if it is malformed, unauthorised, for an
+        unknown plant or its readings could not be applied.
+        """
+        try:
+            msg = json.loads(data.decode("utf-8"))
+            if self.token and not hmac.compare_digest(str(msg.get("token", "")), self.token):
+                return False
+            plant = self.registry.get(str(msg["plant"]))
+            readings = {k: float(v) for k, v in msg["readings"].items() if k in FIELDS}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False
+        if not plant.remote:
+            return False
+        try:
+            plant.sampler.push(readings)
+        except Exception:
+            logger.exception("Readings for plant %s not applied", plant.id)
+            return False
+        return True
+
+
+if __name__ == "__main__":
+    import argparse
+    from .main import main as read_local
+
+    parser = argparse.ArgumentParser(description="Push this node's sensor readings to the hub")
+    parser.add_argument("--hub", required=True)
+    parser.add_argument("--plant", required=True)
+    parser.add_argument("--port", type=int, default=NODE_PORT)
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        while True:
+            send_readings(args.hub, args.plant, read_local()["readings"], args.port, sock=s)
+            time.sleep(args.interval)
@@ -0,0 +1,219 @@
+# sensors/plants.py
+"""
+Plant identities for hub mode.
+
+Without PLANTS_FILE there is one plant, "default", read by the module-level
+sensor drivers exactly as before. PLANTS_FILE points at a JSON list, one
+entry per plant:
+
+  [
+    {"id": "monstera", "name": "Monstera", "bme280": "0x76", "ads": "0x48", "channel": 0},
+    {"id": "fern",     "ads": "0x48", "channel": 1, "priority": 1},
+    {"id": "balcony",  "remote": true}
+  ]
+
+Local plants are addressed on the hub's I2C bus: their own BME280 (0x76 or
+0x77; without one they share the hub's room air), an ADS1115 address plus
+channel for the soil probe (four probes per ADS1115) and the one VEML7700
+(fixed address, shared). Remote plants are fed by nodes over UDP (see
+sensors/nodes.py). Each plant gets its own sampler and history; a lower
+"priority" value is served first by the shared LLM/STT/TTS stages.
+"""
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, Iterator, List, Mapping, Optional
+
+from .bus import I2C_LOCK
+from .history import HISTORY_DIR, SensorHistory, get_history
+from .sampler import (BME_INTERVAL, LIGHT_INTERVAL, SOIL_INTERVAL, RemoteSampler,
+                      SensorSampler, get_sampler)
+from .soil_moisture_sensor import voltage_to_pct
+from .bme280_sensor import get_bme_readings
+from .veml7700_lightsensor import get_light_lux
+
+logger = logging.getLogger("sensors")
+
+PLANTS_FILE   = os.getenv("PLANTS_FILE", "")
+DEFAULT_PLANT = "default"
+
+_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+
+class UnknownPlant(KeyError):
+    """No plant with this ID is configured."""
+
+
+class Plant:
+    def __init__(self, plant_id: str, name: Optional[str] = None, priority: int = 0,
+                 sampler: Optional[SensorSampler] = None,
+                 history: Optional[SensorHistory] = None):
+        self.id = plant_id
+        self.name = name or plant_id
+        self.priority = priority
+        self.sampler = sampler if sampler is not None else RemoteSampler()
+        self._history = history
+
+    @property
+    def remote(self) -> bool:
+        return isinstance(self.sampler, RemoteSampler)
+
+    @property
+    def history(self) -> SensorHistory:
+        if self._history is None:
+            self._history = SensorHistory(os.path.join(HISTORY_DIR, "plants", self.id))
+        return self._history
+
+    def start(self) -> "Plant":
+        """Start sampling and record what is sampled in the plant's history."""
+        self.history.attach(self.sampler)
+        self.sampler.start()
+        return self
+
+    def latest_package(self, max_age: float) -> Optional[Mapping]:
+        snap = self.sampler.latest()
+        if snap is None or snap.age > max_age:
+            return None
+        return snap.package
+
+    def as_dict(self) -> dict:
+        snap = self.sampler.latest()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "priority": self.priority,
+            "source": "remote" if self.remote else "local",
+            "mood": snap.package["overall"] if snap else None,
+            "age_s": round(snap.age, 1) if snap else None,
+        }
+
+
+# ───────────────────────── local sensor sets ─────────────────────────
+
+_DEVICES: Dict[tuple, object] = {}
+_BUS = None
+
+
+def _device(kind: str, address: int):
+    """One driver object per (kind, address), all on the shared bus."""
+    global _BUS
+    key = (kind, address)
+    with I2C_LOCK:
+        if key in _DEVICES:
+            return _DEVICES[key]
+        import board
+        import busio
+        if _BUS is None:
+            _BUS = busio.I2C(board.SCL, board.SDA)
+        if kind == "bme280":
+            from adafruit_bme280 import basic as adafruit_bme280
+            dev = adafruit_bme280.Adafruit_BME280_I2C(_BUS, address=address)
+        elif kind == "ads1115":
+            from adafruit_ads1x15.ads1115 import ADS1115
+            dev = ADS1115(_BUS, address=address)
+            dev.gain = 1
+        else:
+            raise ValueError(f"unknown device kind {kind!r}")
+        _DEVICES[key] = dev
+        return dev
+
+
+def _address(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def _local_sensors(spec: Mapping) -> Dict[str, tuple]:
+    """
+    Sampler sensor table for one plant. A missing BME280 falls back to the
+    hub's room air; a missing soil probe reads as unknown (None), never as
+    the module-level probe, which belongs to another plant.
+    """
+    sensors = {
+        "bme280": (get_bme_readings, BME_INTERVAL),
+        "soil":   (lambda: None, SOIL_INTERVAL),
+        "light":  (get_light_lux, LIGHT_INTERVAL),
+    }
+    try:
+        bme = _address(spec.get("bme280"))
+        if bme is not None:
+            dev = _device("bme280", bme)
+            sensors["bme280"] = (lambda: (dev.temperature, dev.humidity, dev.pressure),
+                                 BME_INTERVAL)
+    except Exception as exc:
+        logger.warning("Plant %s: BME280 not available – using the hub's readings (%s)",
+                       spec.get("id"), exc)
+    try:
+        ads = _address(spec.get("ads", 0x48))
+        from adafruit_ads1x15.analog_in import AnalogIn
+        chan = AnalogIn(_device("ads1115", ads), int(spec.get("channel", 0)))
+        sensors["soil"] = (lambda: voltage_to_pct(chan.voltage), SOIL_INTERVAL)
+    except Exception as exc:
+        logger.warning("Plant %s: soil probe not available – soil moisture unknown (%s)",
+                       spec.get("id"), exc)
+    return sensors
+
+
+# ───────────────────────────── registry ─────────────────────────────
+
+class PlantRegistry:
+    def __init__(self, plants: List[Plant]):
+        self._plants: Dict[str, Plant] = {p.id: p for p in plants}
+        self.default = plants[0]
+
+    def __iter__(self) -> Iterator[Plant]:
+        return iter(self._plants.values())
+
+    def __len__(self) -> int:
+        return len(self._plants)
+
+    def get(self, plant_id: Optional[str] = None) -> Plant:
+        """The plant with *plant_id*; the first configured one if none is given."""
+        if not plant_id:
+            return self.default
+        try:
+            return self._plants[plant_id]
+        except KeyError:
+            raise UnknownPlant(plant_id) from None
+
+    @property
+    def remote(self) -> List[Plant]:
+        return [p for p in self if p.remote]
+
+
+def load_plants(specs: List[Mapping]) -> List[Plant]:
+    plants = []
+    for spec in specs:
+        plant_id = str(spec.get("id", ""))
+        if not _ID.match(plant_id):
+            raise ValueError(f"invalid plant id {plant_id!r} (lowercase letters, digits, - and _)")
+        if any(p.id == plant_id for p in plants):
+            raise ValueError(f"duplicate plant id {plant_id!r}")
+        sampler = None if spec.get("remote") else SensorSampler(_local_sensors(spec))
+        plants.append(Plant(plant_id, spec.get("name"), int(spec.get("priority", 0)), sampler))
+    if not plants:
+        raise ValueError("no plants configured")
+    return plants
+
+
+_REGISTRY: Optional[PlantRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> PlantRegistry:
+    """Process-wide registry, from PLANTS_FILE or the single default plant."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            if PLANTS_FILE:
+                with open(PLANTS_FILE, encoding="utf-8") as f:
+                    plants = load_plants(json.load(f))
+                logger.info("Hub mode: %d plants from %s", len(plants), PLANTS_FILE)
+            else:
+                # single-plant mode: the process-wide sampler and history as before
+                plants = [Plant(DEFAULT_PLANT, sampler=get_sampler(), history=get_history())]
+            _REGISTRY = PlantRegistry(plants)
+        return _REGISTRY
@@ -0,0 +1,142 @@
+# sensors/rules.py – rule base that explains the state of the plant
+"""
+Data-driven plant status rules.
+
+THRESHOLDS maps every factor to a reading and a list of (upper bound, label)
+bands; OVERRIDES lists extreme conditions that replace the overall mood,
+first match wins. Both tables are compiled once into numpy arrays, so the
+same evaluator scores a single reading or a whole batch of history.
+
+The rules live with the sensors so that a remote node (sensors.nodes)
+scores its readings without any of the app variants installed.
+"""
+import operator
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+
+INF = float("inf")
+
+# factor -> (reading, [(upper bound (exclusive), label), ...])
+THRESHOLDS: Dict[str, Tuple[str, List[Tuple[float, str]]]] = {
+    "temperature": ("temperature_c", [
+        (10,  "highly_stressed"),
+        (15,  "moderately_stressed"),
+        (27,  "happy"),
+        (30,  "moderately_stressed"),
+        (INF, "highly_stressed"),
+    ]),
+    "soil_moisture": ("soil_moisture_pct", [
+        (20,  "highly_stressed"),
+        (35,  "moderately_stressed"),
+        (70,  "happy"),
+        (80,  "moderately_stressed"),
+        (INF, "highly_stressed"),
+    ]),
+    "humidity": ("humidity_pct", [
+        (20,  "highly_stressed"),
+        (35,  "moderately_stressed"),
+        (70,  "happy"),
+        (80,  "moderately_stressed"),
+        (INF, "highly_stressed"),
+    ]),
+    "light": ("light_lux", [
+        (1,     "very_dark"),
+        (10,    "lightly_dark"),
+        (1000,  "ambient"),
+        (10000, "sunny"),
+        (INF,   "very_sunny"),
+    ]),
+}
+
+# factors whose labels feed the stress score (light only acts via overrides)
+STRESS_FACTORS = ("temperature", "soil_moisture", "humidity")
+STRESS_SCORE = {"happy": 0, "moderately_stressed": 1, "highly_stressed": 2}
+
+# (reading, op, value, mood) – checked top to bottom, first match wins
+OVERRIDES: List[Tuple[str, str, float, str]] = [
+    ("soil_moisture_pct", ">",  80,    "very_moist"),
+    ("soil_moisture_pct", "<",  20,    "very_dry"),
+    ("temperature_c",     ">",  30,    "very_hot"),
+    ("temperature_c",     "<",  10,    "very_cold"),
+    ("humidity_pct",      ">",  80,    "very_humid"),
+    ("humidity_pct",      "<",  20,    "very_dry_air"),
+    ("light_lux",         "<",  1,     "light_deprived"),
+    ("light_lux",         ">=", 10000, "very_happy"),
+]
+
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+class CompiledRules:
+    def __init__(self, thresholds=THRESHOLDS, overrides=OVERRIDES,
+                 stress_factors=STRESS_FACTORS, stress_score=STRESS_SCORE):
+        self.factors = []
+        for factor, (reading, bands) in thresholds.items():
+            bounds = np.array([b for b, _ in bands[:-1]], dtype=np.float64)
+            labels = np.array([label for _, label in bands] + ["unknown"], dtype=object)
+            score = np.array([stress_score.get(label, 0) for label in labels], dtype=np.int8)
+            self.factors.append((factor, reading, bounds, labels, score))
+        self.stress_factors = tuple(stress_factors)
+        self.overrides = [(reading, _OPS[op], float(value), mood)
+                          for reading, op, value, mood in overrides]
+
+    def evaluate_batch(self, readings: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        Score arrays of readings ({'temperature_c': [...], ...}).
+
+        Returns {'overall': [N], 'reasons': {factor: [N]}}; missing or NaN
+        readings are reported as 'unknown', and a reading with none of the
+        stress factors known is 'mixed' rather than 'happy'.
+        """
+        # nothing to score (e.g. every sensor failed) is one all-unknown reading
+        n = max((np.size(v) for v in readings.values()), default=1)
+        reasons: Dict[str, np.ndarray] = {}
+        stress = np.zeros(n, dtype=np.int16)
+        worst = np.zeros(n, dtype=np.int8)
+        known = np.zeros(n, dtype=bool)
+        for factor, reading, bounds, labels, score in self.factors:
+            x = np.broadcast_to(np.asarray(readings.get(reading, np.nan), dtype=np.float64), (n,))
+            idx = np.searchsorted(bounds, x, side="right")
+            missing = np.isnan(x)
+            idx[missing] = len(labels) - 1
+            reasons[factor] = labels[idx]
+            if factor in self.stress_factors:
+                stress += score[idx]
+                worst = np.maximum(worst, score[idx])
+                known |= ~missing
+
+        overall = np.select(
+            [~known, worst >= 2, stress >= 2, stress == 1],
+            ["mixed", "highly_stressed", "moderately_stressed", "mixed"],
+            default="happy",
+        ).astype(object)
+
+        conds, moods = [], []
+        for reading, op, value, mood in self.overrides:
+            if reading in readings:
+                x = np.broadcast_to(np.asarray(readings[reading], dtype=np.float64), (n,))
+                conds.append(op(x, value))
+                moods.append(mood)
+        if conds:
+            overall = np.select(conds, moods, default=overall).astype(object)
+        return {"overall": overall, "reasons": reasons}
+
+    def evaluate(self, readings: Mapping[str, float]) -> Dict[str, Any]:
+        """Score one reading; returns {'overall': str, 'reasons': {factor: label}}."""
+        res = self.evaluate_batch({k: [v] for k, v in readings.items() if v is not None})
+        return {
+            "overall": str(res["overall"][0]),
+            "reasons": {factor: str(labels[0]) for factor, labels in res["reasons"].items()},
+        }
+
+
+ENGINE = CompiledRules()
+
+
+def evaluate(readings: Mapping[str, float]) -> Dict[str, Any]:
+    return ENGINE.evaluate(readings)
+
+
+def evaluate_batch(readings: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    return ENGINE.evaluate_batch(readings)
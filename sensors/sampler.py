@@ -0,0 +1,171 @@
+# sensors/sampler.py
+"""
+Background sensor sampler.
+
+Each sensor is polled on its own interval in one daemon thread; after every
+successful read a new immutable Snapshot is published. Readers get the latest
+snapshot in O(1) without touching the I2C bus.
+"""
+import os
+import time
+import logging
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, NamedTuple, Optional
+
+from .soil_moisture_sensor import get_soil_moisture_pct
+from .bme280_sensor import get_bme_readings
+from .veml7700_lightsensor import get_light_lux
+from .main import build_package
+from .bus import I2C_LOCK
+
+logger = logging.getLogger("sensors")
+
+BME_INTERVAL   = float(os.getenv("SENSOR_BME_INTERVAL", 2.0))
+SOIL_INTERVAL  = float(os.getenv("SENSOR_SOIL_INTERVAL", 5.0))
+LIGHT_INTERVAL = float(os.getenv("SENSOR_LIGHT_INTERVAL", 1.0))
+MAX_AGE        = float(os.getenv("SENSOR_MAX_AGE", 30.0))
+
+
+class Snapshot(NamedTuple):
+    package: Mapping            # read-only {'overall', 'reasons', 'readings'}
+    timestamps: Mapping         # sensor name -> time.time() of its last read
+
+    @property
+    def age(self) -> float:
+        """Seconds since the oldest of the underlying reads."""
+        return time.time() - min(self.timestamps.values())
+
+
+def _freeze(pkg: dict) -> Mapping:
+    return MappingProxyType({
+        k: MappingProxyType(dict(v)) if isinstance(v, dict) else v
+        for k, v in pkg.items()
+    })
+
+
+class SensorSampler:
+    def __init__(self, sensors: Optional[Dict[str, tuple]] = None):
+        # name -> (read function, interval in seconds)
+        self.sensors: Dict[str, tuple] = sensors or {
+            "bme280": (get_bme_readings, BME_INTERVAL),
+            "soil":   (get_soil_moisture_pct, SOIL_INTERVAL),
+            "light":  (get_light_lux, LIGHT_INTERVAL),
+        }
+        self._values: Dict[str, object] = {}
+        self._times: Dict[str, float] = {}
+        self._snapshot: Optional[Snapshot] = None
+        self._listeners = []
+        self._failing = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SensorSampler":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sensor-sampler",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def subscribe(self, fn: Callable[[Snapshot], None]) -> None:
+        """Call *fn* with every newly published snapshot (in the sampler thread)."""
+        self._listeners.append(fn)
+
+    def latest(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def _run(self) -> None:
+        due = {name: 0.0 for name in self.sensors}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            updated = False
+            for name, (read, interval) in self.sensors.items():
+                if now < due[name]:
+                    continue
+                due[name] = now + interval
+                try:
+                    with I2C_LOCK:
+                        value = read()
+                    self._values[name] = value
+                    self._times[name] = time.time()
+                    updated = True
+                except Exception:
+                    logger.exception("Sensor %s read failed", name)
+            if updated:
+                self._publish()
+            self._stop.wait(max(0.0, min(due.values()) - time.monotonic()))
+
+    def _publish(self) -> None:
+        if len(self._values) < len(self.sensors):
+            return
+        try:
+            temperature_c, humidity_pct, pressure_hpa = self._values["bme280"]
+            pkg = build_package(temperature_c, humidity_pct, pressure_hpa,
+                                self._values["soil"], self._values["light"])
+        except Exception:
+            # a broken status evaluation fails every sample the same way:
+            # log the traceback once per failure streak, not every second
+            if not self._failing:
+                logger.exception("Building sensor package failed")
+            self._failing = True
+            return
+        if self._failing:
+            logger.info("Sensor package builds again")
+            self._failing = False
+        self._emit(pkg)
+
+    def _emit(self, pkg: dict) -> None:
+        snap = Snapshot(_freeze(pkg), MappingProxyType(dict(self._times)))
+        self._snapshot = snap
+        for fn in self._listeners:
+            try:
+                fn(snap)
+            except Exception:
+                logger.exception("Snapshot listener failed")
+
+
+class RemoteSampler(SensorSampler):
+    """
+    Sampler of a plant whose sensors sit on a remote node: nothing is
+    polled, the node pushes complete readings (see sensors/nodes.py).
+    """
+
+    def __init__(self):
+        super().__init__(sensors={"remote": (None, 0.0)})
+
+    def start(self) -> "RemoteSampler":
+        return self
+
+    def push(self, readings: Mapping, t: Optional[float] = None) -> Snapshot:
+        """Publish one set of readings as the plant's new snapshot."""
+        pkg = build_package(readings.get("temperature_c"), readings.get("humidity_pct"),
+                            readings.get("pressure_hpa"), readings.get("soil_moisture_pct"),
+                            readings.get("light_lux"))
+        self._times["remote"] = time.time() if t is None else t
+        self._emit(pkg)
+        return self._snapshot
+
+
+_SAMPLER: Optional[SensorSampler] = None
+_SAMPLER_LOCK = threading.Lock()
+
+
+def get_sampler() -> SensorSampler:
+    """Process-wide sampler, started on first use."""
+    global _SAMPLER
+    with _SAMPLER_LOCK:
+        if _SAMPLER is None:
+            _SAMPLER = SensorSampler()
+        return _SAMPLER.start()
+
+
+def latest_package(max_age: float = MAX_AGE) -> Optional[Mapping]:
+    """Latest sensor package, or None if there is none younger than *max_age* s."""
+    snap = get_sampler().latest()
+    if snap is None or snap.age > max_age:
+        return None
+    return snap.package
@@ -0,0 +1,19 @@
+# shared setup for the unit tests
+import os, sys
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def project_root():
+    return PROJECT_ROOT
+
+
+@pytest.fixture
+def v1_path(monkeypatch):
+    """variants/v1_rule_based on sys.path, for its flat imports (import utils, …)."""
+    monkeypatch.syspath_prepend(os.path.join(PROJECT_ROOT, "variants", "v1_rule_based"))
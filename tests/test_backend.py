@@ -0,0 +1,70 @@
+# unit tests for variants/v1_rule_based/backend.py and its Ollama client
+
+
+def test_ollama_client_reuses_one_connection():
+    from benchmarks.ollama_stub import OllamaStub
+    from variants.v1_rule_based.ollama_client import OllamaClient
+    stub = OllamaStub(token_rate=1000, prompt_rate=1e6, load_s=0).start()
+    try:
+        client = OllamaClient(url=stub.url, model="plant", keep_alive="5m", options={})
+        assert client.resident_bytes() is None
+        assert client.warm_up()
+        assert client.resident_bytes() == int(stub.model_mb * 2**20)
+        assert client.generate("How are you?")["response"]
+        chunks = list(client.stream("And now?", options={"num_predict": 3}))
+        assert chunks[-1]["done"] and len(chunks) == 4
+        client.unload()
+        assert client.resident_bytes() is None
+        # every request went over the same pooled keep-alive connection
+        pools = client.session.get_adapter(stub.url).poolmanager.pools
+        opened = sum(pools[key].num_connections for key in pools.keys())
+        assert stub.requests == 4 and opened == 1
+    finally:
+        stub.stop()
+
+
+def test_context_store_primes_with_the_preamble_only():
+    import types
+    from variants.v1_rule_based.context_store import ContextStore
+    calls = []
+
+    def generate(prompt, **extra):
+        calls.append(extra)
+        # 5 prompt tokens, then the one token Ollama generated
+        return {"context": [1, 2, 3, 4, 5, 99], "eval_count": 1}
+
+    client = types.SimpleNamespace(model="gemma2:2b", options={}, generate=generate)
+    store = ContextStore(client, "You are a plant.")
+    assert store.context_for("s1") == [1, 2, 3, 4, 5]
+    assert calls == [{"raw": True, "options": {"num_predict": 1}}]
+    store.update("s1", [1, 2, 3, 4, 5, 6, 7])
+    assert store.context_for("s1") == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_late_llm_reply_stays_out_of_history_and_bank(v1_path, monkeypatch, tmp_path):
+    import threading, time
+    import backend
+    import response_bank
+    import tracing
+    monkeypatch.setattr(tracing, "TRACE_LOG", "")
+    monkeypatch.setattr(backend, "sensor_package", lambda plant_id=None: {"overall": "very_dry"})
+    bank = response_bank.ResponseBank(str(tmp_path / "bank.json"))
+    monkeypatch.setattr(response_bank, "_BANK", bank)
+    monkeypatch.setattr(response_bank, "RESPONSE_BANK_LEARN", True)
+    heard = []
+
+    def slow_llm(delivered, **kwargs):
+        time.sleep(0.3)
+        heard.append(delivered())       # would it go into the session history?
+        return {"response": "My name is Fern.", "emoji": "", "mood": "very_dry"}
+
+    with tracing.turn("test"):
+        msg = backend.generate_with_deadline("What's your name?", deadline_s=0.05,
+                                             generate=slow_llm)
+    assert msg["response"] in response_bank.SEED_REPLIES["very_dry"]
+    deadline = time.monotonic() + 2
+    while response_bank.stats()["discarded"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert heard == [False]
+    # an answer to a question is not replayed for other questions
+    assert bank.learned == {}
@@ -0,0 +1,18 @@
+# unit tests for variants/v1_rule_based/display.py
+import numpy as np
+
+
+def test_glyph_cache_ignores_a_corrupt_cache_file(tmp_path):
+    from variants.v1_rule_based.display import GlyphCache
+    path = tmp_path / "glyphs.npz"
+    path.write_bytes(b"not a zip file")
+    cache = GlyphCache("missing.ttf", 48, cache_file=str(path))
+    assert not cache._bits
+    # the right tag, but glyphs of another panel size
+    np.savez(str(path), tag=cache._tag, chars=np.array(["x"]),
+             glyphs=np.packbits(np.ones((1, 32, 64), bool), axis=-1))
+    cache = GlyphCache("missing.ttf", 48, cache_file=str(path))
+    assert not cache._bits
+    cache._bits["x"] = np.zeros((64, 128), bool)
+    cache._save()
+    assert list(GlyphCache("missing.ttf", 48, cache_file=str(path))._bits) == ["x"]
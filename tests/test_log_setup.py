@@ -0,0 +1,27 @@
+# unit tests for variants/v1_rule_based/log_setup.py
+import os
+
+
+def test_queued_logging_writes_through_the_listener_and_rotates(v1_path, monkeypatch, tmp_path):
+    import logging
+    import log_setup
+    monkeypatch.setattr(log_setup, "LOG_MAX_BYTES", 300)
+    monkeypatch.setattr(log_setup, "LOG_BACKUPS", 2)
+    monkeypatch.setattr(log_setup, "LOG_ROTATE_WHEN", "")
+    path = tmp_path / "plant.log"
+    handler = log_setup.queued(log_setup.rotating_handler(str(path), "%(message)s"))
+    listener = log_setup._LISTENERS.pop()
+    log = logging.getLogger("test.queued")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    try:
+        for i in range(40):
+            log.info("line %02d %s", i, "x" * 20)
+    finally:
+        listener.stop()             # drains the queue
+        log.removeHandler(handler)
+        for h in listener.handlers:
+            h.close()
+    assert sorted(os.listdir(tmp_path)) == ["plant.log", "plant.log.1", "plant.log.2"]
+    assert path.read_text().splitlines()[-1].startswith("line 39")
@@ -0,0 +1,45 @@
+# unit tests for variants/v1_rule_based/pipeline.py
+
+
+def test_stage_queue_rotates_owners_by_priority():
+    from variants.v1_rule_based.pipeline import _FairQueue
+    q = _FairQueue()
+    for i in range(3):
+        assert q.put("chatty", 0, f"chatty{i}", limit=3)
+    assert not q.put("chatty", 0, "chatty3", limit=3)
+    q.put("quiet", 0, "quiet0", limit=3)
+    q.put("low", 1, "low0", limit=3)
+    assert q.waiting() == {"chatty": 3, "quiet": 1, "low": 1}
+    assert [q.get() for _ in range(5)] == ["chatty0", "quiet0", "chatty1", "chatty2", "low0"]
+
+
+def test_stage_queue_ages_lower_priorities():
+    from variants.v1_rule_based.pipeline import _FairQueue
+    q = _FairQueue(aging=2)
+    q.put("low", 1, "low0")
+    q.put("lower", 2, "lower0")
+    served = []
+    for i in range(12):
+        # the chatty plant refills its share as fast as it is served
+        q.put("chatty", 0, f"chatty{i}", limit=2)
+        served.append(q.get())
+    assert served.index("low0") == 2
+    assert "lower0" in served
+
+
+def test_stage_rejects_when_full_and_times_out():
+    import threading
+    import pytest
+    from variants.v1_rule_based import pipeline
+    stage = pipeline.Stage("test", workers=1, max_waiting=1, timeout=0.2)
+    release = threading.Event()
+    running = stage.submit(release.wait, 5)
+    waiting = stage.submit(lambda: "done")
+    try:
+        with pytest.raises(pipeline.StageBusy):
+            stage.submit(lambda: None)
+        with pytest.raises(pipeline.StageTimeout):
+            stage.wait(running)
+    finally:
+        release.set()
+    assert stage.wait(waiting) == "done"
@@ -0,0 +1,36 @@
+# unit tests for variants/v1_rule_based/residency.py
+
+
+def test_residency_evicts_least_recently_used_but_not_pinned(v1_path, monkeypatch):
+    import residency
+    loaded = set()
+    models = residency.ResidencyManager(budget_mb=250, idle_s=60)
+    for name, mb, stage in (("stt", 100, "stt"), ("llm", 100, "llm"), ("tts", 100, "tts")):
+        models.register(name, lambda n=name: loaded.add(n) or n, lambda n=name: loaded.discard(n),
+                        stage=stage, footprint=lambda mb=mb: mb * residency.MB, estimate_mb=mb)
+    models.acquire("stt")
+    models.acquire("llm")
+    models.models["stt"].pinned_until = float("inf")
+    # stt is older but pinned, so llm makes room for tts
+    models.acquire("tts")
+    assert loaded == {"stt", "tts"}
+    with models.hold("tts"):
+        models.models["tts"].last_used = models.models["stt"].last_used = 0.0
+        models.models["stt"].pinned_until = 0.0
+        assert models.evict_idle() == 1         # tts is in use
+    assert loaded == {"tts"}
+    assert [e["event"] for e in models.status()["events"]].count("evict") == 2
+
+
+def test_residency_notices_a_model_its_server_dropped(v1_path, monkeypatch):
+    import residency
+    server = {"size": 300 * residency.MB}
+    models = residency.ResidencyManager(budget_mb=500)
+    models.register("llm", lambda: True, lambda: server.update(size=None),
+                    footprint=lambda: server["size"])
+    models.acquire("llm")
+    assert models.resident_bytes() == 300 * residency.MB
+    server["size"] = None                   # keep_alive ran out
+    assert models.reconcile() == 1
+    assert models.resident_bytes() == 0
+    assert models.status()["events"][-1]["event"] == "expired"
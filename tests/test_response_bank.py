@@ -0,0 +1,13 @@
+# unit tests for variants/v1_rule_based/response_bank.py
+
+
+def test_response_bank_rotates_and_learns(v1_path, tmp_path, monkeypatch):
+    import response_bank
+    bank = response_bank.ResponseBank(str(tmp_path / "bank.json"))
+    first, second = bank.pick("very_dry"), bank.pick("very_dry")
+    assert first != second and bank.pick("very_dry") == first
+    # only cached replies are picked while any are cached
+    assert bank.pick("very_dry", ready=lambda text: text == second) == second
+    assert bank.learn("very_dry", "Water, please!")
+    assert not bank.learn("very_dry", "Water, please!")
+    assert "Water, please!" in response_bank.ResponseBank(str(tmp_path / "bank.json")).phrases()
@@ -0,0 +1,25 @@
+# unit tests for variants/v1_rule_based/response_cache.py
+
+
+def test_response_cache_key_buckets_missing_readings_as_unknown(tmp_path):
+    from variants.v1_rule_based.response_cache import ResponseCache
+    cache = ResponseCache(str(tmp_path / "cache.json"))
+    pkg = {"overall": "mixed", "reasons": {},
+           "readings": {"temperature_c": float("nan"), "humidity_pct": None,
+                        "soil_moisture_pct": 41.0, "light_lux": 250.0}}
+    key = cache.key(pkg, "How are you?")
+    assert "temperature_c=unknown" in key and "humidity_pct=unknown" in key
+    assert key == cache.key(pkg, "how are you")
+
+
+def test_response_cache_reports_hits_and_misses(tmp_path):
+    from variants.v1_rule_based.response_cache import ResponseCache
+    cache = ResponseCache(str(tmp_path / "cache.json"))
+    assert cache.get("k") is None
+    cache.put("k", "I'm fine.")
+    assert cache.get("k") == "I'm fine."
+    assert cache.stats()["hit_rate"] == 0.5
+    text = cache.metrics()
+    assert 'plant_response_cache_lookups_total{result="hit"} 1' in text
+    assert 'plant_response_cache_lookups_total{result="miss"} 1' in text
+    assert "plant_response_cache_entries 1" in text
@@ -1 +1,152 @@
-# unit tests for sensors
\ No newline at end of file
+# unit tests for sensors
+import numpy as np
+
+from sensors import rules
+from sensors.history import SensorHistory, FIELDS
+
+
+def _fill(hist, start, seconds, temp=lambda i: 20.0):
+    for i in range(seconds):
+        hist.append([temp(i), 50.0, 1013.0, 45.0, 100.0], t=start + i)
+
+
+def test_history_window_stats_and_trend(tmp_path):
+    hist = SensorHistory(str(tmp_path), raw_days=1, minute_days=1, hour_days=1)
+    start = 1_700_000_000.0
+    _fill(hist, start, 600, temp=lambda i: 20.0 + i / 300)   # +12 °C/h
+    now = start + 600
+
+    t, v = hist.window(120, now=now)
+    assert len(t) == 120 and v.shape == (120, len(FIELDS))
+
+    s = hist.stats("temperature_c", 600, now=now)
+    assert s["n"] == 600
+    assert s["min"] == 20.0
+    assert abs(s["max"] - (20.0 + 599 / 300)) < 1e-4
+
+    assert abs(hist.trend("temperature_c", 600, now=now) - 12.0) < 1e-3
+
+
+def test_history_ring_wraps_and_survives_reopen(tmp_path):
+    hist = SensorHistory(str(tmp_path), raw_days=100 / 86400, minute_days=1, hour_days=1)
+    start = 1_700_000_000.0
+    _fill(hist, start, 250, temp=lambda i: float(i))
+    hist.flush()
+
+    reopened = SensorHistory(str(tmp_path), raw_days=100 / 86400, minute_days=1, hour_days=1)
+    t, v = reopened.window(1000, tier="raw", now=start + 250)
+    assert len(t) == 100
+    assert np.all(np.diff(t) > 0)
+    assert v[0, 0] == 150.0 and v[-1, 0] == 249.0
+
+    # the four closed minutes made it into the 1 min rollup
+    assert len(reopened.minutes) == 4
+
+
+def test_node_datagram_updates_remote_plant():
+    from sensors.plants import PlantRegistry, load_plants
+    from sensors.nodes import NodeListener, encode
+
+    registry = PlantRegistry(load_plants([{"id": "balcony", "remote": True}]))
+    listener = NodeListener(registry, "127.0.0.1", 0, token="s3cret")
+    try:
+        plant = registry.get("balcony")
+        assert not listener.handle(encode("balcony", {"soil_moisture_pct": 5.0}, token="wrong"))
+        assert not listener.handle(encode("fern", {"soil_moisture_pct": 5.0}, token="s3cret"))
+        assert plant.sampler.latest() is None
+
+        assert listener.handle(encode("balcony", {"temperature_c": 22.0, "humidity_pct": 50.0,
+                                                  "soil_moisture_pct": 5.0}, token="s3cret"))
+        pkg = plant.latest_package(max_age=5)
+        assert pkg["overall"] == "very_dry"
+        assert pkg["readings"]["light_lux"] is None
+    finally:
+        listener.stop()
+
+
+def test_rules_single_reading():
+    res = rules.evaluate({"temperature_c": 22.0, "soil_moisture_pct": 50.0,
+                          "humidity_pct": 30.0, "light_lux": 100.0})
+    assert res["overall"] == "mixed"
+    assert res["reasons"] == {"temperature": "happy", "soil_moisture": "happy",
+                              "humidity": "moderately_stressed", "light": "ambient"}
+
+
+def test_rules_overrides_follow_table_order():
+    # dry soil wins over the hot temperature because it is listed first
+    res = rules.evaluate({"temperature_c": 35.0, "soil_moisture_pct": 5.0,
+                          "humidity_pct": 50.0, "light_lux": 100.0})
+    assert res["overall"] == "very_dry"
+    assert res["reasons"]["temperature"] == "highly_stressed"
+
+
+def test_rules_batch_matches_single():
+    batch = {
+        "temperature_c":     np.array([5.0, 22.0, 29.0, np.nan]),
+        "soil_moisture_pct": np.array([50.0, 50.0, 30.0, 50.0]),
+        "humidity_pct":      np.array([50.0, 50.0, 50.0, 50.0]),
+        "light_lux":         np.array([100.0, 20000.0, 100.0, 0.5]),
+    }
+    res = rules.evaluate_batch(batch)
+    assert list(res["overall"]) == ["very_cold", "very_happy", "moderately_stressed",
+                                    "light_deprived"]
+    assert res["reasons"]["temperature"][3] == "unknown"
+    for i in range(4):
+        single = rules.evaluate({k: float(v[i]) for k, v in batch.items()})
+        assert single["overall"] == res["overall"][i]
+
+
+def test_rules_without_readings_are_unknown():
+    for readings in ({}, dict.fromkeys(("temperature_c", "soil_moisture_pct",
+                                        "humidity_pct", "light_lux"))):
+        res = rules.evaluate(readings)
+        assert res["overall"] == "mixed"
+        assert set(res["reasons"].values()) == {"unknown"}
+
+
+def test_node_listener_survives_a_bad_datagram(monkeypatch):
+    import socket, time
+    from sensors.plants import PlantRegistry, load_plants
+    from sensors.nodes import NodeListener, encode
+
+    registry = PlantRegistry(load_plants([{"id": "balcony", "remote": True}]))
+    plant = registry.get("balcony")
+    push = plant.sampler.push
+    monkeypatch.setattr(plant.sampler, "push",
+                        lambda readings: push(readings) if readings else 1 / 0)
+    listener = NodeListener(registry, "127.0.0.1", 0, token="").start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(encode("balcony", {}, token=""), listener.address)
+            s.sendto(encode("balcony", {"soil_moisture_pct": 5.0}, token=""), listener.address)
+            deadline = time.monotonic() + 2
+            while listener.received + listener.rejected < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert (listener.received, listener.rejected) == (1, 1)
+        assert listener._thread.is_alive()
+        assert plant.latest_package(max_age=5)["overall"] == "very_dry"
+    finally:
+        listener.stop()
+
+
+def test_history_stats_and_window_pick_the_same_rollups(tmp_path):
+    hist = SensorHistory(str(tmp_path), raw_days=1 / 24, minute_days=1, hour_days=1)
+    start = 1_700_000_000.0 - 1_700_000_000.0 % 60
+    _fill(hist, start, 3 * 3600, temp=lambda i: float(i // 60))    # one value per minute
+    now = start + 3 * 3600 - 30
+    seconds = 2 * 3600 + 60          # starts in the middle of a minute
+    t, v = hist.window(seconds, tier="1m", now=now)
+    s = hist.stats("temperature_c", seconds, now=now)
+    assert s["min"] == v[:, 0].min() and s["max"] == v[:, 0].max()
+
+
+def test_history_rollup_mean_weights_each_field_by_its_own_samples(tmp_path):
+    hist = SensorHistory(str(tmp_path), raw_days=1 / 24, minute_days=1, hour_days=1)
+    start = 1_700_000_000.0 - 1_700_000_000.0 % 60
+    # the second minute has a sensor gap: only 6 of its 60 readings are there
+    _fill(hist, start, 120,
+          temp=lambda i: 10.0 if i < 60 else (40.0 if i % 10 == 0 else np.nan))
+    s = hist.stats("temperature_c", 2 * 3600, now=start + 120)
+    assert s["n"] == 66
+    assert abs(s["mean"] - (60 * 10.0 + 6 * 40.0) / 66) < 1e-4
+    assert hist.stats("humidity_pct", 2 * 3600, now=start + 120)["n"] == 120
@@ -0,0 +1,31 @@
+# unit tests for variants/v1_rule_based/serving.py
+
+
+def test_default_server_runs_requests_concurrently(v1_path, monkeypatch):
+    import threading
+    import urllib.request
+    from flask import Flask
+    import serving
+    web = Flask("concurrency")
+    both = threading.Barrier(2, timeout=5)
+
+    @web.route("/turn")
+    def turn():
+        both.wait()             # returns only once the second request is in, too
+        return "ok"
+
+    # waitress if installed, else the Werkzeug fallback
+    server = serving.make_server(web, "127.0.0.1", 0)
+    threading.Thread(target=serving.run, args=(server,), daemon=True).start()
+    url = f"http://127.0.0.1:{serving.port(server)}/turn"
+    try:
+        replies = []
+        clients = [threading.Thread(target=lambda: replies.append(urllib.request.urlopen(url, timeout=10).read()))
+                   for _ in range(2)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join(10)
+        assert replies == [b"ok", b"ok"]
+    finally:
+        serving.stop(server)
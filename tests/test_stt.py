@@ -0,0 +1,207 @@
+# unit tests for variants/v1_rule_based/STT (endpointing, capture, transcription worker, engines)
+import os, sys, collections
+
+import numpy as np
+
+
+def _write_wav(path, audio, sr=16000):
+    import wave
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(np.asarray(audio, dtype="<i2").tobytes())
+
+
+def test_endpointer_calibrates_to_ambient_noise(project_root):
+    from variants.v1_rule_based.STT import whisper_test as stt
+    # test.wav is ~4 s of room noise before speech starts; an over-eager
+    # VAD that calls everything speech must not trigger on the noise
+    audio = stt.read_wav(os.path.join(project_root, "test.wav"))
+    always = lambda frame: True
+    assert stt.endpoint_audio(audio, always, mode="fixed")["start_s"] == 0.0
+    adaptive = stt.endpoint_audio(audio, always, mode="adaptive")
+    assert adaptive["trigger_s"] > 4.0
+    # the utterance reaches back by the pre-roll, not only the trigger window
+    assert abs(adaptive["trigger_s"] - adaptive["start_s"] - stt.STT_PREROLL_MS / 1000) < 1e-6
+
+
+def test_endpointer_keeps_speech_that_starts_right_away(tmp_path):
+    from variants.v1_rule_based.STT import whisper_test as stt
+    sr = 16000
+    rng = np.random.default_rng(1)
+    t = np.arange(2 * sr) / sr
+    # syllables at speech level from the first sample, then a quiet room
+    speech = np.sin(2 * np.pi * 180 * t) * 5000 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)
+    path = tmp_path / "t0.wav"
+    _write_wav(path, np.concatenate([speech, np.zeros(2 * sr)]) + rng.normal(0, 200, 4 * sr))
+    energy = lambda frame: stt.frame_rms(frame) > 600
+    result = stt.endpoint_audio(stt.read_wav(str(path)), energy)
+    # calibration on speech must not lift the noise floor above the voice
+    assert result["noise_floor"] <= stt.STT_NOISE_MAX
+    assert result["start_s"] == 0.0 and result["end_s"] is not None
+
+
+def test_endpointer_ends_early_only_after_a_complete_phrase(tmp_path):
+    from variants.v1_rule_based.STT import whisper_test as stt
+    sr = 16000
+    rng = np.random.default_rng(0)
+    noise = lambda s: rng.normal(0, 200, int(s * sr))
+
+    def phrase(seconds, falloff):
+        t = np.arange(int(seconds * sr)) / sr
+        env = np.linspace(1.0, 0.2, len(t)) if falloff else np.ones(len(t))
+        return np.sin(2 * np.pi * 180 * t) * 6000 * env + noise(seconds)
+
+    energy = lambda frame: stt.frame_rms(frame) > 300
+    path = tmp_path / "done.wav"
+    _write_wav(path, np.concatenate([noise(0.5), phrase(1.0, False), phrase(0.4, True), noise(2.0)]))
+    done = stt.endpoint_audio(stt.read_wav(str(path)), energy)
+    assert done["complete"] and done["trailing_ms"] <= stt.STT_ENDPOINT_MIN_MS + 30
+    assert stt.endpoint_audio(stt.read_wav(str(path)), energy, mode="fixed")["trailing_ms"] > 1200
+
+    # a mid-sentence pause at full level waits for the long timeout
+    path = tmp_path / "pause.wav"
+    _write_wav(path, np.concatenate([noise(0.5), phrase(1.0, False), noise(0.8), phrase(1.0, True), noise(2.0)]))
+    paused = stt.endpoint_audio(stt.read_wav(str(path)), energy)
+    assert paused["end_s"] > 3.0
+
+
+def test_fixed_endpointer_ends_on_the_same_frame_as_the_old_rule():
+    from variants.v1_rule_based.STT import whisper_test as stt
+    padding = int(stt.PADDING_DURATION_MS / stt.FRAME_DURATION_MS)
+
+    def old_rule(flags):
+        # the loop of the original record_with_vad, without the audio
+        ring, triggered, silence, start = collections.deque(maxlen=padding), False, 0, None
+        for i, is_speech in enumerate(flags):
+            if not triggered:
+                ring.append(is_speech)
+                if sum(ring) > 0.9 * ring.maxlen:
+                    triggered, start = True, i
+            elif not is_speech:
+                silence += 1
+                if silence > padding:
+                    return start, i
+            else:
+                silence = 0
+        return start, None
+
+    def fixed(flags):
+        ep, start = stt.Endpointer("fixed"), None
+        for i, is_speech in enumerate(flags):
+            event = ep.feed(is_speech)
+            if event == "start":
+                start = i
+            elif event == "end":
+                return start, i
+        return start, None
+
+    speech, quiet = [True], [False]
+    for pause in (padding - 1, padding, padding + 1):
+        flags = quiet * 5 + speech * 60 + quiet * pause + speech * 20 + quiet * (2 * padding)
+        assert fixed(flags) == old_rule(flags)
+        assert fixed(flags)[1] is not None
+
+
+def test_capture_ring_wraps_around():
+    from variants.v1_rule_based.STT.whisper_test import CaptureRing
+    ring = CaptureRing(8)
+    block = lambda *values: np.array(values, dtype=np.int16).reshape(-1, 1)
+    ring.callback(block(1, 2, 3, 4, 5, 6), 6, None, None)
+    ring.callback(block(7, 8, 9, 10), 4, None, "input overflow")   # wraps after 8
+    assert ring.written == 10 and ring.overflows == 1
+    assert ring.wait_for(10, 0) and not ring.wait_for(11, 0)
+    assert list(ring.frame(8, 2)) == [9, 10]
+    # samples 4..10 span the end of the buffer
+    assert np.allclose(ring.to_float32(4, 10) * 32768, [5, 6, 7, 8, 9, 10])
+
+
+def test_audio_reaches_the_worker_through_shared_memory(monkeypatch):
+    from variants.v1_rule_based.STT import whisper_test as stt
+
+    class Echo:
+        def transcribe(self, audio, language, prompt):
+            return f"{len(audio)} {audio[-1]:.2f}", [(0.0, len(audio) / 16000, language)]
+
+    monkeypatch.setattr(stt, "load_engine", lambda name: Echo())
+    worker = stt.TranscriptionWorker()
+    blocks = lambda: {f for f in os.listdir("/dev/shm") if f.startswith("psm_")}
+    before = blocks()
+    try:
+        timings, segments = {}, []
+        audio = np.linspace(0, 0.5, 8000, dtype=np.float32)
+        assert worker.transcribe("tiny", audio, "en", timeout=10,
+                                 timings=timings, segments=segments) == "8000 0.50"
+        assert segments == [(0.0, 0.5, "en")]
+        assert {"model_load", "transcribe", "handoff"} <= set(timings)
+        assert blocks() == before       # the block is unlinked after the job
+    finally:
+        worker.shutdown()
+
+
+def test_transcription_worker_restarts_after_a_crash(monkeypatch):
+    from variants.v1_rule_based.STT import whisper_test as stt
+    # the forked worker inherits the patch and dies while loading the model
+    monkeypatch.setattr(stt, "load_engine", lambda name: os._exit(1))
+    worker = stt.TranscriptionWorker()
+    try:
+        worker.ensure_started()
+        crashed = worker.pid
+        assert worker.transcribe("tiny", np.zeros(1600, np.float32), "en", timeout=10) is None
+        assert worker.pid != crashed and worker._proc.is_alive()
+    finally:
+        worker.shutdown()
+
+
+def test_whisper_unload_restarts_the_worker():
+    from variants.v1_rule_based.STT.whisper_test import TranscriptionWorker
+    worker = TranscriptionWorker()
+    try:
+        worker.ensure_started()
+        before = worker.pid
+        assert worker.unload("tiny")
+        assert worker.pid != before and worker._proc.is_alive()
+    finally:
+        worker.shutdown()
+
+
+def test_incremental_transcriber_commits_segments_seen_twice():
+    from variants.v1_rule_based.STT.whisper_test import IncrementalTranscriber
+    inc = IncrementalTranscriber("tiny", "en", worker=object())
+    inc.close()
+    assert inc._advance([(0, 1.0, "Hello"), (1.0, 2.0, "there"), (2.0, 2.5, "my")]) == "Hello there my"
+    assert inc.committed == "" and inc._commit == 0
+    # two segments repeat, the last one may still grow
+    assert inc._advance([(0, 1.0, "Hello"), (1.0, 2.1, "there"), (2.1, 3.0, "my friend")]) == "my friend"
+    assert inc.committed == "Hello there" and inc._commit == 33600
+    # the next pass starts at the commit point, with times relative to it
+    assert inc._advance([(0, 0.5, "my friend"), (0.5, 1.0, "how")]) == "my friend how"
+    assert inc._advance([(0, 0.5, "my friend"), (0.5, 1.2, "how are you")]) == "how are you"
+    assert inc.committed == "Hello there my friend" and inc._commit == 33600 + 8000
+
+
+def test_whisper_engine_restores_the_default_thread_count(monkeypatch):
+    import types
+    from variants.v1_rule_based.STT import engines
+    torch = types.SimpleNamespace(threads=4)
+    torch.get_num_threads = lambda: torch.threads
+    torch.set_num_threads = lambda n: setattr(torch, "threads", n)
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setitem(sys.modules, "whisper", types.SimpleNamespace(load_model=lambda name: None))
+    monkeypatch.setattr(engines, "_torch_default_threads", None)
+    engines.WhisperEngine("tiny", threads=2)
+    assert torch.threads == 2
+    # threads=0 means the library default, not whatever the last engine set
+    engines.WhisperEngine("tiny", threads=0)
+    assert torch.threads == 4
+
+
+def test_stt_model_spec_selects_engine_and_wer_scores_words():
+    from variants.v1_rule_based.STT.engines import parse_model
+    from benchmarks.stt_engines import wer
+    assert parse_model("tiny") == ("whisper", "tiny")
+    assert parse_model("ct2:base.en") == ("ct2", "base.en")
+    assert parse_model("/models/whisper-tiny") == ("whisper", "/models/whisper-tiny")
+    assert wer("How are you, today?", "how are you today") == 0.0
+    assert wer("how are you today", "how were you") == 0.5
@@ -0,0 +1,38 @@
+# unit tests for variants/v1_rule_based/tracing.py
+
+
+def test_tracing_turn_stays_open_for_spawned_work(monkeypatch):
+    from variants.v1_rule_based import tracing
+    monkeypatch.setattr(tracing, "TRACE_LOG", "")
+    import threading
+    release = threading.Event()
+
+    def playback():
+        release.wait(2)
+        tracing.record("tts_playback", 0.25)
+
+    before = tracing.snapshot().get("turn_total", {}).get("count", 0)
+    with tracing.turn("test") as trace:
+        tracing.record("sensor_read", 0.01)
+        tracing.record("sensor_read", 0.02)
+        t = tracing.spawn(playback)
+    # the request returned, but playback still holds the turn
+    assert tracing.snapshot().get("turn_total", {}).get("count", 0) == before
+    release.set()
+    t.join(2)
+    assert trace.spans == {"sensor_read": 0.01 + 0.02, "tts_playback": 0.25}
+    assert tracing.snapshot()["turn_total"]["count"] == before + 1
+    text = tracing.metrics()
+    assert 'plant_stage_seconds{stage="tts_playback",quantile="0.99"}' in text
+    assert 'plant_turns_total{route="test",outcome="ok"}' in text
+
+
+def test_trace_log_lands_next_to_the_main_log(project_root, v1_path, monkeypatch, tmp_path):
+    import log_setup
+    import tracing
+    monkeypatch.setattr(log_setup, "LOG_FILE", str(tmp_path / "logs" / "plant_interface.log"))
+    monkeypatch.setattr(tracing, "TRACE_LOG", "turn_traces.jsonl")
+    monkeypatch.chdir(project_root)
+    assert tracing._trace_log_path() == str(tmp_path / "logs" / "turn_traces.jsonl")
+    monkeypatch.setattr(tracing, "TRACE_LOG", str(tmp_path / "traces.jsonl"))
+    assert tracing._trace_log_path() == str(tmp_path / "traces.jsonl")
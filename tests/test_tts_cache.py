@@ -0,0 +1,28 @@
+# unit tests for variants/v1_rule_based/tts_cache.py
+import numpy as np
+
+
+def test_tts_cache_writes_only_reused_or_fixed_phrases_to_disk(tmp_path):
+    from variants.v1_rule_based.tts_cache import TTSCache
+    cache = TTSCache(str(tmp_path), disk_bytes=300, persist_uses=2)
+    audio = np.ones(100, np.int16)
+    cache.put("amy.onnx", "A one-off sentence.", audio)
+    assert len(list(tmp_path.iterdir())) == 0
+    assert cache.get("amy.onnx", "a one-off  sentence.") is not None
+    assert len(list(tmp_path.iterdir())) == 1          # needed twice: now on disk
+    cache.put("amy.onnx", "Sorry, didn't understand.", audio, persist=True)
+    cache.put("amy.onnx", "Hello!", audio, persist=True)
+    # 3 × 200 bytes over a 300 byte disk tier: the oldest files go
+    assert cache._disk_used <= 300 and len(list(tmp_path.iterdir())) == 1
+    assert ("amy.onnx", "hello!") in TTSCache(str(tmp_path))
+
+
+def test_tts_cache_miss_does_not_touch_the_disk(tmp_path, monkeypatch):
+    from variants.v1_rule_based import tts_cache
+    cache = tts_cache.TTSCache(str(tmp_path))
+
+    def no_memmap(*args, **kwargs):
+        raise AssertionError("memmap on a key that was never written")
+    monkeypatch.setattr(tts_cache.np, "memmap", no_memmap)
+    assert cache.get("amy.onnx", "Never said.") is None
+    assert cache.misses == 1
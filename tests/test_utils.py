@@ -0,0 +1,58 @@
+# unit tests for the TTS playback in variants/v1_rule_based/utils.py
+import sys, time
+
+import numpy as np
+
+
+def test_speech_pipeline_finishes_when_the_voice_fails_to_load(v1_path, monkeypatch):
+    import tracing
+    import utils
+    threads = []
+    spawn = tracing.spawn
+    monkeypatch.setattr(tracing, "spawn", lambda target: threads.append(spawn(target)))
+    monkeypatch.setattr(utils, "_get_voice", lambda lang: 1 / 0)
+    speech = utils.SpeechPipeline("en")
+    speech.say("Hello there.")
+    speech.close()
+    for t in threads:
+        t.join(2)
+    assert len(threads) == 2 and not any(t.is_alive() for t in threads)
+
+
+def test_stream_player_counts_underruns_only_inside_a_sentence(v1_path, monkeypatch):
+    import types
+    stream = types.SimpleNamespace(start=lambda: None)
+    monkeypatch.setitem(sys.modules, "sounddevice",
+                        types.SimpleNamespace(OutputStream=lambda **kw: stream))
+    import utils
+    player = utils.StreamPlayer(1000, jitter_ms=0, blocksize=10)
+    ok = types.SimpleNamespace(output_underflow=False)
+    pull = lambda: player._callback(np.zeros((10, 1), np.int16), 10, None, ok)
+
+    player.feed(np.ones(15, np.int16))
+    player.pause()
+    pull(), pull(), pull()          # gap while the next sentence is synthesized
+    assert player.underruns == 0
+    player.feed(np.ones(15, np.int16))
+    pull(), pull()                  # starved in the middle of a sentence
+    assert player.underruns == 1
+
+
+def test_finish_stream_gives_up_on_a_dead_output_stream(v1_path, monkeypatch):
+    import types
+    calls = []
+    stream = types.SimpleNamespace(start=lambda: None, abort=lambda: calls.append("abort"),
+                                   close=lambda: calls.append("close"))
+    monkeypatch.setitem(sys.modules, "sounddevice",
+                        types.SimpleNamespace(OutputStream=lambda **kw: stream))
+    import utils
+    monkeypatch.setattr(utils, "TTS_STALL_S", 0.1)
+    monkeypatch.setattr(utils, "_PLAYERS", {})
+    player = utils._get_player(1000)
+    player.feed(np.ones(100, np.int16))     # 0.1 s that the callback never pulls
+
+    start = time.monotonic()
+    utils._finish_stream(player, 0)
+    assert time.monotonic() - start < 1.0
+    assert calls == ["abort", "close"]
+    assert 1000 not in utils._PLAYERS and player.wait(0)
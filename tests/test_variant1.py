@@ -1 +0,0 @@
-# unit tests for varaint1
\ No newline at end of file
@@ -1 +1,19 @@
-# unit tests for varaint2
\ No newline at end of file
+# unit tests for variant2
+import sys
+
+
+def test_local_llm_keeps_persona_cached_and_caps_tokens(monkeypatch):
+    import types
+    from benchmarks import fakes
+    for key, value in (("llm_load_s", 0), ("llm_mb", 0), ("llm_prompt_rate", 1e6),
+                       ("llm_token_rate", 1e6)):
+        monkeypatch.setitem(fakes.SETTINGS, key, value)
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=fakes.FakeLlama))
+    from variants.v2_local_llm.inference import LocalLLM
+    llm = LocalLLM("plant.gguf", persona="You are a potted houseplant. " * 8, max_tokens=3)
+    llm.load()
+    after_persona = llm._llm.prefilled
+    turn = "\nOwner: \"how are you\"\nPlant:"
+    assert len(list(llm.stream(llm.persona + turn, max_tokens=50))) == 3
+    # only the turn was prefilled, not the persona again
+    assert llm._llm.prefilled - after_persona <= len(turn) // 4 + 2
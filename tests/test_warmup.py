@@ -0,0 +1,26 @@
+# unit tests for variants/v1_rule_based/warmup.py
+import sys
+
+
+def test_warmup_reports_progress_for_healthz():
+    import threading
+    import time
+    from variants.v1_rule_based import warmup
+    # importing the STT module must not pull in the heavy libraries
+    from variants.v1_rule_based.STT import whisper_test  # noqa: F401
+    assert not {"whisper", "torch", "sounddevice", "webrtcvad"} & set(sys.modules)
+
+    release = threading.Event()
+    warm = warmup.Warmup().add("tts", lambda: release.wait(5)).add("llm", lambda: False)
+    assert warm.status()["status"] == "warming"
+    warm.start()
+    release.set()
+    for _ in range(100):
+        if warm.status()["status"] != "warming":
+            break
+        time.sleep(0.02)
+    status = warm.status()
+    # a task that returned False leaves the app up but degraded (503 on /healthz)
+    assert status["status"] == "degraded" and not warm.ready
+    assert status["components"]["tts"]["state"] == "ready"
+    assert status["components"]["llm"]["state"] == "failed"
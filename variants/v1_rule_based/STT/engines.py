@@ -0,0 +1,107 @@
+# variants/v1_rule_based/STT/engines.py
+"""
+STT-Engines für den Transkriptions-Worker.
+
+STT_MODEL wählt Engine und Modell:
+
+  "tiny", "base", …          openai-whisper (PyTorch, fp32) – bisheriges Verhalten
+  "ct2:tiny", "ct2:base", …  faster-whisper (CTranslate2) mit int8-Gewichten,
+                             auf ARM-CPUs deutlich schneller; statt des Namens
+                             geht auch ein Pfad zu einem konvertierten Modell
+
+Jede Engine lädt ihr Modell im Konstruktor und liefert mit transcribe()
+den Text und die (start, end, text)-Segmente. STT_THREADS und
+STT_BEAM_SIZE gelten für beide Engines.
+"""
+import os
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STT_THREADS    = int(os.getenv("STT_THREADS", 0))             # 0 = Vorgabe der Bibliothek
+STT_BEAM_SIZE  = int(os.getenv("STT_BEAM_SIZE", 1))           # 1 = greedy
+STT_CT2_COMPUTE = os.getenv("STT_CT2_COMPUTE", "int8")        # int8 | int8_float32 | float32
+
+Segment = Tuple[float, float, str]
+
+# torch.set_num_threads gilt für den ganzen Prozess; die Vorgabe wird vor
+# der ersten Änderung gemerkt, damit threads=0 sie wiederherstellt
+_torch_default_threads: Optional[int] = None
+
+
+def _set_torch_threads(threads: int) -> None:
+    global _torch_default_threads
+    import torch
+    if _torch_default_threads is None:
+        _torch_default_threads = torch.get_num_threads()
+    torch.set_num_threads(threads or _torch_default_threads)
+
+
+class WhisperEngine:
+    """openai-whisper auf PyTorch."""
+
+    def __init__(self, name: str, threads: int = STT_THREADS, beam_size: int = STT_BEAM_SIZE):
+        import whisper
+        self.threads = threads
+        _set_torch_threads(threads)
+        self.beam_size = beam_size
+        self.model = whisper.load_model(name)
+
+    def transcribe(self, audio, language: Optional[str] = None,
+                   prompt: Optional[str] = None) -> Tuple[str, List[Segment]]:
+        opts = {}
+        if language:
+            opts["language"] = language
+            opts["task"] = "transcribe"
+        if prompt:
+            opts["initial_prompt"] = prompt
+        if self.beam_size > 1:
+            opts["beam_size"] = self.beam_size
+        logger.debug(f"Starte Transkription mit Optionen {opts}")
+        # eine andere Engine im selben Prozess kann die Anzahl geändert haben
+        _set_torch_threads(self.threads)
+        res = self.model.transcribe(audio, **opts)
+        segments = [(seg["start"], seg["end"], seg["text"].strip())
+                    for seg in res.get("segments", [])]
+        return res["text"].strip(), segments
+
+
+class CT2Engine:
+    """faster-whisper (CTranslate2), quantisiert auf der CPU."""
+
+    def __init__(self, name: str, threads: int = STT_THREADS, beam_size: int = STT_BEAM_SIZE,
+                 compute_type: str = STT_CT2_COMPUTE):
+        from faster_whisper import WhisperModel
+        self.beam_size = beam_size
+        self.model = WhisperModel(name, device="cpu", compute_type=compute_type,
+                                  cpu_threads=threads)
+
+    def transcribe(self, audio, language: Optional[str] = None,
+                   prompt: Optional[str] = None) -> Tuple[str, List[Segment]]:
+        if isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+        # segments ist ein Generator: dekodiert wird erst beim Durchlaufen
+        segments, _ = self.model.transcribe(audio, language=language, initial_prompt=prompt,
+                                            beam_size=self.beam_size)
+        out = [(seg.start, seg.end, seg.text.strip()) for seg in segments]
+        return " ".join(text for _, _, text in out if text), out
+
+
+ENGINES = {"whisper": WhisperEngine, "ct2": CT2Engine}
+
+
+def parse_model(spec: str) -> Tuple[str, str]:
+    """(Engine, Modell) aus STT_MODEL: ct2:tiny -> (ct2, tiny), tiny -> (whisper, tiny)."""
+    kind, sep, name = spec.partition(":")
+    if sep and kind in ENGINES:
+        return kind, name
+    return "whisper", spec
+
+
+def load_engine(spec: str, **kwargs):
+    """Engine für *spec* mit geladenem Modell; *kwargs* z. B. threads, beam_size."""
+    kind, name = parse_model(spec)
+    return ENGINES[kind](name, **kwargs)
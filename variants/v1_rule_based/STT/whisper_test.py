@@ -1,153 +1,741 @@
 #!/usr/bin/env python3
 # variants/v1_rule_based/STT/whisper_test.py
 
-import tempfile
+import os
+import atexit
+import datetime
 import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
 import collections
+import queue
+import threading
+import time
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
-import whisper
-import webrtcvad
 import logging
 
+# sounddevice, soundfile, webrtcvad und die STT-Engine (whisper zieht torch
+# nach) werden erst beim ersten Gebrauch importiert – die Engine nur im
+# Worker-Prozess –, damit der Import dieses Moduls den App-Start nicht ausbremst.
+try:
+    from .engines import load_engine
+except ImportError:        # als Skript gestartet
+    from engines import load_engine
+
 # Start-Methode für Multiprocessing
 mp.set_start_method('fork', force=True)
 
-# Logging konfigurieren
+# Logging: Handler richtet die App (log_setup) bzw. __main__ ein
 template = '%(asctime)s [%(levelname)s] %(message)s'
-logging.basicConfig(level=logging.DEBUG, format=template)
 logger = logging.getLogger(__name__)
 
 # VAD-Parameter
 VAD_SAMPLE_RATE     = 16000      # arbeitet zuverlässig mit 16 kHz
 FRAME_DURATION_MS   = 30         # Frame-Größe (ms)
-PADDING_DURATION_MS = 1200        # Pre-/Post-Ringbuffer (ms)
-VAD_MODE            = 0          # 0–3, 3 = aggressivster
+PADDING_DURATION_MS = 1200        # Pre-/Post-Ringbuffer (ms), Modus "fixed"
+VAD_MODE            = int(os.getenv("VAD_MODE", 0))                # 0–3, 3 = aggressivster
+MAX_UTTERANCE_S     = float(os.getenv("STT_MAX_UTTERANCE", 30.0))  # Obergrenze pro Aufnahme
+
+# Endpunkt-Erkennung: "adaptive" passt die Stille bis zum Ende an die
+# Äußerung an, "fixed" ist das alte Verhalten (feste PADDING_DURATION_MS)
+STT_ENDPOINT         = os.getenv("STT_ENDPOINT", "adaptive")
+STT_TRIGGER_MS       = int(os.getenv("STT_TRIGGER_MS", 300))          # Fenster für den Sprachbeginn
+STT_TRIGGER_RATIO    = float(os.getenv("STT_TRIGGER_RATIO", 0.9))     # Anteil stimmhafter Frames darin
+STT_ENDPOINT_MIN_MS  = int(os.getenv("STT_ENDPOINT_MIN_MS", 450))     # Stille nach abgeschlossener Phrase
+STT_ENDPOINT_MAX_MS  = int(os.getenv("STT_ENDPOINT_MAX_MS", 1200))    # Stille mitten im Satz
+STT_MIN_SPEECH_MS    = int(os.getenv("STT_MIN_SPEECH_MS", 600))       # kürzer gilt nie als abgeschlossen
+STT_FALLOFF          = float(os.getenv("STT_FALLOFF", 0.6))           # Pegelabfall am Phrasenende
+STT_CALIBRATE_MS     = int(os.getenv("STT_CALIBRATE_MS", 300))        # Umgebungsgeräusch messen
+STT_NOISE_MARGIN     = float(os.getenv("STT_NOISE_MARGIN", 2.0))      # Sprache: Pegel > Faktor x Rauschen
+STT_NOISE_MAX        = float(os.getenv("STT_NOISE_MAX", 1000))        # Obergrenze des Rauschpegels (RMS)
+STT_NOISE_PERCENTILE = 20        # Rauschen = Pegel der leisesten Kalibrier-Frames
+STT_PREROLL_MS       = int(os.getenv("STT_PREROLL_MS", PADDING_DURATION_MS))  # Vorlauf vor dem Trigger
+
+# Inkrementelle Transkription: während gesprochen wird alle STT_PARTIAL_MS
+# den wachsenden Puffer neu dekodieren und stabile Segmente festschreiben
+STT_INCREMENTAL     = os.getenv("STT_INCREMENTAL", "0") == "1"
+STT_PARTIAL_MS      = int(os.getenv("STT_PARTIAL_MS", 700))
+STT_PARTIAL_MIN_S   = 1.0        # kürzere Reste nicht partiell dekodieren
+
+# Debug: jede Aufnahme zusätzlich als WAV in dieses Verzeichnis schreiben
+STT_DEBUG_WAV_DIR   = os.getenv("STT_DEBUG_WAV_DIR", "")
 
 
 def list_devices():
+    import sounddevice as sd
     logger.info("Liste verfügbare Audio-Eingabegeräte:")
     for idx, dev in enumerate(sd.query_devices()):
         if dev['max_input_channels'] > 0:
             logger.info(f"  [{idx}] {dev['name']} @ {dev['default_samplerate']:.0f} Hz")
 
 
-def record_with_vad(device: int) -> np.ndarray:
+class CaptureRing:
+    """
+    Vorab allokierter int16-Ringpuffer, den der InputStream-Callback
+    lückenlos befüllt. Positionen sind absolute Sample-Zähler seit Start.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buf = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+        self.overflows = 0
+        self._cond = threading.Condition()
+
+    def callback(self, indata, frames, time_info, status):
+        if status:
+            self.overflows += 1
+        data = indata[:, 0]
+        start = self.written % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buf[start:start + first] = data[:first]
+        if first < frames:
+            self.buf[:frames - first] = data[first:]
+        with self._cond:
+            self.written += frames
+            self._cond.notify_all()
+
+    def wait_for(self, position: int, timeout: float) -> bool:
+        """Blockiert, bis mindestens *position* Samples geschrieben sind."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.written >= position, timeout)
+
+    def frame(self, position: int, length: int) -> np.ndarray:
+        """View auf einen Frame; capacity ist ein Vielfaches der Frame-Länge."""
+        start = position % self.capacity
+        return self.buf[start:start + length]
+
+    def to_float32(self, start: int, stop: int) -> np.ndarray:
+        """Schneidet [start, stop) heraus und skaliert in einem Durchgang auf float32."""
+        n = stop - start
+        out = np.empty(n, dtype=np.float32)
+        a = start % self.capacity
+        first = min(n, self.capacity - a)
+        np.multiply(self.buf[a:a + first], 1 / 32768.0, out=out[:first], casting="unsafe")
+        if first < n:
+            np.multiply(self.buf[:n - first], 1 / 32768.0, out=out[first:], casting="unsafe")
+        return out
+
+
+def frame_rms(frame: np.ndarray) -> float:
+    f = frame.astype(np.float32)
+    return float(np.sqrt(f.dot(f) / len(f))) if len(f) else 0.0
+
+
+class Endpointer:
+    """
+    Entscheidet Frame für Frame über Sprachbeginn und -ende, in O(1) pro
+    Frame: das Trigger-Fenster führt einen laufenden Zähler statt sum().
+
+    Modus "adaptive":
+    - die ersten STT_CALIBRATE_MS messen das Umgebungsrauschen als Pegel
+      der leisesten Frames (STT_NOISE_PERCENTILE), höchstens STT_NOISE_MAX,
+      damit es auch dann unter der Sprache bleibt, wenn ab t=0 gesprochen
+      wird. Danach zählt ein Frame nur als Sprache, wenn der VAD zustimmt
+      *und* sein Pegel STT_NOISE_MARGIN x über dem Rauschen liegt. Vor
+      Sprachbeginn folgt der Rauschpegel langsam der Umgebung, aber nur auf
+      Frames, die der VAD nicht für Sprache hält.
+    - das Ende kommt nach STT_ENDPOINT_MIN_MS Stille, wenn die Phrase
+      abgeschlossen klingt (mind. STT_MIN_SPEECH_MS Sprache und der Pegel
+      ist zum Schluss unter STT_FALLOFF x Durchschnitt abgefallen, oder
+      *complete_hint()* sagt es, z. B. ein Satzzeichen im Zwischenstand),
+      sonst erst nach STT_ENDPOINT_MAX_MS.
+
+    Modus "fixed": PADDING_DURATION_MS Trigger-Fenster und Nachlauf wie früher.
+
+    feed() liefert "start", "end" oder None; bei "start" reicht die
+    Äußerung *lookback* Frames zurück, bis zu STT_PREROLL_MS (mindestens
+    das Trigger-Fenster), damit der Anfang nicht abgeschnitten wird.
+    """
+
+    def __init__(self, mode: str = None, frame_ms: int = FRAME_DURATION_MS,
+                 complete_hint=None):
+        self.mode = mode or STT_ENDPOINT
+        self.adaptive = self.mode == "adaptive"
+        self.complete_hint = complete_hint
+        frames = lambda ms: max(1, int(ms / frame_ms))
+        if self.adaptive:
+            window, ratio = frames(STT_TRIGGER_MS), STT_TRIGGER_RATIO
+            self.min_silence = frames(STT_ENDPOINT_MIN_MS)
+            self.max_silence = frames(STT_ENDPOINT_MAX_MS)
+            self.calibrate = int(STT_CALIBRATE_MS / frame_ms)
+        else:
+            window, ratio = frames(PADDING_DURATION_MS), 0.9
+            # alt: silence_count > padding_frames, d. h. Ende beim
+            # (window + 1)-ten stillen Frame in Folge – hier silence >= timeout
+            self.min_silence = self.max_silence = window + 1
+            self.calibrate = 0
+        self.window = window
+        self.preroll = max(window, frames(STT_PREROLL_MS))
+        self._needed = ratio * window
+        self._min_speech = frames(STT_MIN_SPEECH_MS)
+        self._flags = collections.deque(maxlen=window)
+        self._count = 0                 # stimmhafte Frames in _flags
+        self.noise_floor = 0.0
+        self._levels = []               # Pegel der Kalibrier-Frames
+        self.frames = 0
+        self._heard = 0                 # Frames seit Start bzw. reset_window
+        self.voiced = 0
+        self.triggered = False
+        self.lookback = 0
+        self.silence = 0                # aktuelle Stille-Serie
+        self.speech = 0                 # stimmhafte Frames seit Sprachbeginn
+        self.timeout = self.max_silence # zuletzt angewandter Nachlauf
+        self.complete = False
+        self._energy = 0.0              # Summe der Pegel stimmhafter Frames nach Beginn
+        self._energy_n = 0
+        self._tail = 0.0                # gleitender Pegel der letzten stimmhaften Frames
+
+    def reset_window(self) -> None:
+        """Nach übersprungenen Frames: das Trigger-Fenster neu füllen."""
+        self._flags.clear()
+        self._count = 0
+        self._heard = 0
+
+    def feed(self, is_speech: bool, rms: float = 0.0):
+        self.frames += 1
+        self._heard += 1
+        if self.frames <= self.calibrate:
+            # Kalibrierung: noch kein Trigger, die Frames deckt der Vorlauf ab
+            self._levels.append(rms)
+            if self.frames == self.calibrate:
+                floor = float(np.percentile(self._levels, STT_NOISE_PERCENTILE))
+                self.noise_floor = min(floor, STT_NOISE_MAX)
+            return None
+        vad_speech = is_speech
+        if self.adaptive:
+            is_speech = is_speech and rms > self.noise_floor * STT_NOISE_MARGIN
+        self.voiced += is_speech
+
+        if not self.triggered:
+            if len(self._flags) == self._flags.maxlen:
+                self._count -= self._flags[0]
+            self._flags.append(is_speech)
+            self._count += is_speech
+            if not vad_speech and self.adaptive:
+                self.noise_floor = min(self.noise_floor + 0.05 * (rms - self.noise_floor),
+                                       STT_NOISE_MAX)
+            if self._count > self._needed:
+                self.triggered = True
+                self.lookback = min(self.preroll, self._heard)
+                self.speech = self._count
+                return "start"
+            return None
+
+        if is_speech:
+            self.silence = 0
+            self.speech += 1
+            self._energy += rms
+            self._energy_n += 1
+            self._tail += 0.3 * (rms - self._tail) if self._tail else rms
+            return None
+        self.silence += 1
+        if self.silence == 1:
+            self.complete = self._sounds_complete()
+            self.timeout = self.min_silence if self.complete else self.max_silence
+        elif not self.complete and self.complete_hint is not None and self.complete_hint():
+            # der Zwischenstand kann während der Pause nachkommen
+            self.complete, self.timeout = True, self.min_silence
+        return "end" if self.silence >= self.timeout else None
+
+    def _sounds_complete(self) -> bool:
+        if not self.adaptive or self.speech < self._min_speech:
+            return False
+        if self.complete_hint is not None and self.complete_hint():
+            return True
+        n = self._energy_n
+        return n > 0 and self._tail < STT_FALLOFF * self._energy / n
+
+
+def read_wav(path: str) -> np.ndarray:
+    """Mono int16 mit VAD_SAMPLE_RATE aus einer PCM-WAV (8/16 Bit), linear umgetastet."""
+    import wave
+    with wave.open(path) as w:
+        width, rate, channels = w.getsampwidth(), w.getframerate(), w.getnchannels()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, np.uint8).astype(np.int16) - 128) * 256
+    elif width == 2:
+        data = np.frombuffer(raw, "<i2")
+    else:
+        raise ValueError(f"Nicht unterstützte Sample-Breite {width} in {path}")
+    data = data.reshape(-1, channels).mean(axis=1)
+    if rate != VAD_SAMPLE_RATE:
+        t = np.arange(int(len(data) * VAD_SAMPLE_RATE / rate)) * rate / VAD_SAMPLE_RATE
+        data = np.interp(t, np.arange(len(data)), data)
+    return data.astype(np.int16)
+
+
+def endpoint_audio(audio: np.ndarray, is_speech=None, mode: str = None,
+                   complete_hint=None) -> dict:
+    """
+    Lässt den Endpointer offline über eine Aufnahme laufen (int16, 16 kHz,
+    z. B. aus read_wav), etwa zum Abstimmen der STT_ENDPOINT_*-Werte an
+    aufgenommenen WAVs. *is_speech(frame) -> bool* ersetzt webrtcvad.
+    Liefert Beginn (samt Vorlauf), Trigger und Ende in Sekunden (None, wenn
+    nicht erkannt) und die Endpointer-Zustände.
+    """
+    if is_speech is None:
+        import webrtcvad
+        vad = webrtcvad.Vad(VAD_MODE)
+        is_speech = lambda frame: vad.is_speech(frame.tobytes(), VAD_SAMPLE_RATE)
+    ep = Endpointer(mode, complete_hint=complete_hint)
+    n = int(VAD_SAMPLE_RATE * FRAME_DURATION_MS / 1000)
+    start = trigger = end = None
+    for i in range(len(audio) // n):
+        frame = audio[i * n:(i + 1) * n]
+        event = ep.feed(bool(is_speech(frame)), frame_rms(frame))
+        if event == "start":
+            start = (i + 1 - ep.lookback) * n / VAD_SAMPLE_RATE
+            trigger = (i + 1) * n / VAD_SAMPLE_RATE
+        elif event == "end":
+            end = (i + 1) * n / VAD_SAMPLE_RATE
+            break
+    return {"start_s": start, "trigger_s": trigger, "end_s": end, "noise_floor": round(ep.noise_floor, 1),
+            "trailing_ms": ep.silence * FRAME_DURATION_MS if end is not None else None,
+            "complete": ep.complete, "voiced": ep.voiced, "frames": ep.frames}
+
+
+def record_with_vad(device: int, on_progress=None, complete_hint=None) -> np.ndarray:
     """
     Nimmt Sprache auf bis Ende erkannt per webrtcvad:
-    - 16 kHz, mono
+    - 16 kHz, mono, kontinuierlicher InputStream in einen Ringpuffer
     - 30 ms Frames
-    - 300 ms Pre-Buffer
-    - Stoppt nach 300 ms Non-Speech
+    - Beginn und Ende entscheidet der Endpointer (STT_ENDPOINT), spätestens
+      nach MAX_UTTERANCE_S ist Schluss
+
+    In der Schleife wird nicht geloggt; am Ende fasst eine Zeile die
+    Äußerung zusammen. *on_progress(ring, utt_start, pos)* wird nach
+    Sprachbeginn für jeden Frame aufgerufen (z. B. IncrementalTranscriber.update)
+    und darf nicht blockieren; *complete_hint* geht an den Endpointer.
     """
-    logger.debug(f"Starte VAD-Recording auf Gerät {device}")
-    sd.default.device = device
-    sd.default.samplerate = VAD_SAMPLE_RATE
-    sd.default.channels = 1
+    import sounddevice as sd
+    import webrtcvad
 
     vad = webrtcvad.Vad(VAD_MODE)
+    ep = Endpointer(complete_hint=complete_hint)
     frame_length = int(VAD_SAMPLE_RATE * FRAME_DURATION_MS / 1000)
-    padding_frames = int(PADDING_DURATION_MS / FRAME_DURATION_MS)
+    max_samples = int(MAX_UTTERANCE_S * VAD_SAMPLE_RATE)
+    capacity_frames = -(-(max_samples + (ep.preroll + ep.max_silence) * frame_length) // frame_length)
+    ring = CaptureRing(capacity_frames * frame_length)
 
-    ring_buffer = collections.deque(maxlen=padding_frames)
-    triggered = False
-    voiced_frames = []
-    silence_count = 0
+    utt_start = 0
+    pos = 0
+    skipped = 0
+    reason = "Sprachende"
+    t0 = time.perf_counter()
 
-    logger.info("Aufnahme bis Ende-Sprache (VAD) erkannt…")
-    logger.debug(f"Frame-Länge: {frame_length} Samples, Puffergröße: {padding_frames} Frames")
+    with sd.InputStream(device=device,
+                        samplerate=VAD_SAMPLE_RATE,
+                        channels=1,
+                        dtype='int16',
+                        blocksize=frame_length,
+                        callback=ring.callback):
+        while True:
+            if not ring.wait_for(pos + frame_length, timeout=2.0):
+                raise RuntimeError(f"Keine Audiodaten von Gerät {device}")
+            if ring.written - pos > ring.capacity - frame_length:
+                # Verbraucher zu langsam: auf den jüngsten Frame springen
+                new_pos = (ring.written // frame_length - 1) * frame_length
+                skipped += (new_pos - pos) // frame_length
+                pos = new_pos
+                ep.reset_window()
 
-    frame_index = 0
-    while True:
-        block = sd.rec(frame_length, dtype='int16')
-        sd.wait()
-        frame = block.tobytes()
-
-        is_speech = vad.is_speech(frame, VAD_SAMPLE_RATE)
-        logger.debug(f"Frame {frame_index}: {'Speech' if is_speech else 'Silence'}")
-
-        if not triggered:
-            ring_buffer.append((frame, is_speech))
-            num_voiced = sum(1 for f, s in ring_buffer if s)
-            logger.debug(f"Ringbuffer: {num_voiced}/{ring_buffer.maxlen} voiced")
-            if num_voiced > 0.9 * ring_buffer.maxlen:
-                triggered = True
-                logger.info(f"Sprachbeginn erkannt bei Frame {frame_index}")
-                for f, _ in ring_buffer:
-                    voiced_frames.append(f)
-                ring_buffer.clear()
-        else:
-            voiced_frames.append(frame)
-            if not is_speech:
-                silence_count += 1
-                logger.debug(f"Stille-Count: {silence_count}/{padding_frames}")
-                if silence_count > padding_frames:
-                    logger.info(f"Sprachende erkannt bei Frame {frame_index}")
+            frame = ring.frame(pos, frame_length)
+            event = ep.feed(vad.is_speech(frame.tobytes(), VAD_SAMPLE_RATE), frame_rms(frame))
+            pos += frame_length
+
+            if event == "start":
+                utt_start = pos - ep.lookback * frame_length
+            elif ep.triggered:
+                if event == "end":
+                    break
+                if pos - utt_start >= max_samples:
+                    reason = "Maximallänge"
                     break
-            else:
-                if silence_count > 0:
-                    logger.debug("Sprache erneut erkannt, Silence-Count zurücksetzen")
-                silence_count = 0
-
-        frame_index += 1
-    
-    # zusammensetzen und zu numpy
-    audio_bytes = b''.join(voiced_frames)
-    audio = np.frombuffer(audio_bytes, dtype='int16').astype(np.float32) / 32768.0
+                if on_progress is not None:
+                    on_progress(ring, utt_start, pos)
+
+    audio = ring.to_float32(utt_start, pos)
     duration = len(audio) / VAD_SAMPLE_RATE
-    logger.info(f"Aufnahme beendet, Länge: {duration:.2f}s.")
+    level = logging.WARNING if ring.overflows or skipped or reason != "Sprachende" else logging.INFO
+    logger.log(level,
+               f"VAD: Gerät {device}, {duration:.2f}s Sprache ab Sample {utt_start}, "
+               f"Ende: {reason} nach {ep.silence * FRAME_DURATION_MS} ms Stille "
+               f"({ep.mode}, {'abgeschlossen' if ep.complete else 'offen'}), "
+               f"Rauschen {ep.noise_floor:.0f}, {ep.voiced}/{ep.frames} Frames stimmhaft, "
+               f"{ring.overflows} Overflows, {skipped} Frames übersprungen, "
+               f"{time.perf_counter() - t0:.2f}s gesamt")
     return audio
 
 
 def save_wav(audio: np.ndarray, samplerate: int, path: str):
     try:
+        import soundfile as sf
         sf.write(path, audio, samplerate)
         logger.info(f"WAV gespeichert: {path}")
     except Exception as e:
         logger.error(f"Fehler beim Speichern der WAV: {e}")
 
 
-def _worker_transcribe(model_name: str, audio_path: str, language: str, out_q: mp.Queue):
-    try:
-        logger.debug(f"Lade Whisper-Modell '{model_name}' im Subprozess")
-        model = whisper.load_model(model_name)
-        opts = {}
-        if language:
-            opts["language"] = language
-            opts["task"] = "transcribe"
-        logger.debug(f"Starte Transkription: {audio_path} mit Optionen {opts}")
-        res = model.transcribe(audio_path, **opts)
-        text = res["text"].strip()
-        logger.info("Transkription abgeschlossen")
-        out_q.put(text)
-    except Exception as e:
-        logger.exception("Fehler in _worker_transcribe")
-        out_q.put(None)
+def _share_audio(audio: np.ndarray) -> shared_memory.SharedMemory:
+    """Legt *audio* (float32, 16 kHz) in Shared Memory für den Worker ab."""
+    shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+    view = np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)
+    view[:] = audio
+    del view
+    return shm
+
+
+def _open_audio(ref):
+    """
+    Gibt (audio, shm) für eine Job-Referenz zurück: entweder einen Dateipfad
+    oder ein ("shm", name, n_samples)-Tupel, das ohne Kopie gemappt wird.
+    """
+    if ref is None or isinstance(ref, str):
+        return ref, None
+    _, name, n_samples = ref
+    # das Öffnen meldet den Block beim resource_tracker an; geteilt ist der
+    # nur, weil TranscriptionWorker._start ihn vor dem Fork startet (sonst
+    # meldet ein eigener Tracker des Workers jeden Block als Leck). Freigeben
+    # (unlink) tut der Elternprozess nach dem Job, der Worker schließt nur
+    shm = shared_memory.SharedMemory(name=name)
+    return np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf), shm
+
+
+def _worker_loop(jobs: mp.Queue, results: mp.Queue):
+    """
+    Läuft dauerhaft im Subprozess: nimmt Jobs aus *jobs* entgegen und lädt
+    jedes STT-Modell (Engine siehe engines.py) nur beim ersten Gebrauch. Jedes Ergebnis trägt die
+    Zeiten für Modell-Laden und Transkription sowie die Segmente
+    (start, end, text) mit. Ein Job ohne Audio lädt nur das Modell (Warm-up).
+    """
+    models = {}
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, model_name, audio_ref, language, prompt = job
+        audio, shm = None, None
+        timings = {}
+        try:
+            audio, shm = _open_audio(audio_ref)
+            model = models.get(model_name)
+            if model is None:
+                logger.debug(f"Lade STT-Modell '{model_name}' im Worker")
+                t0 = time.perf_counter()
+                model = models[model_name] = load_engine(model_name)
+                timings["model_load"] = time.perf_counter() - t0
+            if audio is None:
+                results.put((job_id, "", timings, []))
+                continue
+            t0 = time.perf_counter()
+            text, segments = model.transcribe(audio, language, prompt)
+            timings["transcribe"] = time.perf_counter() - t0
+            logger.debug("Transkription abgeschlossen")
+            results.put((job_id, text, timings, segments))
+        except Exception:
+            logger.exception("Fehler in _worker_loop")
+            results.put((job_id, None, timings, []))
+        finally:
+            del audio
+            if shm is not None:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+
+
+class TranscriptionWorker:
+    """
+    Langlebiger Transkriptions-Prozess. Jobs laufen seriell über eine Queue,
+    jeder mit eigenem Timeout; hängt oder stirbt der Prozess, wird er neu
+    gestartet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._proc = None
+        self._jobs = None
+        self._results = None
+        self._next_id = 0
+
+    def _start(self):
+        self._jobs = mp.Queue()
+        self._results = mp.Queue()
+        # Tracker vor dem Fork starten, sonst legt der Worker beim ersten
+        # Shared-Memory-Block einen eigenen an, der jeden Block als Leck meldet
+        resource_tracker.ensure_running()
+        self._proc = mp.Process(target=_worker_loop,
+                                args=(self._jobs, self._results),
+                                daemon=True)
+        self._proc.start()
+        logger.debug(f"Transkriptions-Worker gestartet (pid={self._proc.pid})")
+
+    def _stop(self):
+        if self._proc is None:
+            return
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self._proc.join()
+        self._proc = None
+
+    def _restart(self):
+        self._stop()
+        self._start()
+
+    def _ensure_running(self):
+        if self._proc is None or not self._proc.is_alive():
+            if self._proc is not None:
+                logger.warning("Transkriptions-Worker war beendet, starte neu")
+            self._restart()
+
+    def ensure_started(self):
+        """Startet den Subprozess vorab, z. B. bevor der Webserver Threads anlegt."""
+        with self._lock:
+            self._ensure_running()
+
+    def transcribe(self,
+                   model_name: str,
+                   audio: np.ndarray | str,
+                   language: str,
+                   timeout: float = 15,
+                   timings: dict | None = None,
+                   prompt: str | None = None,
+                   segments: list | None = None) -> str | None:
+        """
+        *audio* ist entweder ein float32-Array mit 16 kHz (wird per Shared
+        Memory übergeben) oder ein Pfad zu einer Audiodatei. Ein *timings*-
+        Dict bekommt die Sekunden für "handoff" (Shared Memory + Queue),
+        "model_load" (nur falls geladen wurde) und "transcribe". *prompt*
+        geht als initial_prompt an Whisper; eine *segments*-Liste bekommt
+        die (start, end, text)-Segmente.
+        """
+        t0 = time.perf_counter()
+        shm = None
+        if isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            shm = _share_audio(audio)
+            audio_ref = ("shm", shm.name, len(audio))
+        else:
+            audio_ref = audio
+        try:
+            text, worker_timings, worker_segments = self._run_job(
+                model_name, audio_ref, language, timeout, prompt)
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        if timings is not None and worker_timings:
+            timings.update(worker_timings)
+            timings["handoff"] = max(0.0, time.perf_counter() - t0 - sum(worker_timings.values()))
+        if segments is not None:
+            segments.extend(worker_segments)
+        return text
+
+    def _run_job(self, model_name, audio_ref, language, timeout, prompt=None) -> tuple:
+        with self._lock:
+            self._ensure_running()
+
+            self._next_id += 1
+            job_id = self._next_id
+            self._jobs.put((job_id, model_name, audio_ref, language, prompt))
+
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("Transkription läuft zu lange, Worker wird neu gestartet")
+                    self._restart()
+                    return None, {}, []
+                try:
+                    rid, text, timings, segments = self._results.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    if not self._proc.is_alive():
+                        logger.warning("Transkriptions-Worker abgestürzt, wird neu gestartet")
+                        self._restart()
+                        return None, {}, []
+                    continue
+                if rid == job_id:
+                    return text, timings, segments
+                logger.debug(f"Verwerfe veraltetes Ergebnis für Job {rid}")
+
+    def warm_up(self, model_name: str, timeout: float = 300) -> bool:
+        """Lädt *model_name* im Worker vor, ohne etwas zu transkribieren."""
+        text, timings, _ = self._run_job(model_name, None, None, timeout)
+        if text is None:
+            return False
+        if "model_load" in timings:
+            logger.info(f"Whisper-Modell '{model_name}' vorgeladen ({timings['model_load']:.2f} s)")
+        return True
+
+    def unload(self, model_name: str, timeout: float = 30) -> bool:
+        """
+        Gibt *model_name* frei, indem der Worker neu gestartet wird: ein
+        gelöschtes Modell samt gc.collect() gibt den Speicher von torch bzw.
+        CTranslate2 nicht ans System zurück, erst das Prozessende tut es.
+        Der nächste Job lädt sein Modell im frischen Worker neu.
+        """
+        with self._lock:
+            if self._proc is not None and self._proc.is_alive():
+                self._jobs.put(None)
+                self._proc.join(timeout)
+            self._restart()
+        logger.debug(f"Whisper-Modell '{model_name}' freigegeben (Worker neu gestartet)")
+        return True
+
+    @property
+    def pid(self) -> int | None:
+        """PID des Worker-Prozesses (für RSS-Messungen)."""
+        proc = self._proc
+        return proc.pid if proc is not None else None
+
+    def shutdown(self):
+        with self._lock:
+            if self._proc is not None and self._proc.is_alive():
+                self._jobs.put(None)
+                self._proc.join(2)
+            self._stop()
+
+
+_WORKER: TranscriptionWorker | None = None
+_WORKER_LOCK = threading.Lock()
+
+
+def get_worker() -> TranscriptionWorker:
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            _WORKER = TranscriptionWorker()
+            atexit.register(_WORKER.shutdown)
+        return _WORKER
 
 
 def transcribe_with_timeout(model_name: str,
-                            audio_path: str,
+                            audio: np.ndarray | str,
                             language: str,
-                            timeout: int = 15) -> str | None:
-    logger.debug(f"Starte Transkriptions-Prozess mit Timeout={timeout}s")
-    q = mp.Queue()
-    p = mp.Process(target=_worker_transcribe,
-                   args=(model_name, audio_path, language, q))
-    p.start()
-    p.join(timeout)
-    if p.is_alive():
-        logger.warning("Transkriptions-Prozess läuft zu lange, wird terminiert")
-        p.terminate()
-        p.join()
-        return None
-    try:
-        result = q.get_nowait()
-        logger.debug(f"Erhaltenes Transkript: {result}")
-        return result
-    except Exception:
-        logger.error("Keine Transkript-Daten im Queue gefunden")
-        return None
+                            timeout: int = 15,
+                            timings: dict | None = None) -> str | None:
+    logger.debug(f"Übergebe Transkriptions-Job an Worker mit Timeout={timeout}s")
+    result = get_worker().transcribe(model_name, audio, language, timeout, timings)
+    logger.debug(f"Erhaltenes Transkript: {result}")
+    return result
+
+
+class IncrementalTranscriber:
+    """
+    Transkribiert, während noch gesprochen wird.
+
+    record_with_vad meldet per update() den Fortschritt; ein Thread dekodiert
+    alle STT_PARTIAL_MS den noch nicht festgeschriebenen Teil der Äußerung
+    neu, mit dem bisher festgeschriebenen Text als Whisper-Prompt. Segmente,
+    die zwei Durchläufe hintereinander gleich liefern (außer dem letzten, der
+    noch wachsen kann), werden festgeschrieben und ihr Audio fällt aus dem
+    nächsten Durchlauf heraus. finish() muss am Ende nur noch den Rest
+    dekodieren.
+
+        inc = IncrementalTranscriber("tiny", "de", on_partial=print)
+        audio = record_with_vad(device, inc.update, inc.looks_complete)
+        text = inc.finish(audio)
+    """
+
+    def __init__(self, model_name: str, language: str, on_partial=None,
+                 interval_ms: int = STT_PARTIAL_MS,
+                 worker: "TranscriptionWorker | None" = None):
+        self.model_name = model_name
+        self.language = language
+        self.on_partial = on_partial
+        self.interval = interval_ms / 1000
+        self.worker = worker or get_worker()
+        self.committed = ""          # festgeschriebener Text
+        self.partials = 0            # Anzahl partieller Durchläufe
+        self.partial_seconds = 0.0   # Zeit darin
+        self._commit = 0             # Samples ab Äußerungsbeginn, die festgeschrieben sind
+        self._previous = []          # Segmente des letzten Durchlaufs
+        self._progress = None        # (ring, utt_start, pos) aus dem Capture-Loop
+        self._latest = ""            # letzter Zwischenstand
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="stt-incremental",
+                                        daemon=True)
+        self._thread.start()
+
+    def update(self, ring: CaptureRing, utt_start: int, pos: int) -> None:
+        """Aus dem Capture-Loop: nur merken, nie blockieren."""
+        self._progress = (ring, utt_start, pos)
+
+    def _prompt(self) -> str | None:
+        # Whisper nutzt ohnehin nur das Ende des Prompts
+        return self.committed[-200:] or None
+
+    def _loop(self):
+        decoded_to = 0
+        min_samples = int(STT_PARTIAL_MIN_S * VAD_SAMPLE_RATE)
+        step = int(self.interval * VAD_SAMPLE_RATE)
+        while not self._closed.wait(self.interval):
+            progress = self._progress
+            if progress is None:
+                continue
+            ring, utt_start, pos = progress
+            start = utt_start + self._commit
+            if pos - decoded_to < step or pos - start < min_samples:
+                continue
+            decoded_to = pos
+            audio = ring.to_float32(start, pos)
+            segments = []
+            t0 = time.perf_counter()
+            text = self.worker.transcribe(self.model_name, audio, self.language,
+                                          prompt=self._prompt(), segments=segments)
+            self.partial_seconds += time.perf_counter() - t0
+            self.partials += 1
+            if text is None or self._closed.is_set():
+                continue
+            pending = self._advance(segments)
+            self._latest = " ".join(t for t in (self.committed, pending) if t)
+            if self.on_partial is not None:
+                try:
+                    self.on_partial(self._latest)
+                except Exception:
+                    logger.exception("on_partial fehlgeschlagen")
+
+    def looks_complete(self) -> bool:
+        """Endet der Zwischenstand mit einem Satzzeichen? Hinweis für den Endpointer."""
+        return self._latest.rstrip().endswith((".", "?", "!"))
+
+    def _advance(self, segments: list) -> str:
+        """Stabile Segmente festschreiben; gibt den noch offenen Text zurück."""
+        stable = 0
+        for new, old in zip(segments[:-1], self._previous):
+            if new[2] != old[2]:
+                break
+            stable += 1
+        if stable:
+            self.committed = " ".join(t for t in [self.committed] +
+                                      [seg[2] for seg in segments[:stable]] if t)
+            self._commit += int(segments[stable - 1][1] * VAD_SAMPLE_RATE)
+            # Zeitachse verschoben – der nächste Durchlauf beginnt von vorn zu vergleichen
+            self._previous = []
+        else:
+            self._previous = segments
+        return " ".join(seg[2] for seg in segments[stable:])
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+
+    def finish(self, audio: np.ndarray, timings: dict | None = None,
+               timeout: float = 15) -> str | None:
+        """Rest nach dem Festgeschriebenen dekodieren und den ganzen Text liefern."""
+        self.close()
+        tail = audio[self._commit:]
+        logger.info(f"Inkrementell: {self.partials} Teil-Durchläufe "
+                    f"({self.partial_seconds:.2f}s), {self._commit / VAD_SAMPLE_RATE:.2f}s "
+                    f"festgeschrieben, Rest {len(tail) / VAD_SAMPLE_RATE:.2f}s")
+        if len(tail) < VAD_SAMPLE_RATE // 4 and self.committed:
+            return self.committed
+        text = self.worker.transcribe(self.model_name, tail, self.language, timeout,
+                                      timings, prompt=self._prompt())
+        if text is None:
+            return self.committed or None
+        return " ".join(t for t in (self.committed, text) if t)
 
 
 def record_and_transcribe(device_index: int,
@@ -155,34 +743,67 @@ def record_and_transcribe(device_index: int,
                          model_name: str,
                          language: str) -> str:
     """
-    Nimmt auf bis Ende-Sprache per VAD, speichert WAV und transkribiert.
+    Nimmt auf bis Ende-Sprache per VAD und transkribiert direkt aus dem
+    Speicher. Mit STT_DEBUG_WAV_DIR wird die Aufnahme zusätzlich als WAV
+    abgelegt, mit STT_INCREMENTAL=1 schon während der Aufnahme transkribiert.
     """
     logger.info(f"record_and_transcribe: device={device_index}, model={model_name}, lang={language}")
-    audio = record_with_vad(device_index)
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        save_wav(audio, VAD_SAMPLE_RATE, tmp.name)
-        logger.debug(f"Erstelle temporäre Datei: {tmp.name}")
-        logger.info(f"Lade Whisper-Modell '{model_name}' …")
-        text = transcribe_with_timeout(model_name, tmp.name, language, timeout=15)
-        if not text:
-            logger.warning("STT fehlgeschlagen oder Timeout zurückgegeben")
-            return "sorry, didnt understand"
-        return text
+    inc = None
+    if STT_INCREMENTAL:
+        inc = IncrementalTranscriber(model_name, language,
+                                     on_partial=lambda t: logger.info(f"Zwischenstand: {t}"))
+    try:
+        audio = record_with_vad(device_index, inc.update if inc else None,
+                                inc.looks_complete if inc else None)
+    except Exception:
+        if inc is not None:
+            inc.close()
+        raise
+    return transcribe_audio(audio, model_name, language, incremental=inc)
+
+
+def transcribe_audio(audio: np.ndarray, model_name: str, language: str,
+                     timings: dict | None = None,
+                     incremental: IncrementalTranscriber | None = None) -> str:
+    """
+    Transkribiert eine fertige Aufnahme über den Worker – mit *incremental*
+    nur noch den Rest, den dieser nicht schon festgeschrieben hat.
+    Fehler/Timeout => "sorry, didnt understand". *timings* wie bei
+    TranscriptionWorker.transcribe.
+    """
+    if STT_DEBUG_WAV_DIR:
+        name = datetime.datetime.now().strftime("utt_%Y%m%d_%H%M%S_%f.wav")
+        save_wav(audio, VAD_SAMPLE_RATE, os.path.join(STT_DEBUG_WAV_DIR, name))
+    if incremental is not None:
+        text = incremental.finish(audio, timings)
+    else:
+        text = transcribe_with_timeout(model_name, audio, language, timeout=15, timings=timings)
+    if not text:
+        logger.warning("STT fehlgeschlagen oder Timeout zurückgegeben")
+        return "sorry, didnt understand"
+    return text
 
 if __name__ == "__main__":
     import argparse
+    logging.basicConfig(level=logging.DEBUG, format=template)
     parser = argparse.ArgumentParser(description="Whisper STT local mit VAD und Logging")
     parser.add_argument("--list-devices", action="store_true")
     parser.add_argument("--device", type=int, default=None)
     parser.add_argument("--duration", type=float, default=5.0,
                         help="wird ignoriert, da VAD-Recording")
-    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--model", default="tiny", help='z. B. "tiny" oder "ct2:tiny"')
     parser.add_argument("--lang", default=None)
+    parser.add_argument("--endpoint-wav", nargs="+", metavar="WAV",
+                        help="nur Endpunkt-Erkennung offline über diese Aufnahmen laufen lassen")
     args = parser.parse_args()
 
     if args.list_devices:
         list_devices()
+    elif args.endpoint_wav:
+        for path in args.endpoint_wav:
+            print(path, endpoint_audio(read_wav(path)))
     else:
+        import sounddevice as sd
         dev = args.device if args.device is not None else sd.default.device[0]
         result = record_and_transcribe(dev, args.duration, args.model, args.lang)
         print(result)
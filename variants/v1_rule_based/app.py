@@ -1,32 +1,63 @@
 #!/usr/bin/env python3
 import os
 import socket
+import contextlib
+import threading
 import webbrowser
 import logging
-from flask import Flask, render_template, request, jsonify
+from collections import OrderedDict
+from flask import Flask, Response, render_template, request, jsonify
 
 import board
 import busio
-from PIL import Image, ImageDraw, ImageFont
 import adafruit_ssd1306
 
-from STT.whisper_test import record_and_transcribe
+from STT.whisper_test import (record_with_vad, transcribe_audio, get_worker,
+                               IncrementalTranscriber, STT_INCREMENTAL)
+from STT.engines import parse_model
 import backend
+import display
+import expressions_store
+import log_setup
+import pipeline
+import residency
+import response_bank
+import response_cache
+import serving
+import tracing
 import utils
+import warmup
+from sensors.plants import UnknownPlant, get_registry
+from sensors.nodes import NodeListener
 
-logging.basicConfig(
-    filename="plant_interface.log",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-)
+# all modules log through one queue; a listener thread does the file I/O
+log_setup.setup_logging()
 
 app = Flask(__name__)
 
 # STT defaults
 STT_DEVICE   = int(os.getenv("STT_DEVICE", 1))
 STT_DURATION = float(os.getenv("STT_DURATION", 10.0))
-STT_MODEL    = os.getenv("STT_MODEL", "tiny")
+STT_MODEL    = os.getenv("STT_MODEL", "tiny")      # "ct2:tiny" = int8 CTranslate2 engine
 STT_LANG     = os.getenv("STT_LANG", "en")
+# RSS of a loaded Whisper model (CPU, fp32) until the first load is measured;
+# the int8 CTranslate2 weights (STT_MODEL=ct2:…) take roughly a third
+WHISPER_ESTIMATE_MB = {"tiny": 150, "base": 250, "small": 700, "medium": 1800}
+
+# who answers: "v1" sends the prompt to Ollama, "v2" runs a GGUF model in
+# this process with llama.cpp (variants/v2_local_llm); both share the
+# sensors, prompt, caches and deadline handling of backend.py
+PLANT_VARIANT = os.getenv("PLANT_VARIANT", "v1")
+if PLANT_VARIANT == "v2":
+    from variants.v2_local_llm import chat_interface as variant
+    VARIANT_STREAM = True           # tokens come from this process anyway
+else:
+    variant, VARIANT_STREAM = backend, backend.OLLAMA_STREAM
+    backend.register_llm()
+
+# fork the transcription worker before Flask spins up request threads;
+# whisper/torch are only imported inside it, during the warm-up below
+get_worker().ensure_started()
 
 # OLED setup
 i2c = busio.I2C(board.SCL, board.SDA)
@@ -34,44 +65,205 @@ disp = adafruit_ssd1306.SSD1306_I2C(128, 64, i2c, addr=0x3C)
 disp.fill(0)
 disp.show()
 
-# font setup – put your actual Symbola.ttf path here
-FONT_PATH = "/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf"
+# font setup – put your actual Symbola.ttf path here (or set OLED_FONT)
+FONT_PATH = os.getenv("OLED_FONT", "/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf")
 if not os.path.exists(FONT_PATH):
     raise RuntimeError(f"Font not found at {FONT_PATH}")
-font = ImageFont.truetype(FONT_PATH, 48)
-
-def show_emoji(emoji_char: str):
-    disp.fill(0)
-    img = Image.new("1", (disp.width, disp.height))
-    draw = ImageDraw.Draw(img)
-    # measure text
-    bbox = draw.textbbox((0, 0), emoji_char, font=font)
-    w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    x = (disp.width - w) // 2
-    y = (disp.height - h) // 2
-    draw.text((x, y), emoji_char, font=font, fill=255)
-    disp.image(img)
-    disp.show()
-
-def process_user_input(user_text: str, mode: str, lang: str) -> dict:
-    logging.info("User input: %r", user_text)
-    msg = backend.generate_message(user_prompt=user_text)
-    response, emoji = msg["response"], msg["emoji"]
+glyphs = display.GlyphCache(FONT_PATH, 48, disp.width, disp.height)
+oled = display.OledDisplay(disp, glyphs)
+
+# poll every plant's sensors in the background so requests only read a
+# snapshot, and keep a compact on-disk history of what was sampled
+plants = get_registry()
+for p in plants:
+    p.start()
+# remote plants report over UDP
+nodes = NodeListener(plants).start() if plants.remote else None
+
+# fixed phrases rendered into the TTS cache at startup
+SORRY_TEXT = "sorry, didnt understand"
+PREWARM_PHRASES = [SORRY_TEXT] + [
+    p for p in os.getenv("TTS_PREWARM", "").split("|") if p.strip()
+]
+ALL_EMOJIS = sorted({e for es in expressions_store._mood_to_emojis.values() for e in es} | {"", "❓"})
+
+# in deadline mode the canned replies must be ready to play instantly;
+# late LLM replies that the bank keeps are rendered on the tts stage
+if backend.TURN_DEADLINE_S > 0:
+    bank = response_bank.get_bank()
+    PREWARM_PHRASES += bank.phrases()
+
+    def _render_learned(text: str):
+        try:
+            pipeline.submit("tts", utils.synthesize, text, STT_LANG, persist=True)
+        except pipeline.StageBusy:
+            logging.info("TTS busy – learned reply is rendered on first use")
+    bank.on_learn = _render_learned
+
+# Whisper lives in the transcription worker; the voices register
+# themselves in utils, the LLM of the active variant above. Within
+# RESIDENCY_BUDGET_MB the least recently used model is unloaded to make
+# room (see residency.py)
+def _stt_estimate_mb(spec: str) -> float:
+    engine, name = parse_model(spec)
+    return WHISPER_ESTIMATE_MB.get(name, 0) / (3 if engine == "ct2" else 1)
 
-    show_emoji(emoji)
+models = residency.get_manager()
+STT_RESIDENT = f"stt:{STT_MODEL}"
+models.register(STT_RESIDENT, lambda: get_worker().warm_up(STT_MODEL),
+                lambda: get_worker().unload(STT_MODEL), stage="stt",
+                pid=lambda: get_worker().pid,
+                estimate_mb=_stt_estimate_mb(STT_MODEL))
+models.watch_process("stt", lambda: get_worker().pid)
+models.start()
 
+# load everything slow in parallel behind the already running UI, so the
+# first voice turn is warm; progress is reported on /healthz
+warm = warmup.Warmup()
+warm.add("tts", lambda: utils.prewarm(PREWARM_PHRASES, STT_LANG))
+warm.add("stt", lambda: models.acquire(STT_RESIDENT))
+warm.add("llm", lambda: models.acquire(variant.LLM_RESIDENT))
+warm.add("glyphs", lambda: glyphs.prerender(ALL_EMOJIS, ["still", *display.ANIMATIONS]))
+warm.start()
+
+# moods that make the plant droop instead of blink
+DROOPY_MOODS = {"highly_stressed", "moderately_stressed", "very_dry", "very_hot",
+                "very_dry_air", "light_deprived"}
+
+# (emoji, mood) last animated; the display stage runs one job at a time
+_last_face: tuple = (None, None)
+
+def show_emoji(emoji_char: str, mood: str | None = None):
+    global _last_face
+    with tracing.span("display"):
+        if mood is None or (emoji_char, mood) == _last_face:
+            # unchanged: only the dirty pages are sent, i.e. none
+            oled.show_emoji(emoji_char)
+        else:
+            oled.animate(emoji_char, "droop" if mood in DROOPY_MOODS else "blink")
+        _last_face = (emoji_char, mood)
+
+def process_user_input(user_text: str, mode: str, lang: str,
+                       session_id: str | None = None, plant_id: str | None = None) -> dict:
+    logging.info("User input: %r", user_text)
+    # with TURN_DEADLINE_S the bank answers if the LLM is late; prefer
+    # replies whose audio is already rendered
+    ready = (lambda text: utils.is_cached(text, lang)) if mode == "speak" else None
     if mode == "speak":
-        utils.speak_text(response, lang)
+        # the voice is needed as soon as the first sentence is there
+        models.prepare("tts")
+    if mode == "speak" and VARIANT_STREAM:
+        # speak sentence by sentence while the model is still generating
+        speech = utils.SpeechPipeline(lang)
+        try:
+            msg = backend.generate_with_deadline(user_prompt=user_text, on_sentence=speech.say,
+                                                 session_id=session_id, plant_id=plant_id,
+                                                 ready=ready, generate=variant.generate_message)
+        finally:
+            speech.close()
+        response, emoji = msg["response"], msg["emoji"]
+        pipeline.run("display", show_emoji, emoji, msg.get("mood"))
+    else:
+        msg = backend.generate_with_deadline(user_prompt=user_text, session_id=session_id,
+                                             plant_id=plant_id, ready=ready,
+                                             generate=variant.generate_message)
+        response, emoji = msg["response"], msg["emoji"]
+
+        pipeline.run("display", show_emoji, emoji, msg.get("mood"))
+
+        if mode == "speak":
+            pipeline.run("tts", utils.speak_text, response, lang)
 
     return {"user_text": user_text, "response": response, "emoji": emoji}
 
+def _session_id(data: dict, plant) -> str:
+    # one conversation history per browser and plant unless the client sends its own id
+    session = str(data.get("session_id") or request.remote_addr)
+    return session if len(plants) == 1 else f"{plant.id}/{session}"
+
+# request ID -> latest partial transcript of a running /talk (polled by the UI)
+_PARTIALS: "OrderedDict[str, str]" = OrderedDict()
+_PARTIALS_MAX = 32
+_PARTIALS_LOCK = threading.Lock()    # written by transcriber threads, read by requests
+
+def _set_partial(request_id: str, text: str):
+    with _PARTIALS_LOCK:
+        _PARTIALS[request_id] = text
+        while len(_PARTIALS) > _PARTIALS_MAX:
+            _PARTIALS.popitem(last=False)
+
+def _traced(route: str, handler):
+    """
+    Run *handler(data, plant)* as one traced turn and tag the reply with its
+    request ID. In hub mode the turn's stage jobs are queued under its plant,
+    so the stages serve the plants in turn (see pipeline.owner).
+    """
+    with tracing.turn(route, request.headers.get("X-Request-ID")) as trace:
+        data = request.get_json(force=True)
+        plant = plants.get(data.get("plant_id"))
+        tracing.tag("plant", plant.id)
+        scope = (pipeline.owner(plant.id, plant.priority) if len(plants) > 1
+                 else contextlib.nullcontext())
+        with scope:
+            resp = handler(data, plant)
+    resp = app.make_response(resp)
+    resp.headers["X-Request-ID"] = trace.id
+    return resp
+
+@app.errorhandler(pipeline.StageBusy)
+def stage_busy(exc):
+    return jsonify({"error": f"Busy ({exc}), please try again."}), 503
+
+@app.errorhandler(UnknownPlant)
+def unknown_plant(exc):
+    return jsonify({"error": f"Unknown plant {exc.args[0]!r}."}), 404
+
+@app.errorhandler(pipeline.StageTimeout)
+def stage_timeout(exc):
+    return jsonify({"error": f"Timed out ({exc})."}), 504
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    # the UI polls /talk/partial only if there are partials to show
+    return render_template("index.html", partials=STT_INCREMENTAL)
+
+@app.route("/healthz")
+def healthz():
+    status = warm.status()
+    return jsonify(status), 200 if status["status"] == "ok" else 503
+
+@app.route("/metrics")
+def metrics():
+    text = tracing.metrics() + models.metrics()
+    if backend.RESPONSE_CACHE:
+        text += response_cache.get_cache().metrics()
+    if backend.TURN_DEADLINE_S > 0:
+        text += response_bank.metrics()
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+@app.route("/residency")
+def residency_status():
+    return jsonify(models.status())
+
+@app.route("/plants")
+def plant_list():
+    return jsonify({
+        "plants": [p.as_dict() for p in plants],
+        "waiting": {name: {str(k): n for k, n in stage.waiting().items()}
+                    for name, stage in pipeline.STAGES.items()},
+    })
+
+@app.route("/talk/partial/<request_id>")
+def talk_partial(request_id: str):
+    with _PARTIALS_LOCK:
+        text = _PARTIALS.get(request_id, "")
+    return jsonify({"text": text})
 
 @app.route("/chat", methods=["POST"])
 def chat():
-    data = request.get_json(force=True)
+    return _traced("chat", _chat)
+
+def _chat(data: dict, plant):
     mode = data.get("mode", "text")
     lang = data.get("lang", "en")
     user = (data.get("user_input") or "").strip()
@@ -79,31 +271,69 @@ def chat():
         return jsonify({"error": "No input provided."}), 400
     if len(user.split(". ")) > 2:
         return jsonify({"error": "Max two sentences."}), 400
-    return jsonify(process_user_input(user, mode, lang))
+    return jsonify(process_user_input(user, mode, lang, _session_id(data, plant), plant.id))
 
 @app.route("/talk", methods=["POST"])
 def talk():
-    data = request.get_json(force=True)
+    return _traced("talk", _talk)
+
+def _talk(data: dict, plant):
     mode = data.get("mode", "speak")
     lang = data.get("lang", STT_LANG)
 
-    user_text = record_and_transcribe(
-        device_index=STT_DEVICE,
-        duration=STT_DURATION,
-        model_name=STT_MODEL,
-        language=STT_LANG,
-    )
+    # with STT_INCREMENTAL, Whisper already runs on the growing recording
+    # and only the tail is left for the stt stage; partials go to the UI
+    inc = None
+    if STT_INCREMENTAL:
+        request_id = tracing.current().id
+        inc = IncrementalTranscriber(STT_MODEL, STT_LANG,
+                                     on_partial=lambda text: _set_partial(request_id, text))
+
+    # microphone and Whisper are separate stages: the mic is free for the
+    # next /talk while this one is still being transcribed. Whisper and
+    # the LLM are loaded (and kept) behind the recording if they were evicted
+    models.prepare("stt", "llm")
+    with contextlib.ExitStack() as resident:
+        if inc is not None:
+            # the partial decodes run on the worker during the recording, so
+            # it must not be evicted (or restarted) before the final decode
+            resident.enter_context(models.hold(STT_RESIDENT))
+        try:
+            audio = pipeline.run("capture", tracing.timed("vad_capture", record_with_vad),
+                                 STT_DEVICE, inc.update if inc else None,
+                                 inc.looks_complete if inc else None)
+        except Exception:
+            if inc is not None:
+                inc.close()
+            raise
+        if inc is None:
+            resident.enter_context(models.hold(STT_RESIDENT))
+        timings = {}
+        user_text = pipeline.run("stt", transcribe_audio, audio, STT_MODEL, STT_LANG, timings, inc)
+    for name, seconds in timings.items():
+        tracing.record(f"stt_{name}", seconds)
+    if inc is not None:
+        tracing.record("stt_partial", inc.partial_seconds)
+        with _PARTIALS_LOCK:
+            _PARTIALS.pop(tracing.current().id, None)
     logging.info("STT result: %r", user_text)
 
-    if user_text == "sorry, didnt understand":
-        show_emoji("")  # clear screen
+    if user_text == SORRY_TEXT:
+        pipeline.run("display", show_emoji, "")  # clear screen
+        if mode == "speak":
+            pipeline.run("tts", utils.speak_text, SORRY_TEXT, lang)
         return jsonify({
             "user_text": "",
-            "response": "sorry, didnt understand",
+            "response": SORRY_TEXT,
             "emoji": ""
         })
 
-    return jsonify(process_user_input(user_text, mode, lang))
+    return jsonify(process_user_input(user_text, mode, lang, _session_id(data, plant), plant.id))
+
+def serve(host: str = "0.0.0.0", port: int = 5000):
+    # one thread per request (see serving.py); the blocking stages are
+    # bounded by the executors in pipeline.py
+    serving.serve(app, host, port)
 
 if __name__ == "__main__":
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -116,4 +346,4 @@ if __name__ == "__main__":
         s.close()
 
     webbrowser.open(f"http://{ip}:5000")
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    serve()
@@ -1,29 +1,57 @@
 # variants/v1_rule_based/backend.py
-import os, sys, logging, requests
+import os, sys, re, time, logging, threading
+from typing import Callable, Iterable, Iterator
 import expressions_store, prompt_engineering
+from ollama_client import get_client, OLLAMA_MODEL, OLLAMA_URL
+import pipeline
+import residency
+import response_bank
+import response_cache
+import tracing
+from context_store import ContextStore
 
 # make sensors importable
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from sensors.main import main as sensor_main
+from sensors.sampler import MAX_AGE as SENSOR_MAX_AGE
+from sensors.plants import DEFAULT_PLANT, get_registry
 
-logging.basicConfig(
-    filename="plant_interface.log",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-)
+OLLAMA_STREAM = os.getenv("OLLAMA_STREAM", "1") == "1"
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+# send only the per-turn block against Ollama's cached system-prompt context
+OLLAMA_CONTEXT_REUSE = os.getenv("OLLAMA_CONTEXT_REUSE", "0") == "1"
+# seconds after the start of a turn by which the plant must start answering;
+# if the LLM hasn't by then, a canned reply from the response bank is used
+TURN_DEADLINE_S = float(os.getenv("TURN_DEADLINE_S", 0))      # 0 = always wait for the LLM
 
-OLLAMA_MODEL = "gemma2:2b"
-OLLAMA_URL   = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+# Ollama runs the model in its own server process; the residency manager
+# loads it with an empty prompt and unloads it with keep_alive=0
+LLM_RESIDENT = f"llm:{OLLAMA_MODEL}"
 
-def call_api(prompt: str) -> str:
+def register_llm() -> None:
+    """
+    Put Ollama's model under the residency manager. Only for the variant
+    that answers through Ollama: registered, it is prefetched on every /talk.
+    """
+    residency.get_manager().register(LLM_RESIDENT, lambda: get_client().warm_up(),
+                                     lambda: get_client().unload(), stage="llm",
+                                     footprint=lambda: get_client().resident_bytes())
+
+# replies that must never be cached
+_FAILED_REPLIES = ("API error:", "Model error:", "No response from model.")
+
+# split after ., ! or ? (optionally followed by quotes/brackets) + whitespace
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\')\]]*\s+')
+
+def call_api(prompt: str, final: dict | None = None, **extra) -> str:
+    """
+    Blocking generate. *extra* is passed to Ollama (e.g. context=...); if
+    *final* is given it receives Ollama's full reply (context, timings).
+    """
     try:
-        r = requests.post(OLLAMA_URL,
-                          json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-                          timeout=120)
-        r.raise_for_status()
-        data = r.json()
+        data = get_client().generate(prompt, **extra)
     except Exception as exc:
         logging.exception("Ollama request failed")
         return f"API error: {exc}"
@@ -32,28 +60,285 @@ def call_api(prompt: str) -> str:
         logging.error("Model error: %s", data["error"])
         return f"Model error: {data['error']}"
 
+    if final is not None:
+        final.update(data)
+    # no tokens are seen before the end here; Ollama's counters give the
+    # equivalent of time-to-first-token (model load + prompt eval)
+    ttft_ns = data.get("load_duration", 0) + data.get("prompt_eval_duration", 0)
+    if ttft_ns:
+        tracing.record("llm_ttft", ttft_ns / 1e9)
     return data.get("response", "No response from model.")
 
-def generate_message(user_prompt: str | None = None) -> dict:
-    """Return {'response': str, 'emoji': str}."""
+def stream_api(prompt: str, final: dict | None = None, **extra) -> Iterator[str]:
+    """Yield response tokens from Ollama's NDJSON stream as they arrive."""
+    t0 = time.perf_counter()
+    first = True
+    for data in get_client().stream(prompt, **extra):
+        token = data.get("response", "")
+        if token:
+            if first:
+                tracing.record("llm_ttft", time.perf_counter() - t0)
+                first = False
+            yield token
+        if data.get("done") and final is not None:
+            final.update(data)
+
+def iter_sentences(tokens: Iterable[str]) -> Iterator[str]:
+    """Regroup a token stream into whole sentences."""
+    buf = ""
+    for token in tokens:
+        buf += token
+        while True:
+            m = _SENTENCE_END.search(buf)
+            if not m:
+                break
+            sentence = buf[:m.end()].strip()
+            buf = buf[m.end():]
+            if sentence:
+                yield sentence
+    if buf.strip():
+        yield buf.strip()
+
+def call_api_streaming(prompt: str, on_sentence: Callable[[str], None],
+                       final: dict | None = None, **extra) -> str:
+    """Like call_api, but hands every finished sentence to *on_sentence* right away."""
+    sentences = []
     try:
-        pkg = sensor_main()
-    except Exception:
-        logging.exception("sensor_main failed – using defaults")
+        for sentence in iter_sentences(stream_api(prompt, final, **extra)):
+            sentences.append(sentence)
+            on_sentence(sentence)
+    except Exception as exc:
+        logging.exception("Ollama streaming request failed")
+        if not sentences:
+            # say so instead of leaving a speak turn silent
+            reply = f"API error: {exc}"
+            on_sentence(reply)
+            return reply
+
+    return " ".join(sentences) or "No response from model."
+
+_CONTEXTS: ContextStore | None = None
+
+def get_context_store() -> ContextStore:
+    global _CONTEXTS
+    if _CONTEXTS is None:
+        _CONTEXTS = ContextStore(get_client(), prompt_engineering.SYSTEM_PROMPT)
+    return _CONTEXTS
+
+def sensor_package(plant_id: str | None = None) -> dict:
+    """The plant's latest sensor package, read directly or defaulted if there is none."""
+    plant = get_registry().get(plant_id)
+    with tracing.span("sensor_read"):
+        pkg = plant.latest_package(SENSOR_MAX_AGE)
+        if pkg is None:
+            logging.warning("No sensor snapshot of %s younger than %.0fs",
+                            plant.id, SENSOR_MAX_AGE)
+            if plant.id == DEFAULT_PLANT:
+                # only the single-plant setup maps onto the module-level sensors
+                try:
+                    pkg = sensor_main()
+                except Exception:
+                    logging.exception("sensor_main failed – using defaults")
+                    pkg = None
+    if pkg is None:
         pkg = {
             "overall":  "mixed",
             "reasons":  {"temperature": "unknown", "soil_moisture": "unknown", "humidity": "unknown"},
             "readings": {"temperature_c": 22, "humidity_pct": 50, "pressure_hpa": 1013, "soil_moisture_pct": 45},
         }
+    return pkg
 
-    prompt = prompt_engineering.create_prompt(pkg, user_prompt)
-    logging.info("Prompt: %s", prompt.replace("\n", " "))
+def generate_message(user_prompt: str | None = None,
+                     on_sentence: Callable[[str], None] | None = None,
+                     session_id: str | None = None,
+                     plant_id: str | None = None,
+                     pkg: dict | None = None,
+                     delivered: Callable[[], bool] | None = None) -> dict:
+    """
+    Return {'response': str, 'emoji': str, 'mood': str}.
 
-    reply = call_api(prompt)
-    logging.info("Reply: %s", reply)
+    With *on_sentence* the reply is streamed and every sentence is passed on
+    as soon as it is complete (e.g. to the TTS pipeline). *session_id* keys
+    the conversation history when OLLAMA_CONTEXT_REUSE is on. *plant_id*
+    picks the plant whose sensors are read (hub mode); the default is the
+    first configured plant. *pkg* skips the sensor read. *delivered* says
+    whether the reply still reaches the user; if not, it stays out of the
+    session's history.
+    """
+    if pkg is None:
+        pkg = sensor_package(plant_id)
 
     emoji = expressions_store.get_emoji(pkg.get("overall"))
-    return {"emoji": emoji, "response": reply}
+
+    # with context reuse a reply depends on the session's history, which the
+    # cache key doesn't cover, and a hit would skip the history update
+    cache = response_cache.get_cache() if RESPONSE_CACHE and not OLLAMA_CONTEXT_REUSE else None
+    key = cache.key(pkg, user_prompt) if cache else None
+    reply = cache.get(key) if cache else None
+    tracing.tag("cache", "hit" if reply is not None else "miss")
+    if reply is not None:
+        logging.info("Reply (cached): %s", reply)
+        if on_sentence is not None:
+            for sentence in iter_sentences([reply]):
+                on_sentence(sentence)
+        return {"emoji": emoji, "response": reply, "mood": pkg.get("overall")}
+
+    extra = {}
+    with tracing.span("prompt_build"):
+        if OLLAMA_CONTEXT_REUSE:
+            try:
+                extra["context"] = get_context_store().context_for(session_id)
+            except Exception:
+                logging.exception("Priming the system prompt failed – sending full prompt")
+        if "context" in extra:
+            prompt = prompt_engineering.create_turn(pkg, user_prompt)
+        else:
+            prompt = prompt_engineering.create_prompt(pkg, user_prompt)
+    # the full prompt is several hundred bytes per turn – only at DEBUG
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Prompt: %s", prompt.replace("\n", " "))
+
+    final = {}
+    with residency.get_manager().hold(LLM_RESIDENT), tracing.span("llm_total"):
+        if on_sentence is not None:
+            reply = call_api_streaming(prompt, on_sentence, final, **extra)
+        else:
+            reply = call_api(prompt, final, **extra)
+    logging.info("Reply: %s", reply)
+
+    if "context" in extra and final.get("context") and (delivered is None or delivered()):
+        get_context_store().update(session_id, final.get("context"))
+
+    if cache and not reply.startswith(_FAILED_REPLIES):
+        cache.put(key, reply)
+
+    return {"emoji": emoji, "response": reply, "mood": pkg.get("overall")}
+
+class _Gate:
+    """Passes sentences on until closed; remembers whether one got through."""
+
+    def __init__(self, on_sentence: Callable[[str], None] | None):
+        self.on_sentence = on_sentence
+        self.passed = False
+        self.closed = False
+        self.event = threading.Event()      # a sentence got through or the LLM is done
+        self._lock = threading.Lock()
+
+    def __call__(self, sentence: str) -> None:
+        # an error reply is not an answer: the bank answers instead
+        if sentence.startswith(_FAILED_REPLIES):
+            return
+        with self._lock:
+            if self.closed:
+                return
+            self.passed = True
+            self.on_sentence(sentence)
+        self.event.set()
+
+    def close(self) -> bool:
+        """Pass nothing on any more; False if a sentence already got through."""
+        with self._lock:
+            if self.passed:
+                return False
+            self.closed = True
+            return True
+
+    def claim(self) -> bool:
+        """Claim the turn for the LLM's reply; False if the bank already answered."""
+        with self._lock:
+            if self.closed:
+                return False
+            self.passed = True
+            return True
+
+def _from_bank(pkg: dict, on_sentence, outcome: str, ready) -> dict:
+    mood = pkg.get("overall")
+    reply = response_bank.get_bank().pick(mood, ready)
+    response_bank.count(outcome)
+    tracing.tag("answer", f"bank_{outcome}")
+    logging.info("Reply (bank, %s): %s", outcome, reply)
+    if on_sentence is not None:
+        # as one piece, so its pre-rendered audio is found in the TTS cache
+        on_sentence(reply)
+    return {"emoji": expressions_store.get_emoji(mood), "response": reply, "mood": mood}
+
+def _late_reply(fut, user_prompt: str | None) -> None:
+    """A reply that missed its deadline: keep it in the bank or drop it."""
+    try:
+        msg = fut.result()
+    except Exception:
+        response_bank.count("discarded")
+        return
+    reply = msg.get("response", "")
+    # a reply to a question ("My name is …") would make no sense replayed
+    # for another one; only how the plant feels is worth keeping
+    if (response_bank.RESPONSE_BANK_LEARN and not user_prompt
+            and not reply.startswith(_FAILED_REPLIES)
+            and response_bank.get_bank().learn(msg.get("mood"), reply)):
+        response_bank.count("learned")
+    else:
+        response_bank.count("discarded")
+
+def generate_with_deadline(user_prompt: str | None = None,
+                           on_sentence: Callable[[str], None] | None = None,
+                           session_id: str | None = None,
+                           plant_id: str | None = None,
+                           deadline_s: float = TURN_DEADLINE_S,
+                           ready: Callable[[str], bool] | None = None,
+                           generate: Callable[..., dict] | None = None) -> dict:
+    """
+    generate_message on the llm stage, hedged by the response bank: if the
+    LLM has not produced a first sentence (streaming) or its reply (blocking)
+    *deadline_s* after the turn started, or the llm stage is full or fails,
+    the plant answers from the bank for its mood instead. *ready* tells the
+    bank which replies already have audio. The LLM keeps running; its late
+    reply goes into the response cache (but not the session's history) and,
+    with RESPONSE_BANK_LEARN, the bank; if it was still queued, it is
+    cancelled instead. Without a
+    deadline this is plain pipeline.run("llm", ...). *generate* replaces
+    generate_message, e.g. with another variant's (see app.PLANT_VARIANT).
+    """
+    generate = generate or generate_message
+    if deadline_s <= 0:
+        return pipeline.run("llm", generate, user_prompt=user_prompt,
+                            on_sentence=on_sentence, session_id=session_id, plant_id=plant_id)
+
+    pkg = sensor_package(plant_id)
+    gate = _Gate(on_sentence)
+    try:
+        fut = pipeline.submit("llm", generate, user_prompt=user_prompt,
+                              on_sentence=gate if on_sentence is not None else None,
+                              session_id=session_id, plant_id=plant_id, pkg=pkg,
+                              delivered=gate.claim)
+    except pipeline.StageBusy:
+        return _from_bank(pkg, on_sentence, "busy", ready)
+    fut.add_done_callback(lambda _: gate.event.set())
+
+    with tracing.span("llm_wait"):
+        gate.event.wait(max(0.0, deadline_s - tracing.current().elapsed()))
+    if not fut.done() and gate.close():
+        if fut.cancel():
+            # still queued behind other turns: don't spend the LLM on it at all
+            response_bank.count("discarded")
+        else:
+            fut.add_done_callback(lambda f: _late_reply(f, user_prompt))
+        return _from_bank(pkg, on_sentence, "timeout", ready)
+
+    # the LLM made it: wait for the rest of the reply as usual
+    try:
+        msg = pipeline.wait("llm", fut)
+    except pipeline.StageTimeout:
+        raise
+    except Exception:
+        logging.exception("LLM turn failed")
+        msg = None
+    if not gate.passed and (msg is None or msg["response"].startswith(_FAILED_REPLIES)):
+        return _from_bank(pkg, on_sentence, "error", ready)
+    response_bank.count("llm")
+    tracing.tag("answer", "llm")
+    return msg
 
 if __name__ == "__main__":
+    import log_setup
+    log_setup.setup_logging()
     print(generate_message())
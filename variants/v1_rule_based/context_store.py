@@ -0,0 +1,106 @@
+# variants/v1_rule_based/context_store.py
+"""
+Reuse of Ollama's returned `context` tokens.
+
+The fixed system preamble is evaluated once and its context kept; each turn
+then only sends the sensor block and owner message against it, so Ollama
+can serve the preamble from its prompt cache instead of prefilling it
+again. Per client session the context returned by the last turn is kept
+as a bounded conversation history (OLLAMA_CONTEXT_TURNS turns, after which
+the session restarts from the preamble). Everything is dropped when the
+model or the system prompt changes.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+OLLAMA_CONTEXT_TURNS    = int(os.getenv("OLLAMA_CONTEXT_TURNS", 4))
+OLLAMA_CONTEXT_SESSIONS = int(os.getenv("OLLAMA_CONTEXT_SESSIONS", 16))
+OLLAMA_CONTEXT_IDLE     = float(os.getenv("OLLAMA_CONTEXT_IDLE", 1800))
+
+
+class ContextStore:
+    def __init__(self, client, system_prompt: str,
+                 max_turns: int = OLLAMA_CONTEXT_TURNS,
+                 max_sessions: int = OLLAMA_CONTEXT_SESSIONS,
+                 idle_timeout: float = OLLAMA_CONTEXT_IDLE):
+        self.client = client
+        self.system_prompt = system_prompt
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._prefix: Optional[List[int]] = None
+        self._prefix_fp: Optional[tuple] = None
+        # session -> (context, turns, last used)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self) -> tuple:
+        digest = hashlib.sha1(self.system_prompt.encode("utf-8")).hexdigest()
+        return (self.client.model, digest)
+
+    def _prime(self) -> List[int]:
+        """Evaluate the system preamble once and keep Ollama's context for it."""
+        t0 = time.perf_counter()
+        # raw: no chat template around the preamble. Ollama generates at
+        # least one token; the generated tokens are cut off the context, so
+        # every turn builds on the preamble alone
+        data = self.client.generate(self.system_prompt, raw=True, options={"num_predict": 1})
+        context = data.get("context") or []
+        generated = int(data.get("eval_count") or 0)
+        if generated:
+            context = context[:-generated]
+        logging.info("Primed system prompt context (%d tokens, %.2f s)",
+                     len(context), time.perf_counter() - t0)
+        return context
+
+    def prefix(self) -> List[int]:
+        fp = self._fingerprint()
+        with self._lock:
+            if self._prefix is not None and self._prefix_fp == fp:
+                return self._prefix
+        context = self._prime()
+        with self._lock:
+            if self._prefix_fp != fp:
+                # model or prompt changed – old histories are meaningless now
+                self._sessions.clear()
+            self._prefix, self._prefix_fp = context, fp
+        return context
+
+    def context_for(self, session_id: Optional[str]) -> List[int]:
+        """Context to send with the next turn of *session_id*."""
+        prefix = self.prefix()
+        if not session_id:
+            return prefix
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return prefix
+            context, turns, last_used = entry
+            num_ctx = self.client.options.get("num_ctx", 2048)
+            if (turns >= self.max_turns
+                    or len(context) > 0.75 * num_ctx
+                    or time.time() - last_used > self.idle_timeout):
+                del self._sessions[session_id]
+                return prefix
+            return context
+
+    def update(self, session_id: Optional[str], context: Optional[List[int]]) -> None:
+        """Store the context Ollama returned after a turn of *session_id*."""
+        if not session_id or not context:
+            return
+        with self._lock:
+            turns = self._sessions.get(session_id, (None, 0, 0))[1] + 1
+            self._sessions[session_id] = (context, turns, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._prefix = self._prefix_fp = None
+            self._sessions.clear()
@@ -0,0 +1,243 @@
+# variants/v1_rule_based/display.py
+"""
+SSD1306 emoji output with a pre-rasterized glyph cache.
+
+Every emoji is rendered once into the panel's native layout – 8 pages of
+128 column bytes, LSB = top row – and kept in RAM (and in an .npz file, so
+later boots skip the font rasterization). Showing a frame diffs it against
+what the panel already holds and only sends the changed pages; an identical
+frame costs no I2C traffic at all. Short animations (blink, droop) run at
+OLED_FPS in a background thread, taking the shared I2C lock per page run
+so sensor reads are never starved.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from sensors.bus import I2C_LOCK
+
+OLED_GLYPH_CACHE = os.getenv("OLED_GLYPH_CACHE", os.path.expanduser("~/.cache/plantbot/glyphs.npz"))
+OLED_FPS         = float(os.getenv("OLED_FPS", 12))
+
+_SET_COL_ADDR  = 0x21
+_SET_PAGE_ADDR = 0x22
+
+# name -> list of (vertical squash 0..1, downward shift in px)
+ANIMATIONS: Dict[str, List[Tuple[float, int]]] = {
+    "blink": [(1.0, 0), (0.5, 0), (0.15, 0), (0.5, 0), (1.0, 0)],
+    "droop": [(1.0, 0), (1.0, 2), (1.0, 4), (1.0, 6), (0.9, 8), (0.9, 8)],
+}
+
+
+def pack_pages(bits: np.ndarray) -> np.ndarray:
+    """(height, width) bool -> (height // 8, width) uint8 in SSD1306 page layout."""
+    h, w = bits.shape
+    return np.packbits(bits.reshape(h // 8, 8, w), axis=1, bitorder="little")[:, 0, :]
+
+
+def _transform(bits: np.ndarray, squash: float, shift: int) -> np.ndarray:
+    """Squash the glyph vertically around its centre, then move it down."""
+    h = bits.shape[0]
+    out = bits
+    if squash < 1.0:
+        rows = np.flatnonzero(bits.any(axis=1))
+        if len(rows):
+            top, bottom = rows[0], rows[-1] + 1
+            centre = (top + bottom) / 2
+            new_h = max(1, int(round((bottom - top) * squash)))
+            src = top + (np.arange(new_h) * (bottom - top) / new_h).astype(int)
+            out = np.zeros_like(bits)
+            start = int(round(centre - new_h / 2))
+            out[start:start + new_h] = bits[src]
+    if shift:
+        shifted = np.zeros_like(out)
+        shifted[shift:] = out[:h - shift]
+        out = shifted
+    return out
+
+
+class GlyphCache:
+    def __init__(self, font_path: str, size: int, width: int = 128, height: int = 64,
+                 cache_file: str = OLED_GLYPH_CACHE):
+        self.font_path = font_path
+        self.size = size
+        self.width = width
+        self.height = height
+        self.cache_file = cache_file
+        self._font = None
+        self._bits: Dict[str, np.ndarray] = {}
+        self._frames: Dict[Tuple[str, str], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._tag = hashlib.sha1(f"{font_path}:{size}:{width}x{height}".encode()).hexdigest()[:12]
+        self._load()
+
+    def _rasterize(self, char: str) -> np.ndarray:
+        if self._font is None:
+            self._font = ImageFont.truetype(self.font_path, self.size)
+        img = Image.new("1", (self.width, self.height))
+        if char:
+            draw = ImageDraw.Draw(img)
+            bbox = draw.textbbox((0, 0), char, font=self._font)
+            w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+            x = (self.width - w) // 2
+            y = (self.height - h) // 2
+            draw.text((x, y), char, font=self._font, fill=255)
+        return np.array(img, dtype=bool)
+
+    def bits(self, char: str) -> np.ndarray:
+        with self._lock:
+            bits = self._bits.get(char)
+        if bits is None:
+            bits = self._rasterize(char)
+            with self._lock:
+                self._bits[char] = bits
+        return bits
+
+    def frame(self, char: str) -> np.ndarray:
+        return self.frames(char, "still")[0]
+
+    def frames(self, char: str, animation: str = "still") -> List[np.ndarray]:
+        key = (char, animation)
+        with self._lock:
+            frames = self._frames.get(key)
+        if frames is None:
+            bits = self.bits(char)
+            steps = ANIMATIONS.get(animation, [(1.0, 0)])
+            frames = [pack_pages(_transform(bits, squash, shift)) for squash, shift in steps]
+            with self._lock:
+                self._frames[key] = frames
+        return frames
+
+    def prerender(self, chars: Iterable[str], animations: Iterable[str] = ("still",)) -> None:
+        animations = list(animations)
+        fresh = False
+        for char in chars:
+            if char not in self._bits:
+                fresh = True
+            for animation in animations:
+                self.frames(char, animation)
+        if fresh:
+            self._save()
+
+    # ── on-disk cache of rasterized glyphs ──
+    def _load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as data:
+                if str(data["tag"]) != self._tag:
+                    return
+                chars = [str(c) for c in data["chars"]]
+                glyphs = np.unpackbits(data["glyphs"], axis=-1, count=self.width).astype(bool)
+            if glyphs.shape != (len(chars), self.height, self.width):
+                raise ValueError(f"glyphs of shape {glyphs.shape}")
+        except Exception:
+            logging.exception("Could not read glyph cache %s", self.cache_file)
+            return
+        self._bits.update(zip(chars, glyphs))
+
+    def _save(self) -> None:
+        if not self.cache_file:
+            return
+        with self._lock:
+            chars = list(self._bits)
+            bits = [self._bits[c] for c in chars]
+        if not chars:
+            return
+        try:
+            glyphs = np.packbits(np.stack(bits), axis=-1)
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            tmp = self.cache_file + ".tmp.npz"
+            np.savez(tmp, tag=self._tag, chars=np.array(chars), glyphs=glyphs)
+            os.replace(tmp, self.cache_file)
+        except (OSError, ValueError):
+            logging.exception("Could not write glyph cache %s", self.cache_file)
+
+
+class OledDisplay:
+    def __init__(self, disp, glyphs: GlyphCache, fps: float = OLED_FPS):
+        self.disp = disp
+        self.glyphs = glyphs
+        self.fps = fps
+        self.pages_sent = 0
+        self._pages = disp.height // 8
+        # what the panel holds right now (it was cleared at setup)
+        self._shown = np.zeros((self._pages, disp.width), dtype=np.uint8)
+        self._current: Optional[str] = None
+        self._lock = threading.Lock()
+        self._anim_stop = threading.Event()
+        self._anim_thread: Optional[threading.Thread] = None
+
+    def _write_pages(self, first: int, last: int, data: np.ndarray) -> None:
+        disp = self.disp
+        for cmd in (_SET_COL_ADDR, 0, disp.width - 1, _SET_PAGE_ADDR, first, last):
+            disp.write_cmd(cmd)
+        buf = bytearray(1 + data.size)
+        buf[0] = 0x40           # Co=0, D/C#=1: data follows
+        buf[1:] = data.tobytes()
+        with disp.i2c_device:
+            disp.i2c_device.write(buf)
+
+    def show_frame(self, frame: np.ndarray) -> int:
+        """Send the pages of *frame* that differ from the panel; returns pages sent."""
+        with self._lock:
+            dirty = np.flatnonzero((frame != self._shown).any(axis=1))
+            if not len(dirty):
+                return 0
+            # group consecutive dirty pages into one window each
+            runs = np.split(dirty, np.flatnonzero(np.diff(dirty) > 1) + 1)
+            for run in runs:
+                first, last = int(run[0]), int(run[-1])
+                with I2C_LOCK:
+                    self._write_pages(first, last, frame[first:last + 1])
+            self._shown = frame.copy()
+            self.pages_sent += len(dirty)
+            return len(dirty)
+
+    def show_emoji(self, char: str) -> None:
+        interrupted = self.stop_animation()
+        if char == self._current and not interrupted:
+            return
+        self.show_frame(self.glyphs.frame(char))
+        self._current = char
+
+    def animate(self, char: str, animation: str, repeat: int = 1) -> None:
+        """Play *animation* on *char* in the background, ending on the still glyph."""
+        self.stop_animation()
+        frames = self.glyphs.frames(char, animation) * max(1, repeat)
+        frames.append(self.glyphs.frame(char))
+        self._anim_stop.clear()
+        self._anim_thread = threading.Thread(target=self._play, args=(frames,),
+                                             name="oled-animation", daemon=True)
+        self._anim_thread.start()
+        self._current = char
+
+    def stop_animation(self) -> bool:
+        """Stop a running animation; True if one was cut short."""
+        t = self._anim_thread
+        self._anim_thread = None
+        if t is not None and t.is_alive() and t is not threading.current_thread():
+            self._anim_stop.set()
+            t.join()
+            return True
+        return False
+
+    def _play(self, frames: List[np.ndarray]) -> None:
+        period = 1.0 / self.fps
+        next_at = time.monotonic()
+        for frame in frames:
+            if self._anim_stop.is_set():
+                return
+            self.show_frame(frame)
+            next_at += period
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._anim_stop.wait(delay)
+            else:
+                next_at = time.monotonic()    # fell behind: don't burst to catch up
@@ -0,0 +1,103 @@
+# variants/v1_rule_based/log_setup.py
+"""
+Central, non-blocking logging for the app.
+
+Loggers only put records on an in-memory queue (QueueHandler); a single
+listener thread formats them and writes to plant_interface.log, which is
+rotated by size (LOG_MAX_BYTES) or time (LOG_ROTATE_WHEN, e.g. "midnight").
+Request threads and the capture loop therefore never wait on the SD card.
+
+Forked children (the transcription worker) don't inherit the listener
+thread, so they write straight to the file through a WatchedFileHandler,
+which follows the parent's rotations.
+"""
+import os
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import List, Optional
+
+LOG_FILE        = os.getenv("LOG_FILE", "plant_interface.log")
+LOG_LEVEL       = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES   = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUPS     = int(os.getenv("LOG_BACKUPS", 3))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")          # "" = rotate by size
+LOG_CONSOLE     = os.getenv("LOG_CONSOLE", "0") == "1"
+
+FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+_LISTENERS: List[logging.handlers.QueueListener] = []
+_configured = False
+
+
+def rotating_handler(path: str, fmt: str = FORMAT) -> logging.Handler:
+    """File handler with the configured size or time based rotation."""
+    if LOG_ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUPS, encoding="utf-8")
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+
+def queued(*handlers: logging.Handler) -> logging.handlers.QueueHandler:
+    """
+    Wrap *handlers* so that emitting only enqueues the record; a listener
+    thread does the formatting and the I/O.
+    """
+    q: "queue.SimpleQueue" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    _LISTENERS.append(listener)
+    return logging.handlers.QueueHandler(q)
+
+
+def _stop_listeners() -> None:
+    while _LISTENERS:
+        _LISTENERS.pop().stop()      # flushes what is still queued
+
+
+def _direct_in_child() -> None:
+    """After fork: the listener threads are gone, write synchronously instead."""
+    _LISTENERS.clear()
+    for name in [None] + list(logging.Logger.manager.loggerDict):
+        logger = logging.getLogger(name)
+        for handler in list(getattr(logger, "handlers", [])):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logger.removeHandler(handler)
+    root = logging.getLogger()
+    if LOG_FILE:
+        handler = logging.handlers.WatchedFileHandler(LOG_FILE, encoding="utf-8")
+        handler.setFormatter(logging.Formatter(FORMAT))
+        root.addHandler(handler)
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """Route all logging through the queue listener. Safe to call more than once."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    handlers: List[logging.Handler] = []
+    if LOG_FILE:
+        handlers.append(rotating_handler(LOG_FILE))
+    if LOG_CONSOLE:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(FORMAT))
+        handlers.append(console)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
+    if handlers:
+        root.addHandler(queued(*handlers))
+    else:
+        root.addHandler(logging.NullHandler())
+
+    atexit.register(_stop_listeners)
+    os.register_at_fork(after_in_child=_direct_in_child)
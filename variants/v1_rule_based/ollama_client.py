@@ -0,0 +1,130 @@
+# variants/v1_rule_based/ollama_client.py
+"""
+Thin Ollama client: one pooled keep-alive HTTP session, a configurable
+model residency (`keep_alive`) and default generation options.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_MODEL       = os.getenv("OLLAMA_MODEL", "gemma2:2b")
+OLLAMA_URL         = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_KEEP_ALIVE  = os.getenv("OLLAMA_KEEP_ALIVE", "30m")   # "-1" = keep loaded forever
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", 96))  # ~two short sentences
+OLLAMA_NUM_CTX     = int(os.getenv("OLLAMA_NUM_CTX", 1024))
+OLLAMA_TEMPERATURE = os.getenv("OLLAMA_TEMPERATURE", "")
+OLLAMA_POOL_SIZE   = int(os.getenv("OLLAMA_POOL_SIZE", 4))
+OLLAMA_TIMEOUT     = float(os.getenv("OLLAMA_TIMEOUT", 120))
+
+
+def _keep_alive(value: str):
+    # Ollama takes durations ("30m") or plain seconds (-1, 0, 300)
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def default_options() -> Dict[str, Any]:
+    opts: Dict[str, Any] = {"num_predict": OLLAMA_NUM_PREDICT, "num_ctx": OLLAMA_NUM_CTX}
+    if OLLAMA_TEMPERATURE:
+        opts["temperature"] = float(OLLAMA_TEMPERATURE)
+    return opts
+
+
+class OllamaClient:
+    def __init__(self,
+                 url: str = OLLAMA_URL,
+                 model: str = OLLAMA_MODEL,
+                 keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 options: Optional[Dict[str, Any]] = None,
+                 pool_size: int = OLLAMA_POOL_SIZE,
+                 timeout: float = OLLAMA_TIMEOUT):
+        self.url = url
+        self.model = model
+        self.keep_alive = _keep_alive(keep_alive)
+        self.options = default_options() if options is None else options
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, prompt: str, stream: bool, **extra) -> Dict[str, Any]:
+        options = dict(self.options)
+        options.update(extra.pop("options", None) or {})
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": options,
+        }
+        payload.update(extra)
+        return payload
+
+    def generate(self, prompt: str, **extra) -> Dict[str, Any]:
+        """Blocking generate; returns Ollama's JSON reply."""
+        r = self.session.post(self.url, json=self._payload(prompt, False, **extra),
+                              timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def stream(self, prompt: str, **extra) -> Iterator[Dict[str, Any]]:
+        """Streaming generate; yields every NDJSON chunk (the last has done=True)."""
+        with self.session.post(self.url, json=self._payload(prompt, True, **extra),
+                               stream=True, timeout=(5, self.timeout)) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                yield data
+
+    def warm_up(self) -> bool:
+        """Load the model into memory (an empty prompt only loads it)."""
+        try:
+            self.generate("")
+            logging.info("Ollama model %s is loaded (keep_alive=%s)", self.model, self.keep_alive)
+            return True
+        except Exception:
+            logging.exception("Ollama warm-up failed")
+            return False
+
+    def resident_bytes(self) -> Optional[int]:
+        """Memory Ollama reports for the loaded model (/api/ps); None if it isn't loaded."""
+        url = self.url.rsplit("/api/", 1)[0] + "/api/ps"
+        try:
+            r = self.session.get(url, timeout=5)
+            r.raise_for_status()
+            models = r.json().get("models", [])
+        except (requests.RequestException, ValueError):
+            return None
+        for m in models:
+            if m.get("name") == self.model or m.get("model") == self.model:
+                return int(m.get("size", 0)) or None
+        return None
+
+    def unload(self) -> None:
+        """Ask Ollama to evict the model right away."""
+        self.session.post(self.url, json={"model": self.model, "keep_alive": 0},
+                          timeout=self.timeout)
+
+
+_CLIENT: Optional[OllamaClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = OllamaClient()
+        return _CLIENT
@@ -0,0 +1,212 @@
+# variants/v1_rule_based/pipeline.py
+"""
+Per-resource executors for the blocking stages of a turn.
+
+Every stage (microphone capture, STT, LLM, TTS, OLED) has its own small
+thread pool sized to the resource behind it, a bounded number of waiting
+jobs and a timeout. A full stage rejects new work with StageBusy instead of
+queueing without limit; a stage that overruns raises StageTimeout. A /chat
+therefore never waits behind the microphone of a running /talk.
+
+Waiting jobs are not served first come, first served: each job belongs to
+the owner set with owner() (the plant of the turn in hub mode). A stage
+takes the lowest priority value first and, within it, rotates over the
+owners with waiting jobs, so one chatty plant cannot starve the others.
+Priorities age, too: a level passed over STAGE_PRIORITY_AGING times moves
+up one, so a priority-1 plant is still served while a busy priority-0
+plant keeps its share of the queue full. An owner may also only hold
+PER_OWNER waiting jobs per stage.
+
+Sizes are tunable per stage via STAGE_<NAME>_WORKERS / _QUEUE / _TIMEOUT /
+_PER_OWNER. Jobs run in a copy of the caller's context, so the turn's trace
+(see tracing.py) follows them into the stage's thread.
+"""
+import os
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional
+
+# name -> (workers, waiting jobs, timeout in s)
+_DEFAULTS = {
+    "capture": (1, 1, 45.0),
+    "stt":     (1, 2, 20.0),
+    "llm":     (1, 4, 130.0),
+    "tts":     (1, 4, 60.0),
+    "display": (1, 8, 5.0),
+}
+# picks a waiting priority level may be passed over before it moves up one
+PRIORITY_AGING = max(1, int(os.getenv("STAGE_PRIORITY_AGING", 4)))
+
+
+class StageBusy(Exception):
+    """The stage (or this owner's share of it) already has as many jobs as it may queue."""
+
+
+class StageTimeout(Exception):
+    """A job did not finish within its stage's timeout."""
+
+
+# (owner, priority) of the jobs submitted from this context
+_OWNER: "contextvars.ContextVar[tuple]" = contextvars.ContextVar("stage_owner",
+                                                                  default=(None, 0))
+
+
+@contextmanager
+def owner(key: Hashable, priority: int = 0):
+    """Queue the stage jobs of the body under *key*; lower *priority* values go first."""
+    token = _OWNER.set((key, priority))
+    try:
+        yield
+    finally:
+        _OWNER.reset(token)
+
+
+class _FairQueue:
+    """Waiting jobs by (aged) priority, round-robin over owners, FIFO per owner."""
+
+    def __init__(self, aging: int = PRIORITY_AGING):
+        self.aging = aging
+        self._levels: Dict[int, "OrderedDict[Hashable, deque]"] = {}
+        self._passed: Dict[int, int] = {}       # level -> picks it waited through
+        self._cond = threading.Condition()
+
+    def put(self, key: Hashable, priority: int, item, limit: Optional[int] = None) -> bool:
+        """Enqueue *item*; False if *key* already has *limit* jobs waiting."""
+        with self._cond:
+            owners = self._levels.setdefault(priority, OrderedDict())
+            jobs = owners.get(key)
+            if jobs is None:
+                jobs = owners[key] = deque()
+            elif limit is not None and key is not None and len(jobs) >= limit:
+                return False
+            jobs.append(item)
+            self._cond.notify()
+            return True
+
+    def get(self):
+        with self._cond:
+            while not self._levels:
+                self._cond.wait()
+            priority = self._pick()
+            for level in self._levels:
+                self._passed[level] = 0 if level == priority else self._passed.get(level, 0) + 1
+            owners = self._levels[priority]
+            key, jobs = owners.popitem(last=False)
+            item = jobs.popleft()
+            if jobs:
+                owners[key] = jobs          # back of the line
+            elif not owners:
+                del self._levels[priority]
+                del self._passed[priority]
+            return item
+
+    def _pick(self) -> int:
+        # aged priority first; on a tie the level that waited longer
+        passed = self._passed
+        return min(self._levels, key=lambda p: (p - passed.get(p, 0) // self.aging,
+                                                -passed.get(p, 0), p))
+
+    def waiting(self) -> Dict[Hashable, int]:
+        with self._cond:
+            out: Dict[Hashable, int] = {}
+            for owners in self._levels.values():
+                for key, jobs in owners.items():
+                    out[key] = out.get(key, 0) + len(jobs)
+            return out
+
+
+class Stage:
+    def __init__(self, name: str, workers: int, max_waiting: int, timeout: float,
+                 per_owner: Optional[int] = None):
+        self.name = name
+        self.timeout = timeout
+        self.workers = workers
+        self.per_owner = per_owner if per_owner is not None else max(1, max_waiting // 2)
+        self._queue = _FairQueue()
+        self._threads: list = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_waiting)
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, daemon=True,
+                                     name=f"stage-{self.name}_{len(self._threads)}")
+                t.start()
+                self._threads.append(t)
+
+    def _work(self) -> None:
+        while True:
+            fut, ctx, fn, args, kwargs = self._queue.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                result = ctx.run(fn, *args, **kwargs)
+            except BaseException as exc:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if not self._threads:
+            self._start_workers()
+        if not self._slots.acquire(blocking=False):
+            raise StageBusy(self.name)
+        key, priority = _OWNER.get()
+        fut: Future = Future()
+        job = (fut, contextvars.copy_context(), fn, args, kwargs)
+        if not self._queue.put(key, priority, job, self.per_owner):
+            self._slots.release()
+            raise StageBusy(f"{self.name}, {key}")
+        # the slot is held until the job really ends, even after a timeout
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def waiting(self) -> Dict[Hashable, int]:
+        """Owner -> number of jobs waiting (not yet running) on this stage."""
+        return self._queue.waiting()
+
+    def run(self, fn: Callable, *args, **kwargs):
+        return self.wait(self.submit(fn, *args, **kwargs))
+
+    def wait(self, fut: Future):
+        """Result of a job submitted here, bounded by the stage timeout."""
+        try:
+            return fut.result(self.timeout)
+        except FutureTimeout:
+            logging.warning("Stage %s timed out after %.0fs", self.name, self.timeout)
+            raise StageTimeout(self.name) from None
+
+
+def _from_env(name: str, defaults: tuple) -> Stage:
+    workers, waiting, timeout = defaults
+    prefix = f"STAGE_{name.upper()}_"
+    per_owner = os.getenv(prefix + "PER_OWNER")
+    return Stage(name,
+                 int(os.getenv(prefix + "WORKERS", workers)),
+                 int(os.getenv(prefix + "QUEUE", waiting)),
+                 float(os.getenv(prefix + "TIMEOUT", timeout)),
+                 int(per_owner) if per_owner else None)
+
+
+STAGES: Dict[str, Stage] = {name: _from_env(name, d) for name, d in _DEFAULTS.items()}
+
+
+def run(stage: str, fn: Callable, *args, **kwargs):
+    """Run *fn* on *stage*'s executor and wait for it (bounded by the stage timeout)."""
+    return STAGES[stage].run(fn, *args, **kwargs)
+
+
+def submit(stage: str, fn: Callable, *args, **kwargs) -> Future:
+    """Queue *fn* on *stage* without waiting for it."""
+    return STAGES[stage].submit(fn, *args, **kwargs)
+
+
+def wait(stage: str, fut: Future):
+    """Wait for a job from submit() like run() does."""
+    return STAGES[stage].wait(fut)
+
@@ -3,26 +3,27 @@ import datetime
 from typing import Optional, Dict, Any
 
 
-def create_prompt(
+# Fixed preamble – identical on every turn, so Ollama can keep it prefilled.
+SYSTEM_PROMPT = (
+    "You are a potted houseplant that can speak in first person to your owner. "
+    "You have three sensor readings (temperature, soil moisture, humidity). "
+    "Always respond based on those readings and the owner's question or comment. "
+    "Keep replies under two sentences, "
+    "and offer simple care advice if needed (e.g., water me, move me to sun). "
+    "Never ask unrelated questions or reveal internal code."
+)
+
+
+def _num(value, fmt: str) -> str:
+    # remote nodes may leave a reading out
+    return "?" if value is None else format(value, fmt)
+
+
+def create_turn(
     sensor_pkg: Dict[str, Any],
     user_message: Optional[str] = None,
 ) -> str:
-    """
-    Build a focused prompt so the plant
-    • Speaks in first person about how it feels from its sensors.
-    • Responds directly to the owner's latest message.
-    • Gives concise, actionable feedback or thanks.
-    """
-    # 1) System instruction
-    system = (
-        "You are a potted houseplant that can speak in first person to your owner. "
-        "You have three sensor readings (temperature, soil moisture, humidity). "
-        "Always respond based on those readings and the owner's question or comment. "
-        "Keep replies under two sentences, "
-        "and offer simple care advice if needed (e.g., water me, move me to sun). "
-        "Never ask unrelated questions or reveal internal code."
-    )
-
+    """The per-turn part of the prompt: sensor summary plus owner message."""
     # 2) Sensor summary
     overall = sensor_pkg.get("overall").replace('_', ' ')
     r = sensor_pkg.get("reasons", {})
@@ -32,15 +33,29 @@ def create_prompt(
     sensor_block = (
         f"\n[At {ts}]\n"
         f"I feel *{overall}* because:\n"
-        f" - Temp: {s.get('temperature_c', 0):.1f}°C ({r.get('temperature')}),\n"
-        f" - Soil: {s.get('soil_moisture_pct', 0):.0f}% ({r.get('soil_moisture')}),\n"
-        f" - Humidity: {s.get('humidity_pct', 0):.0f}% ({r.get('humidity')}).\n"
+        f" - Temp: {_num(s.get('temperature_c', 0), '.1f')}°C ({r.get('temperature')}),\n"
+        f" - Soil: {_num(s.get('soil_moisture_pct', 0), '.0f')}% ({r.get('soil_moisture')}),\n"
+        f" - Humidity: {_num(s.get('humidity_pct', 0), '.0f')}% ({r.get('humidity')}).\n"
     )
 
     # 3) Owner message and plant cue
     if user_message:
-        dialogue = f"\nOwner: \"{user_message}\"\nPlant:"  
+        dialogue = f"\nOwner: \"{user_message}\"\nPlant:"
     else:
         dialogue = "\nPlant:"
 
-    return f"{system}{sensor_block}{dialogue}"
\ No newline at end of file
+    return f"{sensor_block}{dialogue}"
+
+
+def create_prompt(
+    sensor_pkg: Dict[str, Any],
+    user_message: Optional[str] = None,
+) -> str:
+    """
+    Build a focused prompt so the plant
+    • Speaks in first person about how it feels from its sensors.
+    • Responds directly to the owner's latest message.
+    • Gives concise, actionable feedback or thanks.
+    """
+    # 1) System instruction
+    return f"{SYSTEM_PROMPT}{create_turn(sensor_pkg, user_message)}"
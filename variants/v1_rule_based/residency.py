@@ -0,0 +1,377 @@
+# variants/v1_rule_based/residency.py
+"""
+Which models stay in RAM.
+
+The Whisper model (in the transcription worker), the Piper voices and
+Ollama's model share the Pi's memory; once they no longer fit together the
+Pi swaps and a turn stalls for seconds. Every model is registered here
+with how to load and unload it, and the manager keeps the resident ones
+within RESIDENCY_BUDGET_MB:
+
+  * a model is loaded on demand (acquire/hold) and its footprint measured,
+    as the RSS growth of the process that loaded it or as reported by the
+    model server;
+  * to make room, the least recently used models are unloaded first, but
+    never one that is in use (hold) or pinned;
+  * prepare(stage) pins the models of the stage a turn is about to reach
+    and loads them in the background, e.g. the voice while the LLM is still
+    generating; a pin ends when the model was used or RESIDENCY_PIN_S passed;
+  * models unused for RESIDENCY_IDLE_S are unloaded;
+  * a model server may drop a model on its own (Ollama once keep_alive
+    runs out); models with a footprint are re-checked before making room
+    and by the sweeper, and marked unloaded when they are gone.
+
+Footprints, process RSS and the load/evict events are served on
+/residency and /metrics. With the defaults (no budget, no idle timeout)
+nothing is ever unloaded.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import tracing
+
+RESIDENCY_BUDGET_MB = float(os.getenv("RESIDENCY_BUDGET_MB", 0))   # 0 = no budget
+RESIDENCY_IDLE_S    = float(os.getenv("RESIDENCY_IDLE_S", 0))      # 0 = never unload idle models
+RESIDENCY_PIN_S     = float(os.getenv("RESIDENCY_PIN_S", 30))
+RESIDENCY_EVENTS    = 100          # events kept for /residency
+
+logger = logging.getLogger("residency")
+
+MB = 2**20
+
+
+def rss(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of *pid* (default: this process) in bytes; None if unknown."""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class ModelLoadError(RuntimeError):
+    """A model's loader failed or reported failure."""
+
+
+class Model:
+    def __init__(self, name: str, load: Callable[[], object], unload: Callable[[], None],
+                 stage: Optional[str] = None, pid: Optional[Callable[[], Optional[int]]] = None,
+                 footprint: Optional[Callable[[], Optional[int]]] = None,
+                 estimate_mb: float = 0):
+        self.name = name
+        self.stage = stage
+        self._load = load
+        self._unload = unload
+        self._pid = pid                  # process the model lives in (default: this one)
+        self._footprint = footprint      # measures the loaded model itself, if it can
+        self.obj = None
+        self.resident = False
+        self.bytes = int(estimate_mb * MB)   # last measured, or the estimate
+        self.busy = 0
+        self.pinned_until = 0.0
+        self.last_used = 0.0
+        self.lock = threading.Lock()     # one load/unload at a time
+
+    @property
+    def pinned(self) -> bool:
+        return self.pinned_until > time.monotonic()
+
+    def load(self) -> float:
+        pid = self._pid() if self._pid else None
+        before = rss(pid)
+        t0 = time.perf_counter()
+        obj = self._load()
+        seconds = time.perf_counter() - t0
+        if obj is False:
+            raise ModelLoadError(self.name)
+        measured = None
+        if self._footprint is not None:
+            measured = self._footprint()
+        elif before is not None:
+            after = rss(pid)
+            if after is not None and after > before:
+                measured = after - before
+        if measured:
+            self.bytes = measured
+        self.obj, self.resident = obj, True
+        return seconds
+
+    def unload(self) -> None:
+        self._unload()
+        self.obj, self.resident = None, False
+
+    def dropped(self) -> bool:
+        """True if the model reports itself no longer loaded (footprint None)."""
+        if self._footprint is None or not self.resident:
+            return False
+        try:
+            return self._footprint() is None
+        except Exception:
+            return False
+
+    def as_dict(self) -> dict:
+        now = time.monotonic()
+        return {
+            "stage": self.stage,
+            "resident": self.resident,
+            "mb": round(self.bytes / MB, 1),
+            "busy": self.busy,
+            "pinned": self.pinned,
+            "idle_s": round(now - self.last_used, 1) if self.last_used else None,
+        }
+
+
+class ResidencyManager:
+    def __init__(self, budget_mb: float = RESIDENCY_BUDGET_MB, idle_s: float = RESIDENCY_IDLE_S,
+                 pin_s: float = RESIDENCY_PIN_S):
+        self.budget = int(budget_mb * MB)
+        self.idle_s = idle_s
+        self.pin_s = pin_s
+        self.models: Dict[str, Model] = {}
+        self.events: deque = deque(maxlen=RESIDENCY_EVENTS)
+        self.counts: Dict[tuple, int] = {}
+        self.processes: Dict[str, Callable[[], Optional[int]]] = {"app": os.getpid}
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def register(self, name: str, load: Callable[[], object], unload: Callable[[], None],
+                 **kwargs) -> Model:
+        """
+        Make *name* known. *load* returns the model (False = failed), *unload*
+        frees it. Optional: *stage* (for prepare), *pid* (the process it lives
+        in), *footprint* (bytes of the loaded model) and *estimate_mb* (used
+        until the first load was measured).
+        """
+        with self._lock:
+            model = self.models[name] = Model(name, load, unload, **kwargs)
+        return model
+
+    def watch_process(self, name: str, pid: Callable[[], Optional[int]]) -> None:
+        """Report the RSS of another process (e.g. the transcription worker)."""
+        self.processes[name] = pid
+
+    # ── use ──
+    def acquire(self, name: str):
+        """The loaded model *name*, loading it (and making room) if needed."""
+        model = self.models[name]
+        model.last_used = time.monotonic()
+        if model.resident:
+            return model.obj
+        with model.lock:
+            if not model.resident:
+                self._make_room(model, model.bytes)
+                try:
+                    seconds = model.load()
+                except Exception:
+                    self._event(model, "load_failed", "demand")
+                    raise
+                tracing.record("model_load", seconds)
+                self._event(model, "load", "demand", seconds)
+                self._make_room(model, 0)
+        model.last_used = time.monotonic()
+        return model.obj
+
+    @contextmanager
+    def hold(self, name: str):
+        """Keep *name* loaded for the body; load failures are logged, not raised."""
+        model = self.models.get(name)
+        if model is None:
+            yield None
+            return
+        with self._lock:
+            model.busy += 1
+        try:
+            try:
+                obj = self.acquire(name)
+            except Exception:
+                logger.exception("Loading %s failed", name)
+                obj = None
+            yield obj
+        finally:
+            with self._lock:
+                model.busy -= 1
+                model.pinned_until = 0.0        # the pin was for this use
+            model.last_used = time.monotonic()
+
+    def prepare(self, *stages: str) -> None:
+        """Pin the models of *stages* and load them in the background if needed."""
+        until = time.monotonic() + self.pin_s
+        for model in list(self.models.values()):
+            if model.stage not in stages:
+                continue
+            model.pinned_until = max(model.pinned_until, until)
+            if not model.resident:
+                threading.Thread(target=self._prefetch, args=(model,), daemon=True,
+                                 name=f"residency-{model.name}").start()
+
+    def _prefetch(self, model: Model) -> None:
+        with model.lock:
+            if model.resident:
+                return
+            self._make_room(model, model.bytes)
+            try:
+                seconds = model.load()
+            except Exception:
+                logger.exception("Prefetching %s failed", model.name)
+                self._event(model, "load_failed", "prefetch")
+                return
+            self._event(model, "load", "prefetch", seconds)
+            model.last_used = time.monotonic()
+            self._make_room(model, 0)
+
+    # ── eviction ──
+    def resident_bytes(self) -> int:
+        return sum(m.bytes for m in self.models.values() if m.resident)
+
+    def _make_room(self, keep: Model, need: int) -> None:
+        """
+        Unload least recently used models other than *keep* until *need*
+        more bytes fit the budget (called before and, with the measured
+        footprint counted, again after loading *keep*).
+        """
+        if not self.budget:
+            return
+        self.reconcile()
+        with self._lock:
+            victims = sorted((m for m in self.models.values()
+                              if m.resident and m is not keep and not m.busy and not m.pinned),
+                             key=lambda m: m.last_used)
+        for victim in victims:
+            if self.resident_bytes() + need <= self.budget:
+                return
+            self._evict(victim, "budget")
+        if self.resident_bytes() + need > self.budget:
+            logger.warning("Models need %.0f MB, over the %.0f MB budget (%s)",
+                           (self.resident_bytes() + need) / MB, self.budget / MB, keep.name)
+            self._event(keep, "over_budget", "budget")
+
+    def _evict(self, model: Model, reason: str) -> bool:
+        # a model being loaded (or used) is skipped rather than waited for
+        if not model.lock.acquire(blocking=False):
+            return False
+        try:
+            if not model.resident or model.busy:
+                return False
+            try:
+                model.unload()
+            except Exception:
+                logger.exception("Unloading %s failed", model.name)
+                return False
+            self._event(model, "evict", reason)
+            return True
+        finally:
+            model.lock.release()
+
+    def reconcile(self) -> int:
+        """Mark models unloaded that their server dropped by itself; returns how many."""
+        dropped = 0
+        for model in list(self.models.values()):
+            if not model.resident or model.busy or not model.lock.acquire(blocking=False):
+                continue
+            try:
+                if not model.busy and model.dropped():
+                    model.obj, model.resident = None, False
+                    self._event(model, "expired", "server")
+                    dropped += 1
+            finally:
+                model.lock.release()
+        return dropped
+
+    def evict_idle(self) -> int:
+        """Unload every model unused for idle_s; returns how many."""
+        if not self.idle_s:
+            return 0
+        cutoff = time.monotonic() - self.idle_s
+        idle = [m for m in list(self.models.values())
+                if m.resident and not m.busy and not m.pinned and m.last_used < cutoff]
+        return sum(self._evict(m, "idle") for m in idle)
+
+    def start(self) -> "ResidencyManager":
+        """Start the thread that unloads idle models and re-checks the resident ones."""
+        if (self.idle_s or self.budget) and self._sweeper is None:
+            period = min(30.0, max(1.0, self.idle_s / 4)) if self.idle_s else 30.0
+
+            def _sweep():
+                while True:
+                    time.sleep(period)
+                    self.reconcile()
+                    self.evict_idle()
+            self._sweeper = threading.Thread(target=_sweep, name="residency", daemon=True)
+            self._sweeper.start()
+        return self
+
+    # ── reporting ──
+    def _event(self, model: Model, event: str, reason: str, seconds: Optional[float] = None) -> None:
+        entry = {"t": round(time.time(), 3), "model": model.name, "event": event,
+                 "reason": reason, "mb": round(model.bytes / MB, 1)}
+        if seconds is not None:
+            entry["seconds"] = round(seconds, 3)
+        with self._lock:
+            self.events.append(entry)
+            key = (model.name, event)
+            self.counts[key] = self.counts.get(key, 0) + 1
+        logger.info("Model %s: %s (%s, %.0f MB%s)", model.name, event, reason, model.bytes / MB,
+                    f", {seconds:.2f} s" if seconds is not None else "")
+
+    def process_rss(self) -> Dict[str, int]:
+        out = {}
+        for name, pid in list(self.processes.items()):
+            try:
+                value = rss(pid())
+            except Exception:
+                value = None
+            if value is not None:
+                out[name] = value
+        return out
+
+    def status(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+        return {
+            "budget_mb": round(self.budget / MB, 1) if self.budget else None,
+            "resident_mb": round(self.resident_bytes() / MB, 1),
+            "idle_s": self.idle_s or None,
+            "models": {name: m.as_dict() for name, m in list(self.models.items())},
+            "rss_mb": {name: round(b / MB, 1) for name, b in self.process_rss().items()},
+            "events": events,
+        }
+
+    def metrics(self) -> str:
+        """Prometheus text for footprints, process RSS and load/evict counters."""
+        lines = ["# HELP plant_model_resident_bytes Footprint of each loaded model (0 = unloaded).",
+                 "# TYPE plant_model_resident_bytes gauge"]
+        for name, m in sorted(self.models.items()):
+            lines.append(f'plant_model_resident_bytes{{model="{name}"}} {m.bytes if m.resident else 0}')
+        if self.budget:
+            lines += ["# TYPE plant_model_budget_bytes gauge", f"plant_model_budget_bytes {self.budget}"]
+        lines += ["# HELP plant_process_rss_bytes Resident set size per process.",
+                  "# TYPE plant_process_rss_bytes gauge"]
+        for name, value in sorted(self.process_rss().items()):
+            lines.append(f'plant_process_rss_bytes{{process="{name}"}} {value}')
+        lines += ["# HELP plant_model_events_total Model loads and evictions.",
+                  "# TYPE plant_model_events_total counter"]
+        with self._lock:
+            counts = sorted(self.counts.items())
+        for (name, event), n in counts:
+            lines.append(f'plant_model_events_total{{model="{name}",event="{event}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+_MANAGER: Optional[ResidencyManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_manager() -> ResidencyManager:
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = ResidencyManager()
+        return _MANAGER
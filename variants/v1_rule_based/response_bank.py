@@ -0,0 +1,251 @@
+# variants/v1_rule_based/response_bank.py
+"""
+Canned replies per mood for deadline mode.
+
+When the LLM misses the turn's deadline (see backend.generate_with_deadline)
+the plant answers right away with one of these; their audio is rendered
+into the TTS cache at warm-up, so the fallback costs no synthesis either.
+
+The bank starts from the built-in lines below, one set per mood in
+expressions_store._mood_to_emojis. `python response_bank.py --generate`
+asks the LLM offline for more and writes them to RESPONSE_BANK_FILE. With
+RESPONSE_BANK_LEARN=1 late replies to prompt-less turns (the plant saying
+how it feels, not answering a question) are added as well, at most
+RESPONSE_BANK_LEARNED per mood, oldest dropped first. Each one rewrites
+the bank file, so learning is off by default.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import expressions_store
+
+RESPONSE_BANK_FILE    = os.getenv("RESPONSE_BANK_FILE",
+                                  os.path.expanduser("~/.cache/plantbot/response_bank.json"))
+RESPONSE_BANK_LEARN   = os.getenv("RESPONSE_BANK_LEARN", "0") == "1"
+RESPONSE_BANK_LEARNED = int(os.getenv("RESPONSE_BANK_LEARNED", 4))
+RESPONSE_BANK_MAX_LEN = 160        # longer late replies are not worth replaying
+
+SEED_REPLIES: Dict[str, List[str]] = {
+    "highly_stressed":     ["I'm really not doing well right now. Please check on me soon.",
+                            "Everything feels wrong for me at the moment. I need some help."],
+    "moderately_stressed": ["I'm a little uneasy today. A quick look at my soil and light would help.",
+                            "I'm okay, but not great. Could you check on me?"],
+    "happy":               ["I'm feeling good, thank you for asking!",
+                            "All is well here. I'm growing happily."],
+    "mixed":               ["Some things are fine and some could be better. Let me think about it.",
+                            "I'm doing alright, though not everything is perfect."],
+    "very_happy":          ["I feel wonderful today! Everything is just right.",
+                            "I couldn't be happier. Thank you for taking such good care of me."],
+    "very_moist":          ["My soil is very wet. Please hold off on watering for a while.",
+                            "I've had plenty to drink. Let me dry out a little."],
+    "very_dry":            ["I'm really thirsty. Could you water me, please?",
+                            "My soil is bone dry. A drink would be lovely."],
+    "very_hot":            ["It's too hot for me here. Could you move me somewhere cooler?",
+                            "I'm overheating. Some shade would help."],
+    "very_cold":           ["Brr, I'm cold. Please move me somewhere warmer.",
+                            "It's too chilly for me here."],
+    "very_humid":          ["The air is very humid. A little airflow would be nice.",
+                            "It's quite muggy around me."],
+    "very_dry_air":        ["The air is very dry. A little misting would help.",
+                            "My leaves could use some humidity."],
+    "light_deprived":      ["I'm not getting enough light. Could you move me closer to a window?",
+                            "It's too dark for me to grow well."],
+    "very_dark":           ["It's very dark here. I'm resting for now.",
+                            "I can barely see any light."],
+    "lightly_dark":        ["It's getting dim. I'll take it easy.",
+                            "A bit more light would be nice."],
+    "ambient":             ["The light is fine for me right now.",
+                            "I'm comfortable in this light."],
+    "sunny":               ["I love this sunshine!",
+                            "The sun feels great on my leaves."],
+    "very_sunny":          ["That's a lot of sun! Keep an eye on my leaves.",
+                            "Wow, it's bright. I'm soaking it all in."],
+    "person_interacting":  ["It's nice to spend time with you.",
+                            "I'm happy you're here."],
+    "person_approaching":  ["Oh, hello there!",
+                            "I see you coming. Hi!"],
+    "person_far_away":     ["Come back soon!",
+                            "I'll be here when you get back."],
+}
+_FALLBACK_MOOD = "mixed"
+
+
+class ResponseBank:
+    def __init__(self, path: str = RESPONSE_BANK_FILE,
+                 learned_per_mood: int = RESPONSE_BANK_LEARNED):
+        self.path = path
+        self.learned_per_mood = learned_per_mood
+        self.replies: Dict[str, List[str]] = {m: list(SEED_REPLIES.get(m, []))
+                                               for m in expressions_store._mood_to_emojis}
+        self.learned: Dict[str, List[str]] = {}
+        # called with every learned reply, e.g. to render its audio
+        self.on_learn: Optional[Callable[[str], None]] = None
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _candidates(self, mood: Optional[str]) -> List[str]:
+        replies = self.replies.get(mood or "") or self.replies.get(_FALLBACK_MOOD) or []
+        return self.learned.get(mood or "", []) + replies
+
+    def pick(self, mood: Optional[str], ready: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        The next reply for *mood*, rotating so the plant doesn't repeat
+        itself. With *ready* (e.g. "audio is cached") those are preferred.
+        """
+        with self._lock:
+            candidates = self._candidates(mood)
+            if ready is not None:
+                candidates = [c for c in candidates if ready(c)] or candidates
+            if not candidates:
+                return "Give me a moment."
+            i = self._next.get(mood or "", 0)
+            self._next[mood or ""] = i + 1
+            return candidates[i % len(candidates)]
+
+    def phrases(self) -> List[str]:
+        """Every reply in the bank, e.g. for TTS pre-rendering."""
+        with self._lock:
+            seen = {}
+            for mood in set(self.replies) | set(self.learned):
+                for text in self._candidates(mood):
+                    seen[text] = None
+            return list(seen)
+
+    def learn(self, mood: Optional[str], reply: str) -> bool:
+        """Keep a (late) LLM reply for *mood*; False if it isn't worth replaying."""
+        reply = reply.strip()
+        if not mood or not reply or len(reply) > RESPONSE_BANK_MAX_LEN:
+            return False
+        with self._lock:
+            learned = self.learned.setdefault(mood, [])
+            if reply in learned or reply in self.replies.get(mood, []):
+                return False
+            learned.insert(0, reply)
+            del learned[self.learned_per_mood:]
+        self.save()
+        if self.on_learn is not None:
+            try:
+                self.on_learn(reply)
+            except Exception:
+                logging.exception("Response bank on_learn hook failed")
+        return True
+
+    # ── persistence ──
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            logging.exception("Could not read response bank %s", self.path)
+            return
+        for mood, replies in data.get("replies", {}).items():
+            if replies:
+                self.replies[mood] = list(replies)
+        for mood, replies in data.get("learned", {}).items():
+            self.learned[mood] = list(replies)[:self.learned_per_mood]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            data = {"replies": self.replies, "learned": self.learned}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            logging.exception("Could not write response bank %s", self.path)
+
+
+# ───────────────────────── deadline outcomes ─────────────────────────
+
+# llm       – the LLM started answering within the deadline
+# timeout   – it didn't, the bank answered
+# busy      – the LLM stage was full, the bank answered right away
+# error     – the LLM failed, the bank answered
+# learned / discarded – what happened to a reply that arrived too late
+OUTCOMES = ("llm", "timeout", "busy", "error", "learned", "discarded")
+_COUNTS: Dict[str, int] = {o: 0 for o in OUTCOMES}
+_COUNTS_LOCK = threading.Lock()
+
+
+def count(outcome: str) -> None:
+    with _COUNTS_LOCK:
+        _COUNTS[outcome] += 1
+
+
+def stats() -> Dict[str, object]:
+    with _COUNTS_LOCK:
+        out: Dict[str, object] = dict(_COUNTS)
+    answered = sum(out[o] for o in ("llm", "timeout", "busy", "error"))
+    out["fallback_rate"] = round(1 - out["llm"] / answered, 3) if answered else 0.0
+    return out
+
+
+def metrics() -> str:
+    """Prometheus counters of the deadline outcomes."""
+    lines = ["# HELP plant_deadline_total Deadline-mode turns by outcome.",
+             "# TYPE plant_deadline_total counter"]
+    with _COUNTS_LOCK:
+        for outcome in OUTCOMES:
+            lines.append(f'plant_deadline_total{{outcome="{outcome}"}} {_COUNTS[outcome]}')
+    return "\n".join(lines) + "\n"
+
+
+_BANK: Optional[ResponseBank] = None
+_BANK_LOCK = threading.Lock()
+
+
+def get_bank() -> ResponseBank:
+    global _BANK
+    with _BANK_LOCK:
+        if _BANK is None:
+            _BANK = ResponseBank()
+        return _BANK
+
+
+def generate(per_mood: int = 4) -> ResponseBank:
+    """Ask the LLM offline for *per_mood* fresh replies per mood and save them."""
+    from ollama_client import get_client
+    bank = get_bank()
+    client = get_client()
+    for mood in bank.replies:
+        replies: List[str] = []
+        for i in range(per_mood * 2):
+            if len(replies) >= per_mood:
+                break
+            prompt = (f"You are a potted houseplant. You feel {mood.replace('_', ' ')}. "
+                      "Tell your owner how you feel in one short sentence.\nPlant:")
+            try:
+                text = client.generate(prompt, options={"temperature": 0.9, "seed": i})
+            except Exception:
+                logging.exception("Generating replies for %s failed", mood)
+                break
+            reply = text.get("response", "").strip().strip('"')
+            if reply and len(reply) <= RESPONSE_BANK_MAX_LEN and reply not in replies:
+                replies.append(reply)
+        if replies:
+            bank.replies[mood] = replies
+            print(f"{mood}: {len(replies)} replies")
+    bank.save()
+    return bank
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fill the response bank from the LLM")
+    parser.add_argument("--generate", type=int, metavar="N", default=0,
+                        help="generate N replies per mood")
+    args = parser.parse_args()
+    if args.generate:
+        generate(args.generate)
+    for text in get_bank().phrases():
+        print(text)
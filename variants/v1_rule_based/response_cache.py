@@ -0,0 +1,195 @@
+# variants/v1_rule_based/response_cache.py
+"""
+Reply cache for the LLM.
+
+The key is built from the sensor package (mood, per-factor reasons and the
+readings bucketed to RESPONSE_CACHE_BUCKETS) plus the normalized owner
+message – never from the rendered prompt, so its timestamp cannot defeat
+caching. Entries expire after RESPONSE_CACHE_TTL seconds, the least recently
+used are evicted beyond RESPONSE_CACHE_SIZE, and the cache is saved to
+RESPONSE_CACHE_FILE so it survives restarts.
+"""
+import os
+import re
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+RESPONSE_CACHE_TTL     = float(os.getenv("RESPONSE_CACHE_TTL", 900))
+RESPONSE_CACHE_SIZE    = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_FILE    = os.getenv("RESPONSE_CACHE_FILE",
+                                   os.path.expanduser("~/.cache/plantbot/responses.json"))
+RESPONSE_CACHE_SAVE_S  = float(os.getenv("RESPONSE_CACHE_SAVE", 30))
+# reading:step for linear buckets, reading:log<step> for decades (lux)
+RESPONSE_CACHE_BUCKETS = os.getenv(
+    "RESPONSE_CACHE_BUCKETS",
+    "temperature_c:1,humidity_pct:5,soil_moisture_pct:5,light_lux:log0.5",
+)
+
+_PUNCT = re.compile(r"[^\w\s]")
+_WS = re.compile(r"\s+")
+
+
+def parse_buckets(spec: str) -> Dict[str, tuple]:
+    buckets = {}
+    for item in spec.split(","):
+        if ":" not in item:
+            continue
+        name, step = item.split(":", 1)
+        if step.startswith("log"):
+            buckets[name.strip()] = ("log", float(step[3:]))
+        else:
+            buckets[name.strip()] = ("lin", float(step))
+    return buckets
+
+
+def normalize_text(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    return _WS.sub(" ", _PUNCT.sub(" ", text.casefold())).strip()
+
+
+class ResponseCache:
+    def __init__(self,
+                 path: str = RESPONSE_CACHE_FILE,
+                 ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_SIZE,
+                 buckets: Optional[Dict[str, tuple]] = None,
+                 save_interval: float = RESPONSE_CACHE_SAVE_S):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.buckets = parse_buckets(RESPONSE_CACHE_BUCKETS) if buckets is None else buckets
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._dirty = False
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    # ── keys ──
+    def _bucket(self, name: str, value) -> Any:
+        kind, step = self.buckets[name]
+        if value is None:
+            return "unknown"
+        value = float(value)
+        if not math.isfinite(value):
+            # a failed read (NaN) is as unknown as a missing one
+            return "unknown"
+        if kind == "log":
+            return math.floor(math.log10(max(value, 0.1)) / step)
+        return math.floor(value / step)
+
+    def key(self, sensor_pkg: Mapping, user_message: Optional[str]) -> str:
+        reasons = sensor_pkg.get("reasons", {}) or {}
+        readings = sensor_pkg.get("readings", {}) or {}
+        parts = [
+            str(sensor_pkg.get("overall")),
+            ",".join(f"{k}={reasons[k]}" for k in sorted(reasons)),
+            ",".join(f"{k}={self._bucket(k, readings.get(k))}" for k in sorted(self.buckets)),
+            normalize_text(user_message),
+        ]
+        return "|".join(parts)
+
+    # ── lookup ──
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            created, reply = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return reply
+
+    def put(self, key: str, reply: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "entries": len(self._entries),
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    def metrics(self) -> str:
+        """Prometheus counters of the lookups and the current size."""
+        with self._lock:
+            hits, misses, expired, entries = self.hits, self.misses, self.expired, len(self._entries)
+        return "\n".join([
+            "# HELP plant_response_cache_lookups_total Reply cache lookups by result.",
+            "# TYPE plant_response_cache_lookups_total counter",
+            f'plant_response_cache_lookups_total{{result="hit"}} {hits}',
+            f'plant_response_cache_lookups_total{{result="miss"}} {misses}',
+            "# HELP plant_response_cache_expired_total Misses on an entry past RESPONSE_CACHE_TTL.",
+            "# TYPE plant_response_cache_expired_total counter",
+            f"plant_response_cache_expired_total {expired}",
+            "# TYPE plant_response_cache_entries gauge",
+            f"plant_response_cache_entries {entries}",
+        ]) + "\n"
+
+    # ── persistence ──
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            logging.exception("Could not read response cache %s", self.path)
+            return
+        now = time.time()
+        for key, created, reply in data.get("entries", []):
+            if now - created <= self.ttl:
+                self._entries[key] = (created, reply)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"entries": [[k, c, r] for k, (c, r) in self._entries.items()]}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            logging.exception("Could not write response cache %s", self.path)
+
+
+_CACHE: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ResponseCache()
+        atexit.register(_CACHE.save)
+    return _CACHE
@@ -1 +0,0 @@
-# this file contains a rule base to explain the state of plant. 
\ No newline at end of file
@@ -0,0 +1,76 @@
+# variants/v1_rule_based/serving.py
+"""
+The HTTP server in front of the Flask app.
+
+Every request needs a thread of its own: a turn blocks while it waits for
+its stages (see pipeline.py), and /healthz, /talk/partial or another
+plant's /chat must not wait behind it. APP_SERVER picks the server:
+
+  * "waitress" (default): the production WSGI server from requirements.txt,
+    with a pool of APP_MAX_CONNECTIONS threads
+  * "uvicorn": uvicorn's WSGI interface, which runs the app in a thread
+    pool and accepts at most APP_MAX_CONNECTIONS connections
+  * "werkzeug": Flask's own threaded server, one thread per request; also
+    the fallback when the chosen server is not installed
+
+The stages bound the actual work, so no server needs its own queue to
+keep a burst of requests from piling up on the Pi.
+"""
+import os
+import logging
+
+APP_SERVER          = os.getenv("APP_SERVER", "waitress")
+APP_MAX_CONNECTIONS = int(os.getenv("APP_MAX_CONNECTIONS", 16))
+
+
+def make_server(wsgi_app, host: str = "0.0.0.0", port: int = 5000, kind: str = APP_SERVER):
+    """A server for *wsgi_app*, not yet running; see run()."""
+    if kind == "waitress":
+        try:
+            import waitress
+        except ImportError:
+            logging.warning("waitress not installed – falling back to Werkzeug's server")
+        else:
+            return waitress.create_server(wsgi_app, host=host, port=port,
+                                          threads=APP_MAX_CONNECTIONS)
+    elif kind == "uvicorn":
+        try:
+            import uvicorn
+        except ImportError:
+            logging.warning("uvicorn not installed – falling back to Werkzeug's server")
+        else:
+            config = uvicorn.Config(wsgi_app, host=host, port=port, interface="wsgi",
+                                    limit_concurrency=APP_MAX_CONNECTIONS, log_level="warning")
+            return uvicorn.Server(config)
+    from werkzeug.serving import make_server as _werkzeug_server
+    return _werkzeug_server(host, port, wsgi_app, threaded=True)
+
+
+def port(server) -> int:
+    """The port *server* listens on (resolves port 0)."""
+    if hasattr(server, "server_port"):
+        return server.server_port               # Werkzeug
+    if hasattr(server, "effective_port"):
+        return server.effective_port            # waitress
+    return server.config.port                   # uvicorn
+
+
+def run(server) -> None:
+    """Serve until stop() or an interrupt."""
+    if hasattr(server, "serve_forever"):
+        server.serve_forever()
+    else:
+        server.run()
+
+
+def stop(server) -> None:
+    if hasattr(server, "shutdown"):
+        server.shutdown()                       # Werkzeug
+    elif hasattr(server, "should_exit"):
+        server.should_exit = True               # uvicorn
+    else:
+        server.close()                          # waitress
+
+
+def serve(wsgi_app, host: str = "0.0.0.0", port: int = 5000) -> None:
+    run(make_server(wsgi_app, host, port))
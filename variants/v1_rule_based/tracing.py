@@ -0,0 +1,272 @@
+# variants/v1_rule_based/tracing.py
+"""
+Per-turn latency tracing.
+
+Every /chat or /talk request opens a Trace keyed by a request ID. Code on
+the turn's path records how long each stage took (VAD capture, STT,
+sensor read, prompt build, LLM, TTS, display) with span() / record(); the
+current trace travels in a contextvar, which pipeline.Stage and spawn()
+carry over into worker threads. A turn ends when the request has returned
+*and* every thread that holds it (e.g. TTS playback) has finished. Its
+per-stage totals then go into rolling windows and one compact JSON line
+is appended to TRACE_LOG.
+
+metrics() renders the windows as Prometheus summaries (p50/p95/p99).
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# "" = no trace log; a relative path is taken next to log_setup.LOG_FILE
+TRACE_LOG    = os.getenv("TRACE_LOG", "turn_traces.jsonl")
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", 500))           # turns per rolling window
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Trace:
+    def __init__(self, route: str, request_id: Optional[str] = None):
+        self.id = request_id or uuid.uuid4().hex[:12]
+        self.route = route
+        self.started = time.time()
+        self.spans: Dict[str, float] = {}
+        self.tags: Dict[str, object] = {}
+        self.error: Optional[str] = None
+        self._t0 = time.perf_counter()
+        self._holds = 1                 # the request itself
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add *seconds* to *stage*; a stage hit twice in one turn is summed."""
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def tag(self, key: str, value) -> None:
+        self.tags[key] = value
+
+    def elapsed(self) -> float:
+        """Seconds since the turn started."""
+        return time.perf_counter() - self._t0
+
+    def hold(self) -> "Trace":
+        with self._lock:
+            self._holds += 1
+        return self
+
+    def release(self) -> None:
+        with self._lock:
+            self._holds -= 1
+            done = self._holds == 0
+        if done:
+            _finish(self, time.perf_counter() - self._t0)
+
+
+class _NullTrace(Trace):
+    """Stand-in outside of a turn (startup warm-up, CLI use): records nothing."""
+
+    def __init__(self):
+        super().__init__("none", "-")
+
+    def record(self, stage: str, seconds: float) -> None:
+        pass
+
+    def tag(self, key: str, value) -> None:
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def hold(self) -> "Trace":
+        return self
+
+    def release(self) -> None:
+        pass
+
+
+NULL = _NullTrace()
+_CURRENT: "contextvars.ContextVar[Trace]" = contextvars.ContextVar("trace", default=NULL)
+
+
+def current() -> Trace:
+    return _CURRENT.get()
+
+
+def record(stage: str, seconds: float) -> None:
+    current().record(stage, seconds)
+
+
+def tag(key: str, value) -> None:
+    current().tag(key, value)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the body as *stage* of the current turn."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+
+def timed(stage: str, fn: Callable) -> Callable:
+    """Wrap *fn* so that each call is recorded as *stage* (e.g. for pipeline.run)."""
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def turn(route: str, request_id: Optional[str] = None):
+    """Open a trace for one request; it is finished once nothing holds it any more."""
+    trace = Trace(route, request_id)
+    token = _CURRENT.set(trace)
+    try:
+        yield trace
+    except BaseException as exc:
+        trace.error = type(exc).__name__
+        raise
+    finally:
+        _CURRENT.reset(token)
+        trace.release()
+
+
+def spawn(target: Callable, *args, name: Optional[str] = None) -> threading.Thread:
+    """
+    Start a daemon thread that runs in the caller's trace context and keeps
+    the turn open until *target* returns.
+    """
+    trace = current().hold()
+    ctx = contextvars.copy_context()
+
+    def run():
+        try:
+            ctx.run(target, *args)
+        finally:
+            trace.release()
+
+    t = threading.Thread(target=run, name=name, daemon=True)
+    t.start()
+    return t
+
+
+# ───────────────────────── rolling windows ─────────────────────────
+
+class _Window:
+    def __init__(self, size: int):
+        self.samples: "deque[float]" = deque(maxlen=size)
+        self.count = 0          # lifetime, as Prometheus expects for _count/_sum
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {}
+        n = len(ordered)
+        # nearest rank
+        return {q: ordered[min(n - 1, max(0, int(q * n + 0.5) - 1))] for q in QUANTILES}
+
+
+_STAGES: Dict[str, _Window] = {}
+_TURNS: Dict[tuple, int] = {}        # (route, outcome) -> count
+_LOCK = threading.Lock()
+_LOG: Optional[logging.Logger] = None
+
+
+def _trace_log_path() -> str:
+    """TRACE_LOG, anchored to the directory of the main log if relative."""
+    if os.path.isabs(TRACE_LOG):
+        return TRACE_LOG
+    import log_setup
+    log_dir = os.path.dirname(os.path.abspath(log_setup.LOG_FILE)) if log_setup.LOG_FILE else os.getcwd()
+    return os.path.join(log_dir, TRACE_LOG)
+
+
+def _trace_log() -> Optional[logging.Logger]:
+    global _LOG
+    if not TRACE_LOG:
+        return None
+    if _LOG is None:
+        import log_setup
+        log = logging.getLogger("trace")
+        log.propagate = False
+        if not log.handlers:
+            # written by a listener thread, rotated like the main log
+            log.addHandler(log_setup.queued(log_setup.rotating_handler(_trace_log_path(), "%(message)s")))
+        log.setLevel(logging.INFO)
+        _LOG = log
+    return _LOG
+
+
+def _finish(trace: Trace, total: float) -> None:
+    with _LOCK:
+        for stage, seconds in list(trace.spans.items()) + [("turn_total", total)]:
+            window = _STAGES.get(stage)
+            if window is None:
+                window = _STAGES[stage] = _Window(TRACE_WINDOW)
+            window.observe(seconds)
+        key = (trace.route, "error" if trace.error else "ok")
+        _TURNS[key] = _TURNS.get(key, 0) + 1
+
+    log = _trace_log()
+    if log is None:
+        return
+    entry = {
+        "id": trace.id,
+        "route": trace.route,
+        "ts": round(trace.started, 3),
+        "total_ms": round(total * 1000, 1),
+        "spans": {k: round(v * 1000, 1) for k, v in trace.spans.items()},
+    }
+    if trace.tags:
+        entry["tags"] = trace.tags
+    if trace.error:
+        entry["error"] = trace.error
+    log.info(json.dumps(entry, separators=(",", ":"), default=str))
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """stage -> {'p50', 'p95', 'p99', 'count'} over the rolling window."""
+    with _LOCK:
+        out = {}
+        for stage, window in _STAGES.items():
+            row = {f"p{int(q * 100)}": v for q, v in window.quantiles().items()}
+            row["count"] = window.count
+            out[stage] = row
+        return out
+
+
+def metrics() -> str:
+    """Prometheus text exposition of the per-stage windows and turn counters."""
+    lines = [
+        "# HELP plant_stage_seconds Per-turn time spent in each stage "
+        f"(quantiles over the last {TRACE_WINDOW} turns).",
+        "# TYPE plant_stage_seconds summary",
+    ]
+    with _LOCK:
+        for stage in sorted(_STAGES):
+            window = _STAGES[stage]
+            for q, v in window.quantiles().items():
+                lines.append(f'plant_stage_seconds{{stage="{stage}",quantile="{q}"}} {v:.6f}')
+            lines.append(f'plant_stage_seconds_sum{{stage="{stage}"}} {window.total:.6f}')
+            lines.append(f'plant_stage_seconds_count{{stage="{stage}"}} {window.count}')
+        lines += [
+            "# HELP plant_turns_total Finished turns by route and outcome.",
+            "# TYPE plant_turns_total counter",
+        ]
+        for (route, outcome), n in sorted(_TURNS.items()):
+            lines.append(f'plant_turns_total{{route="{route}",outcome="{outcome}"}} {n}')
+    return "\n".join(lines) + "\n"
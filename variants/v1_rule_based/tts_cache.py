@@ -0,0 +1,212 @@
+# variants/v1_rule_based/tts_cache.py
+"""
+Cache for synthesized Piper audio, keyed by (voice model, normalized text).
+
+Two tiers:
+  * in-memory LRU bounded by TTS_CACHE_MEM_MB
+  * on-disk raw int16 files in TTS_CACHE_DIR bounded by TTS_CACHE_DISK_MB,
+    memory-mapped on hit and evicted oldest-access first
+
+Only audio worth keeping goes to the disk (an SD card on the Pi): phrases
+put with persist=True (pre-warmed and fixed phrases) and sentences needed
+TTS_CACHE_PERSIST_USES times. A one-off LLM sentence stays in memory. The
+disk size is counted as files are written; the directory is only scanned
+when the count crosses the limit.
+"""
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("tts")
+
+TTS_CACHE_DIR     = os.getenv("TTS_CACHE_DIR", os.path.expanduser("~/.cache/plantbot/tts"))
+TTS_CACHE_MEM_MB  = float(os.getenv("TTS_CACHE_MEM_MB", 32))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", 256))
+TTS_CACHE_PERSIST_USES = int(os.getenv("TTS_CACHE_PERSIST_USES", 2))
+TTS_CACHE_TRACKED = 1024           # texts whose uses are counted
+
+_WS = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WS.sub(" ", text).strip().casefold()
+
+
+def cache_key(model: str, text: str) -> str:
+    ident = f"{os.path.basename(model)}\0{normalize(text)}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory: str = TTS_CACHE_DIR,
+                 mem_bytes: int = int(TTS_CACHE_MEM_MB * 2**20),
+                 disk_bytes: int = int(TTS_CACHE_DISK_MB * 2**20),
+                 persist_uses: int = TTS_CACHE_PERSIST_USES):
+        self.directory = directory
+        self.mem_bytes = mem_bytes
+        self.disk_bytes = disk_bytes
+        self.persist_uses = persist_uses
+        self.hits = 0
+        self.misses = 0
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._mem_used = 0
+        self._uses: "OrderedDict[str, int]" = OrderedDict()
+        self._disk: dict = {}           # key -> bytes of the files on disk
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for _, size, path in self._scan():
+                self._disk[os.path.basename(path)[:-4]] = size
+                self._disk_used += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".raw")
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = cache_key(model, text)
+        with self._lock:
+            samples = self._mem.get(key)
+            if samples is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                persist = self._used(key) and key not in self._disk
+        if samples is not None:
+            if persist:
+                self._store_disk(key, samples)
+            return samples
+        samples = self._load_disk(key)
+        with self._lock:
+            if samples is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, samples)
+        return samples
+
+    def put(self, model: str, text: str, samples: np.ndarray, persist: bool = False) -> None:
+        """Cache *samples*; on disk right away with *persist*, else once used often enough."""
+        if not len(samples):
+            return
+        samples = np.ascontiguousarray(samples, dtype=np.int16)
+        key = cache_key(model, text)
+        with self._lock:
+            self._remember(key, samples)
+            persist = self._used(key) or persist
+        if persist:
+            self._store_disk(key, samples)
+
+    def __contains__(self, item) -> bool:
+        model, text = item
+        key = cache_key(model, text)
+        with self._lock:
+            return key in self._mem or key in self._disk
+
+    def _used(self, key: str) -> bool:
+        """Count one use of *key*; True once it is worth writing to disk."""
+        uses = self._uses.pop(key, 0) + 1
+        self._uses[key] = uses
+        while len(self._uses) > TTS_CACHE_TRACKED:
+            self._uses.popitem(last=False)
+        return uses >= self.persist_uses
+
+    # ── memory tier ──
+    def _remember(self, key: str, samples: np.ndarray) -> None:
+        if samples.nbytes > self.mem_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_used -= old.nbytes
+        self._mem[key] = samples
+        self._mem_used += samples.nbytes
+        while self._mem_used > self.mem_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_used -= evicted.nbytes
+
+    # ── disk tier ──
+    def _load_disk(self, key: str) -> Optional[np.ndarray]:
+        if not self.directory:
+            return None
+        with self._lock:
+            if key not in self._disk:           # never written: no stat, no open
+                return None
+        path = self._path(key)
+        try:
+            samples = np.memmap(path, dtype=np.int16, mode="r")
+            os.utime(path)
+            return samples
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._forget_disk(key)
+            return None
+        except OSError:
+            logger.exception("TTS cache read failed: %s", path)
+            return None
+
+    def _store_disk(self, key: str, samples: np.ndarray) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            samples.tofile(tmp)
+            os.replace(tmp, path)
+        except OSError:
+            logger.exception("TTS cache write failed: %s", path)
+            return
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = samples.nbytes
+            self._disk_used += samples.nbytes
+            full = self._disk_used > self.disk_bytes
+        if full:
+            self._trim_disk()
+
+    def _forget_disk(self, key: str) -> None:
+        self._disk_used -= self._disk.pop(key, 0)
+
+    def _scan(self) -> list:
+        """(mtime, size, path) of every cached file."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".raw"):
+                    st = e.stat()
+                    # mtime is bumped on every hit, so it doubles as last access
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _trim_disk(self) -> None:
+        entries = sorted(self._scan())
+        with self._lock:
+            self._disk = {os.path.basename(p)[:-4]: size for _, size, p in entries}
+            self._disk_used = sum(self._disk.values())
+        for _, size, path in entries:
+            if self._disk_used <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._forget_disk(os.path.basename(path)[:-4])
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses,
+                "mem_entries": len(self._mem), "mem_bytes": self._mem_used}
+
+
+_CACHE: Optional[TTSCache] = None
+
+
+def get_cache() -> TTSCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = TTSCache()
+    return _CACHE
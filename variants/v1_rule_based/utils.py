@@ -1,26 +1,32 @@
 """
 Piper-TTS ➜ Bluetooth-Box (JBL GO 2, Flip 6 …)
-Rendert erst komplett, spielt danach blocking ab – dadurch 0 XRUNs / 0 Drop-outs.
+
+TTS_PLAYBACK=stream (Default): Piper-Chunks laufen über einen dauerhaft
+offenen OutputStream mit Jitter-Puffer (TTS_JITTER_MS), Underruns werden
+gezählt und geloggt.
+TTS_PLAYBACK=render: rendert erst komplett, spielt danach blocking ab –
+Fallback für wackelige Sinks, 0 XRUNs / 0 Drop-outs.
 """
 
 from __future__ import annotations
-import os, time, logging, threading
-from typing import Dict
+import os, time, logging, threading, queue, collections, functools
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional
 
 import numpy as np
-import sounddevice as sd
-from piper.voice import PiperVoice
+
+# sounddevice und piper (onnxruntime) erst beim ersten Gebrauch importieren,
+# damit der App-Start nicht auf sie wartet – geladen wird im Warm-up
+if TYPE_CHECKING:
+    from piper.voice import PiperVoice
+
+import residency
+import tts_cache
+import tracing
 
 
 # ─────────────────────────── Logging ───────────────────────────
+# Handler/Level kommen aus log_setup (Queue + Listener-Thread)
 logger = logging.getLogger("tts")
-if not logger.handlers:
-    logging.basicConfig(
-        filename="plant_interface.log",
-        level=logging.DEBUG,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    )
-logger.setLevel(logging.DEBUG)
 
 
 # ─────────────────── Modelle / Voices laden ────────────────────
@@ -29,33 +35,269 @@ MODELS: Dict[str, str] = {
     "en": os.path.join(TTS_DIR, "en_US-amy-low.onnx"),
     # "de": os.path.join(TTS_DIR, "de_DE-karl-medium.onnx"),
 }
+# geladene Stimmen; laden/entladen entscheidet residency (Speicherbudget, Leerlauf)
 _CACHE: Dict[str, PiperVoice] = {}
 
 
+def _model_path(lang: str) -> str:
+    return MODELS[lang if lang in MODELS else "en"]
+
+
+def _load_voice(key: str) -> PiperVoice:
+    from piper.voice import PiperVoice
+    pth = MODELS[key]
+    logger.debug("Lade Piper-Modell: %s", pth)
+    t0 = time.perf_counter()
+    voice = _CACHE[key] = PiperVoice.load(pth)
+    logger.debug("Modell geladen (%.2f s)", time.perf_counter() - t0)
+    return voice
+
+
+def _unload_voice(key: str) -> None:
+    # laufende Synthesen behalten ihre Referenz bis zum Ende
+    _CACHE.pop(key, None)
+
+
+def _estimate_mb(path: str) -> float:
+    # onnxruntime braucht etwa das 1,5-Fache der Modelldatei
+    try:
+        return os.path.getsize(path) * 1.5 / 2**20
+    except OSError:
+        return 0.0
+
+
+for _key, _path in MODELS.items():
+    residency.get_manager().register(f"tts:{_key}", functools.partial(_load_voice, _key),
+                                     functools.partial(_unload_voice, _key),
+                                     stage="tts", estimate_mb=_estimate_mb(_path))
+
+
+def _voice_name(lang: str) -> str:
+    return f"tts:{lang if lang in MODELS else 'en'}"
+
+
 def _get_voice(lang: str) -> PiperVoice:
-    key = lang if lang in MODELS else "en"
-    if key not in _CACHE:
-        pth = MODELS[key]
-        logger.debug("Lade Piper-Modell: %s", pth)
-        t0 = time.perf_counter()
-        _CACHE[key] = PiperVoice.load(pth)
-        logger.debug("Modell geladen (%.2f s)", time.perf_counter() - t0)
-    return _CACHE[key]
+    # Warm-up und erste Anfrage laden nicht doppelt (Lock pro Modell)
+    return residency.get_manager().acquire(_voice_name(lang))
 
 
 # ────────────────── Wiedergabe-Thread / Serialisierung ──────────────────
 _LOCK = threading.Lock()          # keine Überschneidungen
 
+TTS_PLAYBACK  = os.getenv("TTS_PLAYBACK", "stream")     # "stream" | "render"
+TTS_JITTER_MS = float(os.getenv("TTS_JITTER_MS", 300))  # Vorpuffer vor Start
+TTS_BLOCKSIZE = int(os.getenv("TTS_BLOCKSIZE", 1024))   # Frames pro Callback
+TTS_STALL_S   = float(os.getenv("TTS_STALL_S", 2.0))    # Reserve über Restaudio hinaus
+
+
+class StreamPlayer:
+    """
+    Dauerhaft offener sd.OutputStream. Chunks werden per feed() angehängt;
+    die Wiedergabe startet erst, wenn TTS_JITTER_MS Audio vorliegen (oder
+    die Äußerung mit end() abgeschlossen ist). Läuft der Puffer mitten in
+    einem Satz leer, zählt das als Underrun und es wird neu vorgepuffert;
+    die Pause nach einem mit pause() abgeschlossenen Satz, während der
+    nächste noch synthetisiert wird, ist keiner.
+    """
+
+    def __init__(self, sr: int, jitter_ms: float = TTS_JITTER_MS,
+                 blocksize: int = TTS_BLOCKSIZE):
+        self.sr = sr
+        self.underruns = 0
+        self._threshold = int(sr * jitter_ms / 1000)
+        self._chunks: "collections.deque[np.ndarray]" = collections.deque()
+        self._offset = 0
+        self._queued = 0
+        self._playing = False
+        self._ended = False
+        self._open = False           # der zuletzt gefütterte Satz geht noch weiter
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        import sounddevice as sd
+        self._stream = sd.OutputStream(samplerate=sr, channels=1, dtype="int16",
+                                       blocksize=blocksize, callback=self._callback)
+        self._stream.start()
+
+    def feed(self, samples: np.ndarray) -> None:
+        if not len(samples):
+            return
+        with self._lock:
+            self._chunks.append(samples)
+            self._queued += len(samples)
+            self._ended = False
+            self._open = True
+            self._idle.clear()
+
+    def pause(self) -> None:
+        """Satz komplett gefüttert – bis zum nächsten darf der Puffer leer laufen."""
+        with self._lock:
+            self._open = False
+
+    def end(self) -> None:
+        """Keine weiteren Chunks für diese Äußerung – Rest ausspielen."""
+        with self._lock:
+            self._ended = True
+            self._open = False
+            if not self._queued:
+                self._idle.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def pending_s(self) -> float:
+        """Noch nicht ausgespieltes Audio in Sekunden."""
+        with self._lock:
+            return self._queued / self.sr
+
+    def abort(self) -> None:
+        """Stream hart beenden (Gerät weg, PortAudio-Fehler); Rest verwerfen."""
+        with self._lock:
+            self._chunks.clear()
+            self._queued = self._offset = 0
+            self._playing = False
+            self._idle.set()
+        try:
+            self._stream.abort()
+            self._stream.close()
+        except Exception:
+            logger.exception("OutputStream ließ sich nicht schließen")
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        if status.output_underflow:
+            self.underruns += 1
+        out = outdata[:, 0]
+        with self._lock:
+            if not self._playing:
+                if self._queued >= self._threshold or (self._ended and self._queued):
+                    self._playing = True
+                else:
+                    out.fill(0)
+                    return
+            n = 0
+            while n < frames and self._chunks:
+                chunk = self._chunks[0]
+                take = min(frames - n, len(chunk) - self._offset)
+                out[n:n + take] = chunk[self._offset:self._offset + take]
+                n += take
+                self._offset += take
+                if self._offset == len(chunk):
+                    self._chunks.popleft()
+                    self._offset = 0
+            self._queued -= n
+            if n < frames:
+                out[n:].fill(0)
+                self._playing = False
+                if self._ended:
+                    self._idle.set()
+                elif self._open:
+                    self.underruns += 1
+
+
+_PLAYERS: Dict[int, StreamPlayer] = {}
+
+
+def _get_player(sr: int) -> StreamPlayer:
+    if sr not in _PLAYERS:
+        _PLAYERS[sr] = StreamPlayer(sr)
+    return _PLAYERS[sr]
+
+
+def _finish_stream(player: StreamPlayer, underruns_before: int) -> None:
+    """
+    Äußerung abschließen, auf Ende warten und neue Underruns loggen.
+    Gewartet wird höchstens so lange, wie noch Audio ansteht, plus
+    TTS_STALL_S – stirbt der Stream, bliebe _LOCK sonst für immer belegt.
+    Der hängende Stream wird verworfen, die nächste Äußerung öffnet neu.
+    """
+    player.end()
+    timeout = player.pending_s() + TTS_STALL_S
+    if not player.wait(timeout):
+        logger.warning("Wiedergabe hängt seit %.1f s – Stream wird neu geöffnet", timeout)
+        player.abort()
+        if _PLAYERS.get(player.sr) is player:
+            del _PLAYERS[player.sr]
+        return
+    lost = player.underruns - underruns_before
+    if lost:
+        logger.warning("Wiedergabe: %d Underrun(s) (gesamt %d)", lost, player.underruns)
+
 
 def _play(samples: np.ndarray, sr: int) -> None:
     """Blockiert bis Ende der Wiedergabe, läuft in Background-Thread."""
     try:
+        import sounddevice as sd
         sd.play(samples, sr, blocking=True)
     except Exception:
         logger.exception("Fehler bei sd.play")
 
 
+def _synth_chunks(voice: PiperVoice, model: str, text: str,
+                  persist: bool = False) -> Iterator[np.ndarray]:
+    """
+    Liefert int16-Chunks für *text*. Schon einmal gerenderte Phrasen kommen
+    als ein Stück aus dem TTS-Cache, neue werden danach dort abgelegt (mit
+    *persist* sofort auch auf der SD-Karte, siehe tts_cache).
+    Die reine Piper-Zeit (ohne Wartezeit beim Verbraucher) geht als
+    "tts_render" in den Trace des Turns.
+    """
+    cache = tts_cache.get_cache()
+    t0 = time.perf_counter()
+    cached = cache.get(model, text)
+    if cached is not None:
+        logger.debug("TTS-Cache-Treffer (%d Frames)", len(cached))
+        tracing.record("tts_render", time.perf_counter() - t0)
+        yield cached
+        return
+    chunks = []
+    rendered = 0.0
+    for raw in voice.synthesize_stream_raw(text):
+        chunk = np.frombuffer(raw, dtype=np.int16)
+        chunks.append(chunk)
+        rendered += time.perf_counter() - t0
+        yield chunk
+        t0 = time.perf_counter()
+    rendered += time.perf_counter() - t0
+    tracing.record("tts_render", rendered)
+    if chunks:
+        cache.put(model, text, np.concatenate(chunks), persist=persist)
+
+
 # ───────────────────────────── Public API ───────────────────────────────
+def synthesize(text: str, lang: str = "en", persist: bool = False) -> np.ndarray:
+    """Rendert *text* komplett (über den TTS-Cache; feste Phrasen mit *persist*)."""
+    voice = _get_voice(lang)
+    chunks = list(_synth_chunks(voice, _model_path(lang), text.strip(), persist))
+    return chunks[0] if len(chunks) == 1 else np.concatenate(chunks or [np.zeros(0, np.int16)])
+
+
+def is_cached(text: str, lang: str = "en") -> bool:
+    """Liegt das Audio für *text* schon im TTS-Cache?"""
+    return (_model_path(lang), text.strip()) in tts_cache.get_cache()
+
+
+def prewarm(phrases: Iterable[str], lang: str = "en") -> int:
+    """
+    Lädt die Stimme für *lang* und synthetisiert *phrases* vorab in den
+    Cache; gibt Anzahl neu gerenderter zurück.
+    """
+    _get_voice(lang)
+    model = _model_path(lang)
+    cache = tts_cache.get_cache()
+    rendered = 0
+    for phrase in phrases:
+        phrase = phrase.strip()
+        if not phrase or (model, phrase) in cache:
+            continue
+        try:
+            synthesize(phrase, lang, persist=True)
+            rendered += 1
+        except Exception:
+            logger.exception("Prewarm fehlgeschlagen: %r", phrase)
+    logger.info("TTS-Prewarm: %d neu gerendert", rendered)
+    return rendered
+
+
 def speak_text(text: str, lang: str = "en") -> None:
     """Spricht *text* lückenlos über Bluetooth-Lautsprecher."""
     text = text.strip()
@@ -66,12 +308,15 @@ def speak_text(text: str, lang: str = "en") -> None:
     voice = _get_voice(lang)
     sr = voice.config.sample_rate
 
+    if TTS_PLAYBACK == "stream":
+        _speak_streaming(voice, _model_path(lang), text, sr)
+        return
+
     logger.info("TTS-Render (lang=%s, %d Zeichen)", lang, len(text))
     t0 = time.perf_counter()
 
-    # 1) gesamten Text in RAM synthetisieren
-    raw = b"".join(voice.synthesize_stream_raw(text))
-    samples = np.frombuffer(raw, dtype=np.int16)
+    # 1) gesamten Text in RAM synthetisieren (oder aus dem Cache)
+    samples = synthesize(text, lang)
 
     logger.debug("Rendering fertig (%.2f s, %d Frames)",
                  time.perf_counter() - t0, len(samples))
@@ -79,6 +324,112 @@ def speak_text(text: str, lang: str = "en") -> None:
     # 2) in eigenem Thread blocking abspielen (seriell dank Lock)
     def _worker():
         with _LOCK:
-            _play(samples, sr)
+            with tracing.span("tts_playback"):
+                _play(samples, sr)
+
+    tracing.spawn(_worker)
+
+
+def _speak_streaming(voice: PiperVoice, model: str, text: str, sr: int) -> None:
+    """Piper-Chunks direkt in den OutputStream schieben, während gerendert wird."""
+    logger.info("TTS-Stream (%d Zeichen)", len(text))
+
+    def _worker():
+        with _LOCK:
+            player = _get_player(sr)
+            before = player.underruns
+            t0 = time.perf_counter()
+            try:
+                for chunk in _synth_chunks(voice, model, text):
+                    player.feed(chunk)
+            except Exception:
+                logger.exception("Fehler bei der Stream-Synthese")
+            _finish_stream(player, before)
+            tracing.record("tts_playback", time.perf_counter() - t0)
+
+    tracing.spawn(_worker)
+
+
+class SpeechPipeline:
+    """
+    Satzweise TTS: jeder Satz wird synthetisiert, während das LLM noch
+    weitere Tokens erzeugt, und direkt in die Wiedergabe-Queue gelegt.
+
+        speech = SpeechPipeline("en")
+        speech.say("Hallo.")      # nicht blockierend
+        speech.close()            # keine weiteren Sätze
+    """
+
+    _END = object()
+
+    def __init__(self, lang: str = "en"):
+        self.lang = lang
+        self._sentences: "queue.Queue[object]" = queue.Queue()
+        self._audio: "queue.Queue[object]" = queue.Queue()
+        # beide Threads halten den Trace des Turns offen, bis alles gespielt ist
+        tracing.spawn(self._synth_loop)
+        tracing.spawn(self._play_loop)
+
+    def say(self, sentence: str) -> None:
+        sentence = sentence.strip()
+        if sentence:
+            self._sentences.put(sentence)
+
+    def close(self) -> None:
+        self._sentences.put(self._END)
+
+    def _synth_loop(self) -> None:
+        # solange der Turn Sätze liefert, darf die Stimme nicht entladen werden
+        try:
+            with residency.get_manager().hold(_voice_name(self.lang)):
+                self._synth_sentences()
+        except Exception:
+            logger.exception("Satz-Synthese abgebrochen")
+        finally:
+            # ohne Endmarke würde _play_loop für immer warten
+            self._audio.put(self._END)
+
+    def _synth_sentences(self) -> None:
+        voice = _get_voice(self.lang)
+        model = _model_path(self.lang)
+        sr = voice.config.sample_rate
+        while True:
+            sentence = self._sentences.get()
+            if sentence is self._END:
+                break
+            t0 = time.perf_counter()
+            try:
+                if TTS_PLAYBACK == "stream":
+                    for chunk in _synth_chunks(voice, model, sentence):
+                        self._audio.put((chunk, sr))
+                    self._audio.put((None, sr))     # Satzende
+                    continue
+                samples = np.concatenate(list(_synth_chunks(voice, model, sentence)))
+            except Exception:
+                logger.exception("Fehler bei der Satz-Synthese")
+                continue
+            logger.debug("Satz gerendert (%.2f s, %d Frames)",
+                         time.perf_counter() - t0, len(samples))
+            self._audio.put((samples, sr))
 
-    threading.Thread(target=_worker, daemon=True).start()
+    def _play_loop(self) -> None:
+        item = self._audio.get()
+        if item is self._END:
+            return
+        # Lock über alle Sätze halten, damit parallele Antworten nicht verschachteln
+        with _LOCK, tracing.span("tts_playback"):
+            if TTS_PLAYBACK == "stream":
+                player = _get_player(item[1])
+                before = player.underruns
+                while item is not self._END:
+                    if item[0] is None:
+                        player.pause()
+                    else:
+                        player.feed(item[0])
+                    item = self._audio.get()
+                _finish_stream(player, before)
+                return
+            while item is not self._END:
+                samples, sr = item
+                _play(samples, sr)
+                item = self._audio.get()
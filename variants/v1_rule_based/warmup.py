@@ -0,0 +1,81 @@
+# variants/v1_rule_based/warmup.py
+"""
+Background warm-up of the slow components.
+
+The web server and the OLED come up right away; the Piper voice, the
+Whisper model in the transcription worker, the Ollama model and the emoji
+glyphs are loaded in parallel threads behind them. Each task reports its
+own state, which app.py serves on /healthz, so a supervisor (or the UI)
+can tell "up" from "ready for a warm voice turn".
+"""
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+PENDING, RUNNING, READY, FAILED = "pending", "running", "ready", "failed"
+
+
+class Task:
+    def __init__(self, name: str, fn: Callable[[], object]):
+        self.name = name
+        self.fn = fn
+        self.state = PENDING
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def run(self) -> None:
+        self.state = RUNNING
+        t0 = time.perf_counter()
+        try:
+            ok = self.fn()
+        except Exception as exc:
+            logging.exception("Warm-up of %s failed", self.name)
+            ok, self.error = False, f"{type(exc).__name__}: {exc}"
+        self.seconds = round(time.perf_counter() - t0, 3)
+        # a task may also report failure by returning False
+        self.state = FAILED if ok is False else READY
+        logging.info("Warm-up of %s %s after %.2f s", self.name, self.state, self.seconds)
+
+    def as_dict(self) -> dict:
+        out = {"state": self.state}
+        if self.seconds is not None:
+            out["seconds"] = self.seconds
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class Warmup:
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+        self.started = time.time()
+
+    def add(self, name: str, fn: Callable[[], object]) -> "Warmup":
+        self.tasks[name] = Task(name, fn)
+        return self
+
+    def start(self) -> "Warmup":
+        """Run every task in its own daemon thread; returns immediately."""
+        for task in self.tasks.values():
+            threading.Thread(target=task.run, name=f"warmup-{task.name}",
+                             daemon=True).start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return all(t.state == READY for t in self.tasks.values())
+
+    def status(self) -> dict:
+        states = {t.state for t in self.tasks.values()}
+        if states <= {READY}:
+            overall = "ok"
+        elif FAILED in states and not states & {PENDING, RUNNING}:
+            overall = "degraded"
+        else:
+            overall = "warming"
+        return {
+            "status": overall,
+            "uptime_s": round(time.time() - self.started, 1),
+            "components": {name: t.as_dict() for name, t in self.tasks.items()},
+        }
@@ -1 +1,108 @@
-# code to chat with plant, fetch sensor data context
\ No newline at end of file
+# code to chat with plant, fetch sensor data context
+"""
+generate_message for variant 2: the same contract as
+v1_rule_based.backend.generate_message, answered by the in-process model
+from inference.py instead of Ollama. app.py uses it with PLANT_VARIANT=v2.
+
+Sensor packages, prompt, emoji, response cache and sentence splitting are
+shared with variant 1. Every prompt starts with the fixed persona, whose
+KV cache the model keeps across turns, so there is no per-session
+conversation history here; each turn is persona + sensors + message.
+"""
+import os
+import sys
+import time
+import logging
+from typing import Callable, Iterator
+
+# variant 1's modules are imported flat, as app.py does, so the trace and
+# the residency manager are the same objects here
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+V1_DIR = os.path.join(project_root, "variants", "v1_rule_based")
+for path in (project_root, V1_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import backend as v1
+import expressions_store
+import prompt_engineering
+import residency
+import response_cache
+import tracing
+from variants.v2_local_llm.inference import get_llm
+
+llm = get_llm(prompt_engineering.SYSTEM_PROMPT)
+
+LLM_RESIDENT = f"llm:{llm.name}"
+residency.get_manager().register(LLM_RESIDENT, llm.load, llm.unload, stage="llm")
+
+
+def _stream(prompt: str) -> Iterator[str]:
+    """Tokens of the reply, recording the time to the first one."""
+    t0 = time.perf_counter()
+    first = True
+    for piece in llm.stream(prompt):
+        if first:
+            tracing.record("llm_ttft", time.perf_counter() - t0)
+            first = False
+        yield piece
+
+
+def generate_message(user_prompt: str | None = None,
+                     on_sentence: Callable[[str], None] | None = None,
+                     session_id: str | None = None,
+                     plant_id: str | None = None,
+                     pkg: dict | None = None,
+                     delivered: Callable[[], bool] | None = None) -> dict:
+    """
+    Return {'response': str, 'emoji': str, 'mood': str}, like variant 1.
+
+    With *on_sentence* every sentence is passed on as soon as it is
+    complete. *session_id* and *delivered* are accepted for the contract
+    but unused: there is no history to keep.
+    """
+    if pkg is None:
+        pkg = v1.sensor_package(plant_id)
+
+    emoji = expressions_store.get_emoji(pkg.get("overall"))
+
+    cache = response_cache.get_cache() if v1.RESPONSE_CACHE else None
+    key = cache.key(pkg, user_prompt) if cache else None
+    reply = cache.get(key) if cache else None
+    tracing.tag("cache", "hit" if reply is not None else "miss")
+    if reply is not None:
+        logging.info("Reply (cached): %s", reply)
+        if on_sentence is not None:
+            for sentence in v1.iter_sentences([reply]):
+                on_sentence(sentence)
+        return {"emoji": emoji, "response": reply, "mood": pkg.get("overall")}
+
+    with tracing.span("prompt_build"):
+        prompt = prompt_engineering.create_prompt(pkg, user_prompt)
+
+    sentences = []
+    with residency.get_manager().hold(LLM_RESIDENT), tracing.span("llm_total"):
+        try:
+            for sentence in v1.iter_sentences(_stream(prompt)):
+                sentences.append(sentence)
+                if on_sentence is not None:
+                    on_sentence(sentence)
+        except Exception as exc:
+            logging.exception("Local inference failed")
+            if not sentences:
+                sentences.append(f"Model error: {exc}")
+                if on_sentence is not None:
+                    on_sentence(sentences[0])
+    reply = " ".join(sentences) or "No response from model."
+    logging.info("Reply: %s", reply)
+
+    if cache and not reply.startswith(v1._FAILED_REPLIES):
+        cache.put(key, reply)
+
+    return {"emoji": emoji, "response": reply, "mood": pkg.get("overall")}
+
+
+if __name__ == "__main__":
+    import log_setup
+    log_setup.setup_logging()
+    print(generate_message(input("You: ") or None))
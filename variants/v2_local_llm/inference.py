@@ -1 +1,114 @@
-# LLM inference logic
\ No newline at end of file
+# LLM inference logic
+"""
+In-process inference with llama.cpp (llama-cpp-python) on a quantized GGUF
+model, e.g. a Q4_K_M build of gemma-2-2b-it. No Ollama server in between:
+no HTTP hop and no second process holding its own copy of the weights.
+
+The model is loaded once per process. llama.cpp keeps the KV cache of the
+last evaluated tokens and reuses the longest common prefix of the next
+prompt, so the plant persona (prompt_engineering.SYSTEM_PROMPT), which
+starts every prompt, is evaluated once at load and never again; a turn
+only prefills its sensor block and the owner's message. Every generation
+is capped at LLAMA_MAX_TOKENS tokens, whatever the caller asks for.
+
+    llm = get_llm()
+    for piece in llm.stream(prompt):
+        ...
+"""
+import os
+import gc
+import time
+import logging
+import threading
+from typing import Iterator, List, Optional
+
+LLAMA_MODEL_PATH  = os.getenv("LLAMA_MODEL_PATH",
+                              os.path.expanduser("~/models/gemma-2-2b-it-Q4_K_M.gguf"))
+LLAMA_N_CTX       = int(os.getenv("LLAMA_N_CTX", 1024))
+LLAMA_THREADS     = int(os.getenv("LLAMA_THREADS", 4))        # the Pi 5's four cores
+LLAMA_BATCH       = int(os.getenv("LLAMA_BATCH", 128))        # prompt tokens per eval step
+LLAMA_MAX_TOKENS  = int(os.getenv("LLAMA_MAX_TOKENS", 96))    # hard cap, ~two short sentences
+LLAMA_TEMPERATURE = float(os.getenv("LLAMA_TEMPERATURE", 0.7))
+
+# the model would otherwise go on to write the owner's next line
+STOP = ["\nOwner:", "Owner:"]
+
+
+class LocalLLM:
+    def __init__(self, model_path: str = LLAMA_MODEL_PATH, persona: str = "",
+                 n_ctx: int = LLAMA_N_CTX, threads: int = LLAMA_THREADS,
+                 batch: int = LLAMA_BATCH, max_tokens: int = LLAMA_MAX_TOKENS,
+                 temperature: float = LLAMA_TEMPERATURE):
+        self.model_path = model_path
+        self.persona = persona
+        self.n_ctx = n_ctx
+        self.threads = threads
+        self.batch = batch
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self._llm = None
+        # one context, one KV cache: generations run one at a time
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.model_path)
+
+    @property
+    def loaded(self) -> bool:
+        return self._llm is not None
+
+    def load(self) -> "LocalLLM":
+        """Load the weights and prefill the persona into the KV cache."""
+        with self._lock:
+            if self._llm is None:
+                from llama_cpp import Llama
+                t0 = time.perf_counter()
+                self._llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx,
+                                  n_threads=self.threads, n_batch=self.batch, verbose=False)
+                logging.info("Loaded %s in-process (%.2f s)", self.name, time.perf_counter() - t0)
+                if self.persona:
+                    t0 = time.perf_counter()
+                    self._llm.create_completion(self.persona, max_tokens=1)
+                    logging.info("Persona prefilled into the KV cache (%.2f s)",
+                                 time.perf_counter() - t0)
+        return self
+
+    def unload(self) -> None:
+        with self._lock:
+            self._llm = None
+        gc.collect()
+
+    def _cap(self, max_tokens: Optional[int]) -> int:
+        return min(max_tokens or self.max_tokens, self.max_tokens)
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = None,
+               stop: Optional[List[str]] = None) -> Iterator[str]:
+        """Yield the reply to *prompt* piece by piece (at most max_tokens tokens)."""
+        self.load()
+        with self._lock:
+            chunks = self._llm.create_completion(prompt, max_tokens=self._cap(max_tokens),
+                                                 temperature=self.temperature,
+                                                 stop=STOP if stop is None else stop,
+                                                 stream=True)
+            for chunk in chunks:
+                text = chunk["choices"][0]["text"]
+                if text:
+                    yield text
+
+    def complete(self, prompt: str, max_tokens: Optional[int] = None,
+                 stop: Optional[List[str]] = None) -> str:
+        return "".join(self.stream(prompt, max_tokens, stop))
+
+
+_LLM: Optional[LocalLLM] = None
+_LLM_LOCK = threading.Lock()
+
+
+def get_llm(persona: str = "") -> LocalLLM:
+    """The process-wide model; *persona* is only used by the first call."""
+    global _LLM
+    with _LLM_LOCK:
+        if _LLM is None:
+            _LLM = LocalLLM(persona=persona)
+        return _LLM